@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class DanboruSearchConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "danbooru_search"
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from .services.backup_service import close_connections_if_swapped
+
+        request_started.connect(close_connections_if_swapped)
@@ -6,9 +6,11 @@ from pathlib import Path
 from django.conf import settings
 from collections import Counter
 
+from danbooru_search.models import RejectedTag
+
 
 class Command(BaseCommand):
-    help = "Analyze rejected tags from the CSV log"
+    help = "Analyze rejected tags recorded by the tag sync"
 
     def create_visualizations(self, df, word_counts):
         """Create and save visualization plots"""
@@ -17,7 +19,7 @@ class Command(BaseCommand):
 
         # Create plots directory
         plots_dir = settings.BASE_DIR / "logs" / "plots"
-        plots_dir.mkdir(exist_ok=True)
+        plots_dir.mkdir(parents=True, exist_ok=True)
 
         # 1. Pie chart of rejection reasons
         plt.figure(figsize=(10, 6))
@@ -61,14 +63,21 @@ class Command(BaseCommand):
 
         print(f"\nVisualizations saved to {plots_dir}/")
 
+    def add_arguments(self, parser):
+        parser.add_argument("--run", help="Only analyze this sync run id")
+
     def handle(self, *args, **options):
-        log_file = settings.BASE_DIR / "logs" / "rejected_tags.csv"
-        if not log_file.exists():
-            print("No rejected tags log found")
+        rejected = RejectedTag.objects.all()
+        if options["run"]:
+            rejected = rejected.filter(sync_run_id=options["run"])
+        df = pd.DataFrame.from_records(
+            rejected.values_list("name", "reason", "details", "post_count"),
+            columns=["tag_name", "reason", "details", "post_count"],
+        )
+        if df.empty:
+            print("No rejected tags recorded")
             return
 
-        df = pd.read_csv(log_file)
-
         # Overall statistics
         print("\n=== Rejection Statistics ===")
         print(f"Total rejected tags: {len(df)}")
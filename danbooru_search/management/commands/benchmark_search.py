@@ -0,0 +1,110 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from danbooru_search.services.search_benchmark import (
+    BACKENDS,
+    generate_workload,
+    load_workload,
+    parse_size,
+    run_backend,
+    save_workload,
+    storage_sizes,
+    use_corpus_database,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark tag search latency against synthetic corpora "
+        "(reports p50/p95/p99, QPS and memory per backend)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="100k,1M,5M",
+            help="Comma-separated corpus sizes (default: 100k,1M,5M)",
+        )
+        parser.add_argument(
+            "--backends",
+            default=",".join(BACKENDS),
+            help=f"Comma-separated backends (available: {', '.join(BACKENDS)})",
+        )
+        parser.add_argument(
+            "--corpus-dir",
+            default=os.path.join(tempfile.gettempdir(), "danbooru_search_bench"),
+            help="Where corpus databases are built and reused between runs",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--sessions",
+            type=int,
+            default=500,
+            help="Typing sessions in a generated workload",
+        )
+        parser.add_argument(
+            "--workload",
+            help="Replay a recorded workload (JSON list of queries) instead of generating one",
+        )
+        parser.add_argument(
+            "--record-workload",
+            help="Save the generated workload to this JSON file for later replays",
+        )
+
+    def handle(self, *args, **options):
+        backends = [name.strip() for name in options["backends"].split(",") if name]
+        unknown = [name for name in backends if name not in BACKENDS]
+        if unknown:
+            raise CommandError(f"Unknown backends: {', '.join(unknown)}")
+
+        corpus_dir = Path(options["corpus_dir"])
+        corpus_dir.mkdir(parents=True, exist_ok=True)
+        original_name = connections["default"].settings_dict["NAME"]
+
+        try:
+            for size in (parse_size(s) for s in options["sizes"].split(",")):
+                path = corpus_dir / f"tags_{size}_seed{options['seed']}.sqlite3"
+                self.stdout.write(f"\n=== Corpus: {size:,} tags ({path}) ===")
+                if use_corpus_database(path, size, options["seed"]):
+                    self.stdout.write("Generated new corpus")
+                self.stdout.write(
+                    f"Database file: {path.stat().st_size / 1024 / 1024:.1f} MB"
+                )
+
+                if options["workload"]:
+                    workload = load_workload(options["workload"])
+                else:
+                    workload = generate_workload(options["sessions"], options["seed"])
+                    if options["record_workload"]:
+                        save_workload(workload, options["record_workload"])
+                self.stdout.write(f"Workload: {len(workload):,} queries")
+
+                self.stdout.write(
+                    f"{'backend':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                    f"{'max ms':>9}{'QPS':>10}{'setup s':>9}{'setup MB':>10}{'RSS MB':>9}"
+                )
+                for name in backends:
+                    report = run_backend(name, workload)
+                    self.stdout.write(
+                        f"{name:<14}{report['p50_ms']:>9.3f}{report['p95_ms']:>9.3f}"
+                        f"{report['p99_ms']:>9.3f}{report['max_ms']:>9.2f}"
+                        f"{report['qps']:>10.0f}{report['setup_seconds']:>9.2f}"
+                        f"{report['setup_peak_mb']:>10.1f}{report['max_rss_mb']:>9.0f}"
+                    )
+
+                sizes = storage_sizes()
+                if sizes and sizes["clustered"]:
+                    mb = {name: size / 1024 / 1024 for name, size in sizes.items()}
+                    self.stdout.write(
+                        f"Storage: tag table {mb['tag_table']:.1f} MB + indexes "
+                        f"{mb['tag_indexes']:.1f} MB; clustered copy "
+                        f"{mb['clustered']:.1f} MB"
+                    )
+        finally:
+            connection = connections["default"]
+            connection.close()
+            connection.settings_dict["NAME"] = original_name
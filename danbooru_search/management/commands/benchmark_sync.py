@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from django.utils import timezone
+
+from danbooru_search.models import CommonWord, Tag, UpdateStatus
+from danbooru_search.services import metrics
+from danbooru_search.services.fake_danbooru import KNOWN_WORDS, FakeDanbooruServer
+from danbooru_search.services.search_benchmark import use_database
+from danbooru_search.services.tag_updater import TagUpdater
+
+STAGES = [
+    ("fetch", "get_tags_page"),
+    ("validate", "process_tag_batch"),
+    ("write", "_bulk_update_tags"),
+    ("swap", "_swap_shadow"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark TagUpdater.perform_update against a local fake Danbooru API "
+        "(reports tags/sec end-to-end and per stage)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-id", type=int, default=50_000, help="Highest fake tag id"
+        )
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Seconds added per request"
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests answered with 429/5xx",
+        )
+        parser.add_argument(
+            "--retry-after",
+            type=int,
+            default=0,
+            help="Retry-After seconds sent with injected 429s",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the benchmark database"
+        )
+        parser.add_argument(
+            "--full-rebuild",
+            action="store_true",
+            help="Load into a shadow database and swap it in at the end",
+        )
+        parser.add_argument(
+            "--show-output",
+            action="store_true",
+            help="Show the updater's own output instead of hiding it",
+        )
+
+    def handle(self, *args, **options):
+        work_dir = Path(tempfile.mkdtemp(prefix="danbooru_sync_bench_"))
+        original_name = connections["default"].settings_dict["NAME"]
+
+        # The updater bumps the data version and rebuilds the bundle when it
+        # finishes; keep those away from the files the running site serves
+        isolated = override_settings(
+            SEARCH_INDEX_VERSION_FILE=work_dir / "tag_data.version",
+            RELATED_TAGS_VERSION_FILE=work_dir / "related_tags.version",
+            AUTOCOMPLETE_BUNDLE_DIR=work_dir / "autocomplete_bundle",
+            TAG_PAGE_STORE_DIR=work_dir / "pages",
+        )
+        isolated.enable()
+        try:
+            use_database(work_dir / "sync.sqlite3")
+            CommonWord.objects.bulk_create(
+                [CommonWord(word=word, category="custom") for word in KNOWN_WORDS]
+            )
+            # A fresh backup timestamp keeps the updater from copying the DB
+            UpdateStatus.objects.create(last_backup=timezone.now())
+
+            report = asyncio.run(self.run(work_dir, options))
+            # A full rebuild swapped the file this connection may still have open
+            connections["default"].close()
+            report["tags_in_db"] = Tag.objects.count()
+            self.print_report(report)
+        finally:
+            connection = connections["default"]
+            connection.close()
+            connection.settings_dict["NAME"] = original_name
+            isolated.disable()
+            if options["keep"]:
+                self.stdout.write(f"\nBenchmark files kept in {work_dir}")
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def run(self, work_dir, options):
+        server = FakeDanbooruServer(
+            max_id=options["max_id"],
+            seed=options["seed"],
+            latency=options["latency"],
+            error_rate=options["error_rate"],
+            retry_after=options["retry_after"],
+        )
+        base_url = await server.start()
+
+        updater = TagUpdater(
+            base_url=base_url,
+            page_delay=0,
+            run_analysis=False,
+            full_rebuild=options["full_rebuild"],
+        )
+        updater.tags_per_page = options["page_size"]
+        updater.backup_service.backup_path = work_dir
+
+        before = {
+            function: metrics.FUNCTION_SECONDS.get(function=function)
+            for _, function in STAGES
+        }
+        pages_before = metrics.SYNC_PAGES.get()
+
+        output = (
+            contextlib.nullcontext()
+            if options["show_output"]
+            else contextlib.redirect_stdout(io.StringIO())
+        )
+        try:
+            start = time.perf_counter()
+            with output:
+                await updater.perform_update()
+            elapsed = time.perf_counter() - start
+        finally:
+            await server.stop()
+
+        stages = {}
+        for stage, function in STAGES:
+            calls, seconds = metrics.FUNCTION_SECONDS.get(function=function)
+            stages[stage] = (
+                calls - before[function][0],
+                seconds - before[function][1],
+            )
+
+        return {
+            "elapsed": elapsed,
+            "tags": updater.total_tags_processed,
+            "pages": metrics.SYNC_PAGES.get() - pages_before,
+            "requests": server.requests_served,
+            "errors": server.errors_injected,
+            "stages": stages,
+        }
+
+    def print_report(self, report):
+        elapsed = report["elapsed"]
+        tags = report["tags"]
+        self.stdout.write("\n=== Sync Benchmark ===")
+        self.stdout.write(f"Tags fetched: {tags:,} in {report['pages']:,} pages")
+        self.stdout.write(f"Tags in database: {report['tags_in_db']:,}")
+        self.stdout.write(
+            f"Requests: {report['requests']:,} ({report['errors']:,} injected errors)"
+        )
+        self.stdout.write(
+            f"End-to-end: {elapsed:.2f}s, {tags / elapsed if elapsed else 0:,.0f} tags/sec"
+        )
+
+        self.stdout.write(
+            f"\n{'stage':<10}{'calls':>8}{'seconds':>10}{'share':>8}{'tags/sec':>12}"
+        )
+        for stage, (calls, seconds) in report["stages"].items():
+            share = seconds / elapsed * 100 if elapsed else 0
+            rate = tags / seconds if seconds else 0
+            self.stdout.write(
+                f"{stage:<10}{calls:>8}{seconds:>10.2f}{share:>7.1f}%{rate:>12,.0f}"
+            )
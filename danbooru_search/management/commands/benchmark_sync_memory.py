@@ -0,0 +1,145 @@
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from danbooru_search.models import Tag
+from danbooru_search.services.fake_danbooru import FakeDanbooruServer
+from danbooru_search.services.fast_json import loads
+from danbooru_search.services.search_benchmark import use_database
+from danbooru_search.services.tag_records import TAG_FIELDS, insert_tags, tag_row
+
+
+def build_models(body):
+    """Full payloads via aiohttp's response.json() into Tag instances"""
+    return [
+        Tag(
+            name=tag_data["name"],
+            post_count=tag_data["post_count"],
+            category=tag_data.get("category", 0),
+        )
+        for tag_data in json.loads(body.decode())
+    ]
+
+
+def write_models(tags):
+    Tag.objects.bulk_create(tags, ignore_conflicts=True)
+
+
+def build_rows(body):
+    """only= payloads into (name, post_count, category) tuples"""
+    return [tag_row(tag_data) for tag_data in loads(body)]
+
+
+# (name, page body key, build, write)
+PATHS = [
+    ("models", "full", build_models, write_models),
+    ("records", "lean", build_rows, insert_tags),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare memory and time per sync page between full payloads written "
+        "as Tag models and only= payloads written as row tuples"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        pages = self.make_pages(options)
+        work_dir = Path(tempfile.mkdtemp(prefix="danbooru_sync_memory_"))
+        original_name = connections["default"].settings_dict["NAME"]
+        try:
+            use_database(work_dir / "memory.sqlite3")
+            results = {
+                name: self.measure(pages[key], *path) for name, key, *path in PATHS
+            }
+        finally:
+            connection = connections["default"]
+            connection.close()
+            connection.settings_dict["NAME"] = original_name
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self.stdout.write(
+            f"\n{len(pages['full'])} pages of {options['page_size']} tags "
+            f"(body {statistics.mean(map(len, pages['full'])) / 1024:.0f} KiB full, "
+            f"{statistics.mean(map(len, pages['lean'])) / 1024:.0f} KiB with only=)\n"
+        )
+        self.stdout.write(
+            f"{'path':<10}{'held KiB':>10}{'blocks':>10}{'peak KiB':>10}"
+            f"{'build ms':>10}{'write ms':>10}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10}{result['held'] / 1024:>10.0f}{result['blocks']:>10,.0f}"
+                f"{result['peak'] / 1024:>10.0f}{result['build'] * 1000:>10.1f}"
+                f"{result['write'] * 1000:>10.1f}"
+            )
+        self.stdout.write(
+            "\nheld/blocks: memory still allocated for the built page; peak: "
+            "highest traced memory while building and writing it (per page means)"
+        )
+
+    def make_pages(self, options):
+        """Encoded page bodies, with every field and with only= fields"""
+        server = FakeDanbooruServer(
+            max_id=options["pages"] * options["page_size"] * 2, seed=options["seed"]
+        )
+        pages = {"full": [], "lean": []}
+        last_id = 0
+        for _ in range(options["pages"]):
+            tags = server.page(f"a{last_id}", options["page_size"])
+            if not tags:
+                break
+            last_id = tags[-1]["id"]
+            pages["full"].append(json.dumps(tags).encode())
+            lean = [{field: tag[field] for field in TAG_FIELDS} for tag in tags]
+            pages["lean"].append(json.dumps(lean).encode())
+        return pages
+
+    def measure(self, bodies, build, write):
+        """Per page means of traced memory, then of untraced build/write time"""
+        Tag.objects.all().delete()
+        held, blocks, peak = [], [], []
+        tracemalloc.start()
+        try:
+            for body in bodies:
+                tracemalloc.clear_traces()
+                tracemalloc.reset_peak()
+                page = build(body)
+                stats = tracemalloc.take_snapshot().statistics("filename")
+                held.append(sum(stat.size for stat in stats))
+                blocks.append(sum(stat.count for stat in stats))
+                write(page)
+                peak.append(tracemalloc.get_traced_memory()[1])
+                del page
+        finally:
+            tracemalloc.stop()
+
+        Tag.objects.all().delete()
+        build_times, write_times = [], []
+        for body in bodies:
+            start = time.perf_counter()
+            page = build(body)
+            built = time.perf_counter()
+            write(page)
+            build_times.append(built - start)
+            write_times.append(time.perf_counter() - built)
+
+        return {
+            "held": statistics.mean(held),
+            "blocks": statistics.mean(blocks),
+            "peak": statistics.mean(peak),
+            "build": statistics.mean(build_times),
+            "write": statistics.mean(write_times),
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from danbooru_search.services.prewarm import process_memory
+from danbooru_search.services.search_benchmark import generate_workload
+
+# The render.yaml deployment
+COMMAND = ["gunicorn", "danbooru_search.asgi", "-k", "uvicorn.workers.UvicornWorker"]
+MODES = {"preload": "True", "lazy": "False"}
+
+
+def _children(pid):
+    """Pids of a process's direct children"""
+    children = []
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(stat.parent.name))
+    return sorted(children)
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the gunicorn deployment with and without preload_app and "
+        "report startup time, first-request latency and per-worker memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes",
+            default=",".join(MODES),
+            help=f"Comma-separated modes (available: {', '.join(MODES)})",
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--port", type=int, default=8766)
+        parser.add_argument(
+            "--settle",
+            type=float,
+            default=10.0,
+            help="Seconds of traffic after the first requests, before memory "
+            "is read (lets lazy workers finish building their indexes)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if process_memory() is None:
+            raise CommandError("Needs Linux /proc/<pid>/smaps_rollup")
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode]
+        unknown = [mode for mode in modes if mode not in MODES]
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(unknown)}")
+        queries = generate_workload(sessions=200, seed=options["seed"]) or list(
+            "abcdefghijklmnopqrstuvwxyz"
+        )
+
+        results = {}
+        for mode in modes:
+            results[mode] = self.measure(mode, queries, options)
+
+        mb = 2**20
+        self.stdout.write(
+            f"\n{options['workers']} workers; memory after {options['settle']:.0f}s "
+            "of traffic. PSS splits shared pages between the processes sharing "
+            "them, so total PSS is the real footprint.\n"
+        )
+        self.stdout.write(
+            f"{'mode':<9}{'ready s':>8}{'first ms':>10}{'first max':>10}"
+            f"{'warm ms':>9}{'master MB':>10}{'worker RSS':>11}{'worker PSS':>11}"
+            f"{'private':>9}{'total PSS':>10}"
+        )
+        for mode, result in results.items():
+            workers = result["workers"]
+            total = result["master"]["Pss"] + sum(w["Pss"] for w in workers)
+            self.stdout.write(
+                f"{mode:<9}{result['ready']:>8.1f}"
+                f"{statistics.median(result['first']) * 1000:>10.1f}"
+                f"{max(result['first']) * 1000:>10.1f}"
+                f"{statistics.median(result['warm']) * 1000:>9.2f}"
+                f"{result['master']['Pss'] / mb:>10.0f}"
+                f"{statistics.mean(w['Rss'] for w in workers) / mb:>11.0f}"
+                f"{statistics.mean(w['Pss'] for w in workers) / mb:>11.0f}"
+                f"{statistics.mean(self.private(w) for w in workers) / mb:>9.0f}"
+                f"{total / mb:>10.0f}"
+            )
+        self.stdout.write(
+            "\nready: start to the first answered search; first: latency of the "
+            "next searches, sent together right after it; worker columns are means"
+        )
+
+    def private(self, memory):
+        return memory["Private_Clean"] + memory["Private_Dirty"]
+
+    def measure(self, mode, queries, options):
+        command = COMMAND + [
+            "-w",
+            str(options["workers"]),
+            "-b",
+            f"127.0.0.1:{options['port']}",
+        ]
+        env = {
+            **os.environ,
+            "ASYNC_SEARCH": "True",
+            "DEBUG": "False",
+            "GUNICORN_PRELOAD": MODES[mode],
+        }
+        self.stdout.write(f"=== {mode}: {' '.join(command)} ===")
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=sys.stderr if options["verbosity"] > 1 else subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_port(options["port"])
+            base_url = f"http://127.0.0.1:{options['port']}"
+            # The master listens before its workers exist: time the first answer
+            asyncio.run(self.fetch(base_url, ["a"]))
+            ready = time.perf_counter() - start
+            # Several requests per worker at once, before any has warmed up
+            first = asyncio.run(
+                self.fetch(base_url, queries[: options["workers"] * 4], parallel=True)
+            )
+            deadline = time.monotonic() + options["settle"]
+            while time.monotonic() < deadline:
+                asyncio.run(self.fetch(base_url, queries[:200], parallel=True))
+            warm = asyncio.run(self.fetch(base_url, queries[:500]))
+            return {
+                "ready": ready,
+                "first": first,
+                "warm": warm,
+                "master": process_memory(process.pid),
+                "workers": [process_memory(pid) for pid in _children(process.pid)],
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def wait_for_port(self, port, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise CommandError(f"Nothing listening on port {port}")
+
+    async def fetch(self, base_url, queries, parallel=False):
+        """Latency of each search, all at once or one after another"""
+        async with aiohttp.ClientSession() as session:
+
+            async def search(query):
+                start = time.perf_counter()
+                async with session.get(
+                    f"{base_url}/api/search", params={"q": query}
+                ) as response:
+                    await response.read()
+                    if response.status != 200:
+                        raise CommandError(f"Search failed: HTTP {response.status}")
+                return time.perf_counter() - start
+
+            if parallel:
+                return await asyncio.gather(*(search(query) for query in queries))
+            return [await search(query) for query in queries]
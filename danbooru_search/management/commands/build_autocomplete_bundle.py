@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.autocomplete_bundle import build_bundle
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the most used tags as a versioned, pre-compressed file that the "
+        "prompt builder searches locally (the sync rebuilds it after changes)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=settings.AUTOCOMPLETE_BUNDLE_SIZE,
+            help="Number of tags to include, most used first",
+        )
+
+    def handle(self, *args, **options):
+        manifest = build_bundle(options["size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {manifest['file']}: {manifest['tags']:,} tags, "
+                f"{manifest['bytes']:,} bytes ({manifest['gzip_bytes']:,} gzipped)"
+            )
+        )
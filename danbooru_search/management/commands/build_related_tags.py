@@ -0,0 +1,56 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.api_service import DanbooruAPI
+from danbooru_search.services.related_tags import (
+    fetch_post_tag_strings,
+    save_related,
+    top_k_related,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the related tags table from a sample of post tag strings, "
+        "fetched from the Danbooru API or read from a file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            help="Read post tag strings from this file (one post per line) "
+            "instead of the API",
+        )
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=settings.RELATED_TAGS_SAMPLE_POSTS or 20_000,
+            help="Number of recent posts to sample from the API",
+        )
+        parser.add_argument("--top-k", type=int, default=settings.RELATED_TAGS_TOP_K)
+        parser.add_argument(
+            "--min-count",
+            type=int,
+            default=2,
+            help="Ignore tags and pairs seen in fewer posts than this",
+        )
+        parser.add_argument("--base-url", help="Danbooru API base URL")
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            with open(options["file"], encoding="utf-8") as f:
+                tag_strings = [line.strip() for line in f if line.strip()]
+        else:
+            api = DanbooruAPI(options["base_url"])
+            tag_strings = asyncio.run(fetch_post_tag_strings(api, options["posts"]))
+
+        self.stdout.write(f"Computing related tags from {len(tag_strings):,} posts")
+        related = top_k_related(tag_strings, options["top_k"], options["min_count"])
+        saved = save_related(related)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved {saved:,} related tag pairs for {len(related):,} tags"
+            )
+        )
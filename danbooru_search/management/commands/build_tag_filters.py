@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.search_index import bump_data_version
+from danbooru_search.services.tag_filters import build_filters
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the TAG_FILTERS bitsets searches exclude with exclude= "
+        "(the sync rebuilds them after every run)"
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = build_filters()
+        bump_data_version()
+        for name, count in counts.items():
+            self.stdout.write(f"  {name}: {count:,} tags")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built {len(counts)} tag filters in {time.perf_counter() - start:.1f}s"
+            )
+        )
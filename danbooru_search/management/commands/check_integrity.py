@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from danbooru_search.services.integrity import MODES, run_check
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the database's structure, tag indexes and tag count, and record "
+        "the result for the status and metrics endpoints"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=MODES,
+            default="quick",
+            help="indexes: index presence and row count only; quick: plus "
+            "PRAGMA quick_check; full: plus PRAGMA integrity_check",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            help="Keep running, checking every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            check = run_check(options["mode"])
+            summary = (
+                f"{check.mode} check of {check.tag_count:,} tags "
+                f"in {check.duration:.2f}s"
+            )
+            if check.ok:
+                self.stdout.write(self.style.SUCCESS(f"{summary}: ok"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{summary}: problems found"))
+                for problem in check.problems:
+                    self.stdout.write(f"  {problem}")
+
+            if not options["every"]:
+                break
+            # Pick up a database file swapped in by a full rebuild
+            connections["default"].close()
+            time.sleep(options["every"])
+
+        if not check.ok:
+            raise CommandError("Integrity check failed")
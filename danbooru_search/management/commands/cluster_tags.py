@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from danbooru_search.models import ClusteredTag
+from danbooru_search.services import clustered_tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch database prefix searches to a copy of the tag table clustered "
+        "on name (WITHOUT ROWID), kept in step by triggers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--disable",
+            action="store_true",
+            help="Go back to searching the tag table and empty the copy",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options["disable"]:
+            clustered_tags.disable()
+            self.stdout.write(self.style.SUCCESS("Clustered tag layout disabled"))
+            return
+
+        clustered_tags.enable()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Clustered tag layout enabled: {ClusteredTag.objects.count():,} "
+                f"tags copied in {time.perf_counter() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,108 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from danbooru_search.models import Tag
+from danbooru_search.services.search_cursor import MAX_LIMIT
+from danbooru_search.services.search_index import TagIndex
+from danbooru_search.services.tag_ranking import (
+    POST_COUNT_WEIGHTS,
+    match_bonuses,
+    read_selections,
+    scorer,
+)
+from danbooru_search.services.tag_relations import AliasMap
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the search selection log against rank weights and report "
+        "where the picked tag ranked (MRR and hits at 1/10/50)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log",
+            default=settings.SEARCH_SELECTION_LOG,
+            help="Selection log (JSON lines of q and tag) recorded by /api/search",
+        )
+        parser.add_argument(
+            "--weights",
+            action="append",
+            default=[],
+            metavar="NAME=JSON",
+            help="Candidate weights, merged over TAG_RANK_WEIGHTS (repeatable), "
+            "e.g. short='{\"length\": 0.2}'",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=MAX_LIMIT,
+            help="Results ranked per query; picks below this count as misses",
+        )
+
+    def handle(self, *args, **options):
+        if not options["log"]:
+            raise CommandError("No selection log: pass --log")
+        try:
+            selections = read_selections(options["log"])
+        except FileNotFoundError:
+            raise CommandError(f"Selection log {options['log']} does not exist")
+        if not selections:
+            raise CommandError("The selection log is empty")
+
+        weight_sets = {
+            "post_count": POST_COUNT_WEIGHTS,
+            "current": settings.TAG_RANK_WEIGHTS,
+        }
+        for candidate in options["weights"]:
+            name, _, weights = candidate.partition("=")
+            try:
+                weight_sets[name] = {**settings.TAG_RANK_WEIGHTS, **json.loads(weights)}
+            except ValueError:
+                raise CommandError(f"--weights {candidate!r} is not NAME=JSON")
+
+        rows = list(Tag.objects.values_list("name", "post_count", "category"))
+        aliases = AliasMap.build()
+        self.stdout.write(
+            f"{len(selections):,} selections, {len(rows):,} tags, "
+            f"ranking the top {options['depth']}\n"
+        )
+        self.stdout.write(
+            f"{'weights':<14}{'MRR':>8}{'hit@1':>8}{'hit@10':>8}{'hit@50':>8}"
+            f"{'missed':>8}"
+        )
+        for name, weights in weight_sets.items():
+            result = self.evaluate(rows, aliases, weights, selections, options["depth"])
+            self.stdout.write(
+                f"{name:<14}{result['mrr']:>8.3f}{result['hit@1']:>8.1%}"
+                f"{result['hit@10']:>8.1%}{result['hit@50']:>8.1%}"
+                f"{result['missed']:>8,}"
+            )
+
+    def evaluate(self, rows, aliases, weights, selections, depth):
+        """Rank the picked tag for every logged search under these weights"""
+        score = scorer(weights)
+        index = TagIndex.from_rows(
+            (
+                (name, count, category, score(name, count, category))
+                for name, count, category in rows
+            ),
+            aliases,
+            match_bonuses(weights),
+        )
+        positions = []
+        for query, tag in selections:
+            names = [name for name, _, _ in index.search(query, depth)]
+            tag = tag.lower()
+            positions.append(names.index(tag) + 1 if tag in names else None)
+
+        found = [position for position in positions if position is not None]
+        return {
+            "mrr": sum(1 / position for position in found) / len(positions),
+            "hit@1": sum(position <= 1 for position in found) / len(positions),
+            "hit@10": sum(position <= 10 for position in found) / len(positions),
+            "hit@50": sum(position <= 50 for position in found) / len(positions),
+            "missed": len(positions) - len(found),
+        }
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.tag_export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = "Export the tag database as CSV or NDJSON using constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--min-posts",
+            type=int,
+            default=0,
+            help="Only export tags used at least this many times",
+        )
+        parser.add_argument(
+            "--output", "-o", help="File to write (default: standard output)"
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunks = iter_export(
+            options["format"], options["min_posts"], options["chunk_size"]
+        )
+
+        if options["output"]:
+            with open(options["output"], "wb") as f:
+                written = sum(f.write(chunk) for chunk in chunks)
+            self.stderr.write(f"Wrote {written:,} bytes to {options['output']}")
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
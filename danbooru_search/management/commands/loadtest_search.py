@@ -0,0 +1,165 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from danbooru_search.services.search_benchmark import generate_workload
+
+SERVERS = {
+    "wsgi": {
+        "command": ["gunicorn", "danbooru_search.wsgi"],
+        "env": {"ASYNC_SEARCH": "False"},
+    },
+    "asgi": {
+        "command": [
+            "gunicorn",
+            "danbooru_search.asgi",
+            "-k",
+            "uvicorn.workers.UvicornWorker",
+        ],
+        "env": {"ASYNC_SEARCH": "True"},
+    },
+}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[
+        min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test /api/search with many concurrent connections, comparing "
+        "the WSGI (sync workers) and ASGI (uvicorn workers) deployments"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servers",
+            default="wsgi,asgi",
+            help=f"Deployments to start and test (available: {', '.join(SERVERS)})",
+        )
+        parser.add_argument(
+            "--url", help="Test an already running server instead of starting one"
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--warmup", type=float, default=3.0)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        queries = generate_workload(sessions=500, seed=options["seed"]) or list(
+            "abcdefghijklmnopqrstuvwxyz"
+        )
+        self.stdout.write(f"Workload: {len(queries):,} queries")
+
+        if options["url"]:
+            self.report(
+                options["url"], asyncio.run(self.run(options["url"], queries, options))
+            )
+            return
+
+        for name in options["servers"].split(","):
+            if name not in SERVERS:
+                raise CommandError(f"Unknown server: {name}")
+            base_url = f"http://127.0.0.1:{options['port']}"
+            process = self.start_server(name, options)
+            try:
+                self.wait_until_ready(base_url)
+                self.report(name, asyncio.run(self.run(base_url, queries, options)))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    def start_server(self, name, options):
+        server = SERVERS[name]
+        command = server["command"] + [
+            "-w",
+            str(options["workers"]),
+            "-b",
+            f"127.0.0.1:{options['port']}",
+        ]
+        env = {**os.environ, **server["env"], "DEBUG": "False"}
+        self.stdout.write(f"\n=== {name}: {' '.join(command)} ===")
+        return subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=sys.stderr if options["verbosity"] > 1 else subprocess.DEVNULL,
+        )
+
+    def wait_until_ready(self, base_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"{base_url}/api/search?q=a", timeout=5)
+                return
+            except OSError:
+                time.sleep(0.5)
+        raise CommandError(f"Server at {base_url} did not start")
+
+    async def run(self, base_url, queries, options):
+        connector = aiohttp.TCPConnector(limit=options["concurrency"])
+        async with aiohttp.ClientSession(connector=connector) as session:
+            # Warm caches and indexes before measuring
+            await self.load(session, base_url, queries, options, options["warmup"])
+            return await self.load(
+                session, base_url, queries, options, options["duration"]
+            )
+
+    async def load(self, session, base_url, queries, options, duration):
+        latencies = []
+        errors = 0
+        deadline = time.monotonic() + duration
+        position = 0
+
+        async def client():
+            nonlocal errors, position
+            while time.monotonic() < deadline:
+                query = queries[position % len(queries)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    async with session.get(
+                        f"{base_url}/api/search", params={"q": query}
+                    ) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": len(latencies) / elapsed if elapsed else 0,
+            "p50_ms": _percentile(latencies, 0.50) * 1000,
+            "p95_ms": _percentile(latencies, 0.95) * 1000,
+            "p99_ms": _percentile(latencies, 0.99) * 1000,
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name}: {result['requests']:,} requests, {result['errors']:,} errors, "
+            f"{result['rps']:,.0f} req/s, p50 {result['p50_ms']:.1f} ms, "
+            f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms"
+        )
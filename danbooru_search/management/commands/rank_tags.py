@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.autocomplete_bundle import refresh_bundle
+from danbooru_search.services.search_index import bump_data_version
+from danbooru_search.services.tag_ranking import rank_all_tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every tag's stored rank score from TAG_RANK_WEIGHTS "
+        "(the sync scores new tags as it inserts them)"
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ranked = rank_all_tags()
+        bump_data_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scored {ranked:,} tags in {time.perf_counter() - start:.1f}s "
+                f"with {settings.TAG_RANK_WEIGHTS}"
+            )
+        )
+        # The browser ranks its bundle with the same weights
+        manifest = refresh_bundle()
+        self.stdout.write(f"Rebuilt autocomplete bundle {manifest['file']}")
@@ -0,0 +1,119 @@
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from danbooru_search.models import CommonWord, Tag, UpdateStatus
+from danbooru_search.services.page_store import PageStore
+from danbooru_search.services.revalidation import revalidate_store
+from danbooru_search.services.search_index import bump_data_version
+from danbooru_search.services.shadow_db import ShadowDatabase
+from danbooru_search.services.tag_filters import build_filters
+from danbooru_search.services.tag_logger import TagLogger
+from danbooru_search.services.word_checker import accepted_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-apply the current validation rules to every stored API page and "
+        "swap in the resulting tag database, without refetching"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, help="Validation processes (default: CPU count)"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how the tag database would change",
+        )
+        parser.add_argument(
+            "--min-ratio",
+            type=float,
+            help="Minimum new/current tag count ratio required for the swap",
+        )
+        parser.add_argument("--store-dir", help="Page store directory")
+
+    def handle(self, *args, **options):
+        store = PageStore(Path(options["store_dir"]) if options["store_dir"] else None)
+        pages = len(store.ranges())
+        if not pages:
+            raise CommandError(f"No stored pages in {store.directory}")
+        status = UpdateStatus.objects.first()
+        if status and status.is_updating:
+            raise CommandError("A tag sync is running")
+
+        common_words = set(CommonWord.objects.values_list("word", flat=True))
+        accepted_tag_names = accepted_names()
+        self.stdout.write(
+            f"Revalidating {pages:,} pages ({store.size() / 1e6:.1f} MB compressed)"
+        )
+
+        shadow = None
+        tag_logger = TagLogger()
+        if options["dry_run"]:
+            valid_names = set()
+        else:
+            shadow = ShadowDatabase()
+            shadow.prepare()
+            # Rejections are recorded in the new database under a fresh run id
+            tag_logger.start_run()
+            tag_logger.shadow = shadow
+
+        start = time.perf_counter()
+        accepted_count = 0
+        rejected = Counter()
+        try:
+            for accepted, page_rejected in revalidate_store(
+                store,
+                common_words,
+                options["workers"],
+                accepted_names=accepted_tag_names,
+            ):
+                accepted_count += len(accepted)
+                rejected.update(reason for _, reason, _ in page_rejected)
+                if shadow is not None:
+                    shadow.write_tags(accepted)
+                    for tag_data, reason, details in page_rejected:
+                        tag_logger.log_rejected_tag(tag_data, reason, details)
+                    tag_logger.flush()
+                else:
+                    valid_names.update(name for name, _, _ in accepted)
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"Validated {accepted_count + sum(rejected.values()):,} tags in "
+                f"{elapsed:.1f}s: {accepted_count:,} accepted, "
+                + ", ".join(f"{count:,} {reason}" for reason, count in rejected.items())
+            )
+
+            if shadow is None:
+                current = set(Tag.objects.values_list("name", flat=True))
+                self.stdout.write(
+                    f"Would add {len(valid_names - current):,} tags and remove "
+                    f"{len(current - valid_names):,}"
+                )
+                return
+
+            shadow.finalize()
+            summary = shadow.validate(options["min_ratio"])
+            backup_file = shadow.swap(summary["live_count"])
+        except Exception:
+            if shadow is not None:
+                shadow.discard()
+            raise
+
+        # Tag ids changed with the new database; re-point the filter bitsets
+        connections["default"].close()
+        build_filters()
+        bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Swapped in {summary['tag_count']:,} tags "
+                f"(previously {summary['live_count']:,}, kept as {backup_file.name})"
+            )
+        )
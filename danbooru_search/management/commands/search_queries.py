@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from danbooru_search.services.query_log import read_entries, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the most frequent searches and the prefixes that found no "
+        "tags, from the sampled search query log"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log",
+            default=settings.SEARCH_QUERY_LOG,
+            help="Query log to read (default: SEARCH_QUERY_LOG)",
+        )
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument(
+            "--min-length",
+            type=int,
+            default=1,
+            help="Leave shorter queries out of the rankings",
+        )
+
+    def handle(self, *args, **options):
+        summary = summarize(
+            read_entries(options["log"]), options["top"], options["min_length"]
+        )
+        if not summary["total"]:
+            raise CommandError(f"No logged searches in {options['log']}")
+
+        total = summary["total"]
+        self.stdout.write(
+            f"{total:,} logged searches (sampling rate "
+            f"{settings.SEARCH_QUERY_LOG_SAMPLE:g}), {summary['distinct']:,} "
+            f"distinct queries, {summary['empty'] / total:.1%} found nothing"
+        )
+        self.stdout.write(
+            "By length: "
+            + ", ".join(
+                f"{'5+' if length == 5 else length}: {count / total:.1%}"
+                for length, count in summary["lengths"].items()
+            )
+        )
+
+        self.stdout.write(f"\nTop {len(summary['top'])} queries:")
+        for query, count in summary["top"]:
+            self.stdout.write(f"  {count:>8,}  {count / total:>6.2%}  {query}")
+
+        self.stdout.write(
+            f"\nTop {len(summary['empty_stems'])} prefixes that found nothing "
+            "(counting the longer queries that start with them):"
+        )
+        for stem, count in summary["empty_stems"]:
+            self.stdout.write(f"  {count:>8,}  {stem}")
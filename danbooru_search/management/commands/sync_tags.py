@@ -0,0 +1,41 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from danbooru_search.services.tag_updater import TagUpdater
+
+
+class Command(BaseCommand):
+    help = "Sync tags from the Danbooru API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full-rebuild",
+            action="store_true",
+            help="Resync every tag into a shadow database and swap it in when done",
+        )
+        parser.add_argument(
+            "--revalidate-all",
+            action="store_true",
+            help="With --full-rebuild, revalidate blocks of tags that are "
+            "unchanged since the last one instead of copying them",
+        )
+        parser.add_argument("--base-url", help="Danbooru API base URL")
+        parser.add_argument(
+            "--page-delay", type=float, help="Seconds to wait between pages"
+        )
+        parser.add_argument(
+            "--no-analysis",
+            action="store_true",
+            help="Skip the rejected tag analysis after the sync",
+        )
+
+    def handle(self, *args, **options):
+        updater = TagUpdater(
+            base_url=options["base_url"],
+            page_delay=options["page_delay"],
+            run_analysis=not options["no_analysis"],
+            full_rebuild=options["full_rebuild"],
+            skip_unchanged=not options["revalidate_all"],
+        )
+        asyncio.run(updater.perform_update())
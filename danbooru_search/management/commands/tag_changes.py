@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from danbooru_search.services.range_checksums import change_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Report which blocks of tag ids a full resync found had changed since "
+        "the previous one, from the checksums it stored"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", help="Sync run id (default: the latest)")
+        parser.add_argument(
+            "--group",
+            type=int,
+            default=100,
+            help="Blocks per line of the changed block listing",
+        )
+
+    def handle(self, *args, **options):
+        report = change_report(options["run"])
+        if not report["checked"]:
+            raise CommandError("No checksums stored by a full resync for that run")
+
+        size = settings.TAG_CHECKSUM_RANGE
+        self.stdout.write(
+            f"Run {report['run_id']}: checked {report['checked']:,} blocks of "
+            f"{size:,} tag ids; {report['changed']:,} changed, {report['new']:,} "
+            f"new, {report['emptied']:,} emptied, "
+            f"{report['checked'] - len(report['ranges']):,} unchanged"
+        )
+
+        span = size * options["group"]
+        groups = {}
+        for start, tag_count in report["ranges"]:
+            blocks, tags = groups.get(start // span, (0, 0))
+            groups[start // span] = (blocks + 1, tags + tag_count)
+        for group, (blocks, tags) in sorted(groups.items()):
+            self.stdout.write(
+                f"  ids {group * span:>11,}-{(group + 1) * span - 1:<11,} "
+                f"{blocks:>4} of {options['group']} blocks changed ({tags:,} tags now)"
+            )
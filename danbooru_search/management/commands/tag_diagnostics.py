@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from asgiref.sync import async_to_sync
+from danbooru_search.views import get_actual_count, get_letter_distribution
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the full-table tag diagnostics (count, recent tags, letter distribution)"
+    )
+
+    def handle(self, *args, **options):
+        async_to_sync(get_actual_count)()
+        async_to_sync(get_letter_distribution)()
@@ -0,0 +1,149 @@
+import gzip
+import re
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .services import metrics
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without the brotli package
+    brotli = None
+
+re_accepts_br = re.compile(r"\bbr\b")
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Brotli or gzip compression for larger responses.
+
+    Small responses (most autocomplete results) are sent as-is, since
+    compressing a few hundred bytes costs more CPU than it saves on the
+    wire; responses of at least COMPRESSION_MIN_BYTES, and all streaming
+    responses, are compressed with the best encoding the client accepts.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code != 200:
+            return response
+
+        accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is not None and re_accepts_br.search(accept):
+            encoding = "br"
+        elif re_accepts_gzip.search(accept):
+            encoding = "gzip"
+        else:
+            return response
+
+        if response.streaming:
+            # An async stream stays async, so an ASGI server sends each chunk
+            # as it is produced instead of collecting the whole body first
+            compress = (
+                self._compress_async_stream
+                if getattr(response, "is_async", False)
+                else self._compress_stream
+            )
+            response.streaming_content = compress(response.streaming_content, encoding)
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_BYTES:
+                return response
+            start = time.perf_counter()
+            compressed = self._compress(response.content, encoding)
+            metrics.FUNCTION_SECONDS.observe(
+                time.perf_counter() - start, function="compress"
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            metrics.RESPONSE_BYTES.inc(len(response.content), stage="uncompressed")
+            metrics.RESPONSE_BYTES.inc(len(compressed), stage=encoding)
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def _compress(self, content, encoding):
+        if encoding == "br":
+            return brotli.compress(content, quality=settings.BROTLI_QUALITY)
+        return gzip.compress(content, compresslevel=settings.GZIP_LEVEL, mtime=0)
+
+    def _compress_stream(self, chunks, encoding):
+        compressor = self._stream_compressor(encoding)
+        for chunk in chunks:
+            data = self._compress_chunk(compressor, chunk, encoding)
+            if data:
+                yield data
+        yield self._finish_stream(compressor, encoding)
+
+    async def _compress_async_stream(self, chunks, encoding):
+        compressor = self._stream_compressor(encoding)
+        async for chunk in chunks:
+            data = self._compress_chunk(compressor, chunk, encoding)
+            if data:
+                yield data
+        yield self._finish_stream(compressor, encoding)
+
+    def _stream_compressor(self, encoding):
+        if encoding == "br":
+            return brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        return _GzipStream(settings.GZIP_LEVEL)
+
+    def _compress_chunk(self, compressor, chunk, encoding):
+        metrics.RESPONSE_BYTES.inc(len(chunk), stage="uncompressed")
+        # Flush per chunk so streamed rows and events reach the client
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            metrics.RESPONSE_BYTES.inc(len(data), stage=encoding)
+        return data
+
+    def _finish_stream(self, compressor, encoding):
+        data = compressor.finish()
+        metrics.RESPONSE_BYTES.inc(len(data), stage=encoding)
+        return data
+
+
+class _GzipStream:
+    """Incremental gzip writer with the same interface as brotli.Compressor"""
+
+    def __init__(self, level):
+        self._buffer = _Buffer()
+        self._file = gzip.GzipFile(
+            mode="wb", compresslevel=level, fileobj=self._buffer, mtime=0
+        )
+
+    def process(self, data):
+        self._file.write(data)
+        return self._buffer.read()
+
+    def flush(self):
+        self._file.flush()
+        return self._buffer.read()
+
+    def finish(self):
+        self._file.close()
+        return self._buffer.read()
+
+
+class _Buffer:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+
+    def read(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+    def flush(self):
+        pass
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('danbooru_search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='updatestatus',
+            name='ids_per_second',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='updatestatus',
+            name='last_tag_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='updatestatus',
+            name='max_tag_id',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0002_update_status_cursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("danbooru_id", models.IntegerField(unique=True)),
+                ("antecedent_name", models.CharField(db_index=True, max_length=255)),
+                ("consequent_name", models.CharField(max_length=255)),
+                ("status", models.CharField(default="active", max_length=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TagImplication",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("danbooru_id", models.IntegerField(unique=True)),
+                ("antecedent_name", models.CharField(db_index=True, max_length=255)),
+                ("consequent_name", models.CharField(max_length=255)),
+                ("status", models.CharField(default="active", max_length=20)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="updatestatus",
+            name="last_alias_id",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="updatestatus",
+            name="last_implication_id",
+            field=models.IntegerField(default=0),
+        ),
+    ]
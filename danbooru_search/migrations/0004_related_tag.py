@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0003_tag_aliases_implications"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tag_name", models.CharField(db_index=True, max_length=255)),
+                ("related_name", models.CharField(max_length=255)),
+                ("score", models.FloatField()),
+            ],
+        ),
+    ]
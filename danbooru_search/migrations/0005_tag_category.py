@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0004_related_tag"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="category",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "general"),
+                    (1, "artist"),
+                    (3, "copyright"),
+                    (4, "character"),
+                    (5, "meta"),
+                ],
+                db_default=0,
+                default=0,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["category", "-post_count"],
+                name="danbooru_se_categor_d69494_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0005_tag_category"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RejectedTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("deprecated", "Deprecated"),
+                            ("typo", "Possible typo"),
+                            ("unknown_words", "No known words"),
+                            ("invalid", "Invalid name"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("details", models.TextField(blank=True, default="")),
+                ("post_count", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "general"),
+                            (1, "artist"),
+                            (3, "copyright"),
+                            (4, "character"),
+                            (5, "meta"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("sync_run_id", models.CharField(db_index=True, max_length=32)),
+                (
+                    "rejected_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-post_count"], name="danbooru_se_post_co_0e980a_idx"
+                    ),
+                    models.Index(
+                        fields=["reason", "-post_count"],
+                        name="danbooru_se_reason_bce1b7_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0006_rejected_tag"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IntegrityCheck",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "checked_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[
+                            ("indexes", "Index presence and row count"),
+                            ("quick", "PRAGMA quick_check"),
+                            ("full", "PRAGMA integrity_check"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("ok", models.BooleanField()),
+                ("tag_count", models.IntegerField()),
+                ("duration", models.FloatField()),
+                ("problems", models.JSONField(default=list)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0007_integrity_check"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClusteredTag",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("post_count", models.IntegerField()),
+                ("category", models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                "managed": False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE TABLE danbooru_search_clusteredtag ("
+                "name TEXT NOT NULL PRIMARY KEY COLLATE NOCASE, "
+                "post_count INTEGER NOT NULL, "
+                "category INTEGER NOT NULL DEFAULT 0"
+                ") WITHOUT ROWID"
+            ),
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS clustered_tag_insert",
+                "DROP TRIGGER IF EXISTS clustered_tag_update",
+                "DROP TRIGGER IF EXISTS clustered_tag_delete",
+                "DROP TABLE danbooru_search_clusteredtag",
+            ],
+        ),
+    ]
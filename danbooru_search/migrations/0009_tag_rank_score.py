@@ -0,0 +1,120 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:53
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of services.tag_ranking.scorer() and the services.clustered_tags
+# triggers as of this migration, which must not change with the live code
+CATEGORY_NAMES = {0: "general", 1: "artist", 3: "copyright", 4: "character", 5: "meta"}
+COLUMNS = "name, post_count, category, rank_score"
+
+
+def rank_score(weights):
+    per_post = weights.get("post_count", 0.0)
+    per_char = weights.get("length", 0.0)
+    by_name = weights.get("category", {})
+    by_category = {id: by_name.get(name, 0.0) for id, name in CATEGORY_NAMES.items()}
+
+    def score(name, post_count, category):
+        return (
+            per_post * math.log1p(max(post_count, 0))
+            - per_char * len(name)
+            + by_category.get(category, 0.0)
+        )
+
+    return score
+
+
+def trigger_sql(tag_table, clustered_table):
+    return [
+        f'CREATE TRIGGER clustered_tag_insert AFTER INSERT ON "{tag_table}" BEGIN '
+        f'INSERT OR REPLACE INTO "{clustered_table}" ({COLUMNS}) '
+        "VALUES (new.name, new.post_count, new.category, new.rank_score); END",
+        f"CREATE TRIGGER clustered_tag_update AFTER UPDATE OF {COLUMNS} "
+        f'ON "{tag_table}" BEGIN '
+        f'DELETE FROM "{clustered_table}" WHERE name = old.name; '
+        f'INSERT OR REPLACE INTO "{clustered_table}" ({COLUMNS}) '
+        "VALUES (new.name, new.post_count, new.category, new.rank_score); END",
+        f'CREATE TRIGGER clustered_tag_delete AFTER DELETE ON "{tag_table}" BEGIN '
+        f'DELETE FROM "{clustered_table}" WHERE name = old.name; END',
+    ]
+
+
+def rank_existing_tags(apps, schema_editor):
+    """
+    Score every tag with the current TAG_RANK_WEIGHTS and, if the clustered
+    tag copy is maintained, refill it and recreate its triggers with the
+    new column. Written against the historical models and this migration's
+    connection, not the live services.
+    """
+    tag_table = apps.get_model("danbooru_search", "Tag")._meta.db_table
+    clustered_table = apps.get_model("danbooru_search", "ClusteredTag")._meta.db_table
+    connection = schema_editor.connection
+    connection.ensure_connection()
+    connection.connection.create_function(
+        "rank_score", 3, rank_score(settings.TAG_RANK_WEIGHTS), deterministic=True
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{tag_table}" SET rank_score = '
+            "rank_score(name, post_count, category)"
+        )
+        # Adding the column rebuilt the tag table, dropping the triggers; a
+        # filled copy (disabling empties it) tells that they were installed
+        cursor.execute(f'SELECT 1 FROM "{clustered_table}" LIMIT 1')
+        if cursor.fetchone() is None:
+            return
+        for name in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS clustered_tag_{name}")
+        cursor.execute(f'DELETE FROM "{clustered_table}"')
+        cursor.execute(
+            f'INSERT INTO "{clustered_table}" ({COLUMNS}) '
+            f'SELECT {COLUMNS} FROM "{tag_table}" ORDER BY name'
+        )
+        for sql in trigger_sql(tag_table, clustered_table):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0008_clustered_tag"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="rank_score",
+            field=models.FloatField(db_default=0.0, default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["-rank_score"], name="danbooru_se_rank_sc_1f164f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["category", "-rank_score"],
+                name="danbooru_se_categor_b0ebaa_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="clusteredtag",
+            name="rank_score",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "ALTER TABLE danbooru_search_clusteredtag "
+                "ADD COLUMN rank_score REAL NOT NULL DEFAULT 0"
+            ),
+            reverse_sql=(
+                "ALTER TABLE danbooru_search_clusteredtag DROP COLUMN rank_score"
+            ),
+        ),
+        migrations.RunPython(rank_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0009_tag_rank_score"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagRangeChecksum",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("range_start", models.IntegerField(unique=True)),
+                ("checksum", models.BigIntegerField()),
+                ("tag_count", models.IntegerField()),
+                ("rules", models.CharField(max_length=16)),
+                ("first_run_id", models.CharField(max_length=32)),
+                ("changed_run_id", models.CharField(db_index=True, max_length=32)),
+                ("checked_run_id", models.CharField(db_index=True, max_length=32)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0010_tag_range_checksum"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagFilter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("bits", models.BinaryField()),
+                ("max_tag_id", models.IntegerField()),
+                ("tag_count", models.IntegerField()),
+                ("built_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("danbooru_search", "0011_tag_filter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="updatestatus",
+            name="start_tag_id",
+            field=models.IntegerField(default=0),
+        ),
+    ]
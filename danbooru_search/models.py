@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
 
+from .services.progress_tracker import range_percentage
+
 
 class UpdateStatus(models.Model):
     total_tags = models.IntegerField(default=0)
@@ -9,15 +11,31 @@ class UpdateStatus(models.Model):
     start_time = models.DateTimeField(null=True)
     last_backup = models.DateTimeField(null=True)
     is_updating = models.BooleanField(default=False)
+    # Cursor paging state: tag id the running sync started after, highest
+    # Danbooru tag id synced and the newest id seen
+    start_tag_id = models.IntegerField(default=0)
+    last_tag_id = models.IntegerField(default=0)
+    max_tag_id = models.IntegerField(default=0)
+    # Highest Danbooru alias/implication ids synced
+    last_alias_id = models.IntegerField(default=0)
+    last_implication_id = models.IntegerField(default=0)
+    ids_per_second = models.FloatField(default=0)
 
     @property
     def progress_percentage(self):
+        if self.max_tag_id > 0:
+            return range_percentage(
+                self.start_tag_id, self.last_tag_id, self.max_tag_id
+            )
         return (
             (self.processed_tags / self.total_tags * 100) if self.total_tags > 0 else 0
         )
 
     @property
     def estimated_time_remaining(self):
+        if self.max_tag_id > 0 and self.ids_per_second > 0:
+            return max(self.max_tag_id - self.last_tag_id, 0) / self.ids_per_second
+
         if not self.start_time or self.processed_tags == 0:
             return None
 
@@ -28,9 +46,24 @@ class UpdateStatus(models.Model):
         return remaining_tags / tags_per_second if tags_per_second > 0 else None
 
 
+# Danbooru tag category ids
+TAG_CATEGORIES = [
+    (0, "general"),
+    (1, "artist"),
+    (3, "copyright"),
+    (4, "character"),
+    (5, "meta"),
+]
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=255, unique=True)
     post_count = models.IntegerField()
+    category = models.PositiveSmallIntegerField(
+        choices=TAG_CATEGORIES, default=0, db_default=0
+    )
+    # Query-independent part of the search ranking (services.tag_ranking)
+    rank_score = models.FloatField(default=0.0, db_default=0.0)
     created_at = models.DateTimeField(default=timezone.now)
     last_update_page = models.IntegerField(default=0)
 
@@ -38,12 +71,181 @@ class Tag(models.Model):
         indexes = [
             models.Index(fields=["name"]),
             models.Index(fields=["-post_count"]),
+            models.Index(fields=["category", "-post_count"]),
+            models.Index(fields=["-rank_score"]),
+            models.Index(fields=["category", "-rank_score"]),
         ]
 
     def __str__(self):
         return self.name
 
 
+class ClusteredTag(models.Model):
+    """
+    Copy of the tag table stored WITHOUT ROWID, clustered on the name
+    compared case-insensitively, so a prefix is one contiguous range. Kept
+    in step with Tag by triggers while the clustered layout is enabled (see
+    services.clustered_tags).
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    post_count = models.IntegerField()
+    category = models.PositiveSmallIntegerField(default=0)
+    rank_score = models.FloatField(default=0.0)
+
+    class Meta:
+        # Created by migration 0008: Django cannot declare WITHOUT ROWID
+        managed = False
+
+    def __str__(self):
+        return self.name
+
+
+class TagAlias(models.Model):
+    """A Danbooru tag alias: antecedent_name is replaced by consequent_name"""
+
+    danbooru_id = models.IntegerField(unique=True)
+    antecedent_name = models.CharField(max_length=255, db_index=True)
+    consequent_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, default="active")
+
+    def __str__(self):
+        return f"{self.antecedent_name} -> {self.consequent_name}"
+
+
+class TagImplication(models.Model):
+    """A Danbooru tag implication: antecedent_name implies consequent_name"""
+
+    danbooru_id = models.IntegerField(unique=True)
+    antecedent_name = models.CharField(max_length=255, db_index=True)
+    consequent_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, default="active")
+
+    def __str__(self):
+        return f"{self.antecedent_name} => {self.consequent_name}"
+
+
+class RelatedTag(models.Model):
+    """One of a tag's top co-occurring tags, rebuilt from a sample of posts"""
+
+    tag_name = models.CharField(max_length=255, db_index=True)
+    related_name = models.CharField(max_length=255)
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.tag_name} ~ {self.related_name}"
+
+
+# check_tag() rejection reason codes
+REJECTION_CODES = [
+    ("deprecated", "Deprecated"),
+    ("typo", "Possible typo"),
+    ("unknown_words", "No known words"),
+    ("invalid", "Invalid name"),
+]
+
+
+class RejectedTag(models.Model):
+    """
+    A Danbooru tag the sync turned away, and why. One row per tag name; a
+    later sync that rejects the same tag again replaces it.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    reason = models.CharField(max_length=20, choices=REJECTION_CODES)
+    details = models.TextField(blank=True, default="")
+    post_count = models.IntegerField(default=0)
+    category = models.PositiveSmallIntegerField(choices=TAG_CATEGORIES, default=0)
+    # TagLogger.start_run() id of the sync that rejected the tag
+    sync_run_id = models.CharField(max_length=32, db_index=True)
+    rejected_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-post_count"]),
+            models.Index(fields=["reason", "-post_count"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.reason})"
+
+
+class AcceptedTag(models.Model):
+    """
+    A tag name accepted by hand (a promoted rejection). Validation accepts
+    it before applying any other rule, so later syncs keep it.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    accepted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
+class IntegrityCheck(models.Model):
+    """The outcome of one services.integrity.run_check() run"""
+
+    checked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    mode = models.CharField(
+        max_length=10,
+        choices=[
+            ("indexes", "Index presence and row count"),
+            ("quick", "PRAGMA quick_check"),
+            ("full", "PRAGMA integrity_check"),
+        ],
+    )
+    ok = models.BooleanField()
+    tag_count = models.IntegerField()
+    duration = models.FloatField()
+    problems = models.JSONField(default=list)
+
+    def __str__(self):
+        return (
+            f"{self.mode} check at {self.checked_at}: {'ok' if self.ok else 'failed'}"
+        )
+
+
+class TagRangeChecksum(models.Model):
+    """
+    A checksum of the Danbooru tags in one block of ids, as of the last full
+    resync (see services.range_checksums). A later resync skips revalidating
+    the tags of a block whose checksum has not changed.
+    """
+
+    # First tag id of the block (a multiple of TAG_CHECKSUM_RANGE)
+    range_start = models.IntegerField(unique=True)
+    checksum = models.BigIntegerField()
+    tag_count = models.IntegerField()
+    # Fingerprint of the word list the block's tags were validated against
+    rules = models.CharField(max_length=16)
+    # TagLogger.start_run() ids of the syncs that first saw the block, last
+    # found it changed and last checked it
+    first_run_id = models.CharField(max_length=32)
+    changed_run_id = models.CharField(max_length=32, db_index=True)
+    checked_run_id = models.CharField(max_length=32, db_index=True)
+
+    def __str__(self):
+        return f"tag ids from {self.range_start} ({self.tag_count} tags)"
+
+
+class TagFilter(models.Model):
+    """
+    A named set of tags searches can leave out (settings.TAG_FILTERS),
+    materialized by the sync as a bitset over tag ids (services.tag_filters)
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    # Bit i (little-endian) is set when tag id i is in the filter
+    bits = models.BinaryField()
+    max_tag_id = models.IntegerField()
+    tag_count = models.IntegerField()
+    built_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.tag_count} tags)"
+
+
 class CommonWord(models.Model):
     word = models.CharField(max_length=100, unique=True)
     category = models.CharField(
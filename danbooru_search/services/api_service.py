@@ -1,31 +1,86 @@
 import aiohttp
 import ssl
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
+from django.conf import settings
+
+from . import metrics
+from .fast_json import loads
+from .tag_records import TAG_FIELDS
 
 
 class DanbooruAPI:
-    BASE_URL = "https://danbooru.donmai.us"
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None, max_retries: int = 5):
+        self.base_url = (base_url or settings.DANBOORU_BASE_URL).rstrip("/")
+        self.max_retries = max_retries
         self.ssl_context = ssl.create_default_context()
         self.timeout = aiohttp.ClientTimeout(total=60)
 
-    async def get_tags_page(self, page: int, limit: int = 1000) -> List[Dict[str, Any]]:
-        """Fetch a page of tags from the API"""
+    async def _get(
+        self, endpoint: str, params: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """GET /<endpoint>.json, retrying rate-limit and server errors with backoff"""
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ssl=self.ssl_context), timeout=self.timeout
+        ) as session:
+            for attempt in range(self.max_retries + 1):
+                async with session.get(
+                    f"{self.base_url}/{endpoint}.json", params=params, timeout=30
+                ) as response:
+                    if response.status == 410:
+                        return None  # End of results
+                    if (
+                        response.status in self.RETRY_STATUSES
+                        and attempt < self.max_retries
+                    ):
+                        metrics.SYNC_API_RETRIES.inc(status=response.status)
+                        delay = response.headers.get("Retry-After", 2**attempt)
+                        await asyncio.sleep(min(float(delay), 60))
+                        continue
+                    response.raise_for_status()
+                    return loads(await response.read())
+
+    @metrics.timed(function="get_tags_page")
+    async def get_tags_page(
+        self, page: Union[int, str], limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch a page of tags from the API (page may be a cursor like "a123"),
+        with only the fields the sync uses
+        """
         params = {
             "page": page,
             "limit": limit,
             "search[order]": "id_asc",
+            "only": ",".join(TAG_FIELDS),
         }
+        return await self._get("tags", params)
 
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=self.ssl_context), timeout=self.timeout
-        ) as session:
-            async with session.get(
-                f"{self.BASE_URL}/tags.json", params=params, timeout=30
-            ) as response:
-                if response.status == 410:
-                    return None  # End of tags
-                response.raise_for_status()
-                return await response.json()
+    async def get_max_tag_id(self) -> int:
+        """Return the id of the newest tag"""
+        tags = await self._get("tags", {"limit": 1, "search[order]": "id_desc"})
+        return tags[0]["id"] if tags else 0
+
+    @metrics.timed(function="get_relations_page")
+    async def get_relations_page(
+        self, endpoint: str, page: Union[int, str], limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Fetch a page of tag_aliases or tag_implications, in id order"""
+        params = {
+            "page": page,
+            "limit": limit,
+            "search[order]": "id_asc",
+        }
+        return await self._get(endpoint, params)
+
+    @metrics.timed(function="get_posts_page")
+    async def get_posts_page(
+        self, page: Optional[Union[int, str]] = None, limit: int = 200
+    ) -> List[Dict[str, Any]]:
+        """Fetch the newest posts (or those before a b<id> cursor), ids and tags only"""
+        params = {"limit": limit, "only": "id,tag_string"}
+        if page is not None:
+            params["page"] = page
+        return await self._get("posts", params)
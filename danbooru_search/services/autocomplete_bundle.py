@@ -0,0 +1,197 @@
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import TAG_CATEGORIES, Tag, TagAlias
+from .search_cursor import DEFAULT_LIMIT
+from .search_index import data_version
+
+try:
+    import brotli
+except ImportError:  # Only a .gz copy is written without the brotli package
+    brotli = None
+
+FORMAT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+BUNDLE_NAME = re.compile(r"tags\.[0-9a-f]{12}\.txt")
+
+_manifest = None
+_manifest_mtime = None
+_rebuilding = False
+_state_lock = threading.Lock()
+
+
+def encode_bundle(rows, weights=None, aliases=()):
+    """
+    Pack (name, post_count, category, score) rows as front-coded text sorted
+    by name, followed by the alias names the browser must leave to the
+    server.
+
+    The first line is "#<format version>\t<tag count>\t<lowest score>\t<rank
+    weights as JSON, categories by id>"; every tag line is "<chars shared
+    with previous name>\t<rest of name>\t<post count>\t<category>" and
+    every alias line "@<alias>". The browser recomputes scores from the
+    weights. Tag names contain no whitespace, and sorted names share long
+    prefixes, so this is small even before compression.
+    """
+    weights = dict(weights or settings.TAG_RANK_WEIGHTS)
+    by_name = weights.get("category", {})
+    weights["category"] = {
+        id: by_name[name] for id, name in TAG_CATEGORIES if name in by_name
+    }
+    rows = sorted((name.lower(), *rest) for name, *rest in rows)
+    min_score = min((score for _, _, _, score in rows), default=0)
+    lines = [
+        f"#{FORMAT_VERSION}\t{len(rows)}\t{min_score!r}\t"
+        + json.dumps(weights, separators=(",", ":"))
+    ]
+    previous = ""
+    for name, post_count, category, _ in rows:
+        shared = len(os.path.commonprefix((previous, name)))
+        lines.append(f"{shared}\t{name[shared:]}\t{post_count}\t{category}")
+        previous = name
+    lines.extend(f"@{alias}" for alias in sorted(aliases))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def local_aliases(names, aliases, limit=DEFAULT_LIMIT):
+    """
+    Aliases among the queries the browser would answer from sorted names (at
+    least a page of matches): the server puts their canonical tag first
+    """
+    local = []
+    for alias in aliases:
+        lo = bisect.bisect_left(names, alias)
+        hi = bisect.bisect_left(names, alias + "\uffff", lo)
+        if hi - lo >= limit:
+            local.append(alias)
+    return local
+
+
+def build_bundle(size=None, directory=None):
+    """
+    Write the top size tags by rank score as a content-hashed bundle, with
+    pre-compressed .br/.gz copies, and point the manifest at it along with
+    the data version it was built from. The previous bundle is kept for
+    pages loaded before the rebuild; older ones are removed.
+    """
+    size = size or settings.AUTOCOMPLETE_BUNDLE_SIZE
+    directory = directory or settings.AUTOCOMPLETE_BUNDLE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Read first: a change made during the build leaves the bundle stale
+    version = data_version()
+    rows = list(
+        Tag.objects.order_by("-rank_score").values_list(
+            "name", "post_count", "category", "rank_score"
+        )[:size]
+    )
+    names = sorted(name.lower() for name, *_ in rows)
+    aliases = TagAlias.objects.filter(status="active").values_list(
+        "antecedent_name", flat=True
+    )
+    data = encode_bundle(rows, aliases=local_aliases(names, aliases.iterator()))
+    digest = hashlib.md5(data).hexdigest()[:12]
+    filename = f"tags.{digest}.txt"
+
+    _write(directory / filename, data)
+    _write(directory / f"{filename}.gz", gzip.compress(data, 9, mtime=0))
+    if brotli is not None:
+        _write(directory / f"{filename}.br", brotli.compress(data, quality=11))
+
+    manifest_path = directory / MANIFEST_NAME
+    previous = None
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text()).get("file")
+    keep = {filename, previous}
+    for path in directory.glob("tags.*.txt*"):
+        if path.name.split(".txt")[0] + ".txt" not in keep:
+            path.unlink(missing_ok=True)
+
+    manifest = {
+        "file": filename,
+        "data_version": version,
+        "tags": len(rows),
+        "bytes": len(data),
+        "gzip_bytes": (directory / f"{filename}.gz").stat().st_size,
+    }
+    _write(manifest_path, json.dumps(manifest).encode())
+    return manifest
+
+
+def _write(path, data):
+    # Replaced in one step, as other processes may be reading or rebuilding
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def read_manifest():
+    """The current bundle's manifest, or None before the first build"""
+    global _manifest, _manifest_mtime
+    path = settings.AUTOCOMPLETE_BUNDLE_DIR / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if mtime != _manifest_mtime:
+        _manifest, _manifest_mtime = json.loads(path.read_text()), mtime
+    return _manifest
+
+
+def is_current(manifest):
+    return manifest is not None and manifest.get("data_version") == data_version()
+
+
+def refresh_bundle():
+    """Sync stage: rebuild the bundle unless it matches the data version"""
+    if is_current(read_manifest()):
+        return None
+    return build_bundle()
+
+
+def _refresh_in_background():
+    global _rebuilding
+    with _state_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def run():
+        global _rebuilding
+        try:
+            refresh_bundle()
+        finally:
+            _rebuilding = False
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def current_bundle():
+    """
+    File name of the bundle ("tags.<hash>.txt"), or None while it is older
+    than the tag data: the page then searches on the server, and the bundle
+    is rebuilt in the background for the next page load
+    """
+    manifest = read_manifest()
+    if not is_current(manifest):
+        _refresh_in_background()
+        return None
+    return manifest["file"]
+
+
+def bundle_path(filename, encoding=None):
+    """Path of a bundle file (compressed copy for encoding), or None"""
+    if not BUNDLE_NAME.fullmatch(filename):
+        return None
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+    path = settings.AUTOCOMPLETE_BUNDLE_DIR / f"{filename}{suffix}"
+    return path if path.exists() else None
@@ -1,10 +1,53 @@
 import os
 from pathlib import Path
 from django.conf import settings
+from django.db import connections
 from ..models import Tag
 from asgiref.sync import sync_to_async
 from django.utils import timezone
 import shutil
+import threading
+import time
+
+from .search_index import bump_data_version, data_version
+
+_connection_state = threading.local()
+
+
+def live_database_path():
+    return Path(connections["default"].settings_dict["NAME"])
+
+
+def swap_into_place(new_path, live_path=None):
+    """
+    Atomically replace the live database file with new_path.
+
+    Readers with the old file open keep a consistent view of it until they
+    reconnect; this thread's connections are closed here and other workers
+    reopen theirs once they see the data version bump.
+    """
+    live_path = Path(live_path or live_database_path())
+    connections.close_all()
+    os.replace(new_path, live_path)
+    bump_data_version()
+
+
+def close_connections_if_swapped(**kwargs):
+    """
+    request_started handler: drop this thread's database connections once
+    the data version changes, so a persistent connection never keeps
+    reading a database file that has been swapped out.
+    """
+    now = time.monotonic()
+    if now < getattr(_connection_state, "next_check", 0):
+        return
+    _connection_state.next_check = now + settings.SEARCH_INDEX_CHECK_INTERVAL
+
+    version = data_version()
+    seen = getattr(_connection_state, "version", version)
+    _connection_state.version = version
+    if version != seen:
+        connections.close_all()
 
 
 class BackupService:
@@ -24,6 +67,19 @@ class BackupService:
         )
         return backup_file
 
+    def archive_live_database(self, tag_count):
+        """
+        Keep the current live database as a backup before it is replaced.
+        Hard-links where possible, since the file is about to be unlinked.
+        """
+        timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
+        backup_file = self.backup_path / f"db_backup_{tag_count}_{timestamp}.sqlite3"
+        try:
+            os.link(live_database_path(), backup_file)
+        except OSError:
+            shutil.copy2(live_database_path(), backup_file)
+        return backup_file
+
     async def restore_latest_backup(self):
         """Restore the most recent backup with more tags than current DB"""
         current_count = await sync_to_async(Tag.objects.count)()
@@ -46,7 +102,9 @@ class BackupService:
         if backup_count <= current_count:
             return False, "Current database has more tags than backup"
 
-        await sync_to_async(shutil.copy2)(
-            latest_backup, settings.DATABASES["default"]["NAME"]
-        )
+        # Copy next to the live file first so the swap itself is a rename
+        live_path = live_database_path()
+        restore_path = live_path.with_name(live_path.name + ".restore")
+        await sync_to_async(shutil.copy2)(latest_backup, restore_path)
+        await sync_to_async(swap_into_place)(restore_path, live_path)
         return True, f"Restored backup with {backup_count} tags"
@@ -0,0 +1,131 @@
+import threading
+
+from django.db import connection, transaction
+
+from ..models import ClusteredTag, Tag
+from .search_index import bump_data_version, data_version
+from .tag_ranking import match_bonuses, merge_ranked
+
+CLUSTERED_TABLE = ClusteredTag._meta.db_table
+TAG_TABLE = Tag._meta.db_table
+TRIGGER_PREFIX = "clustered_tag_"
+
+COLUMNS = "name, post_count, category, rank_score"
+
+# Fill the clustered table from the tag table, in key order
+POPULATE_SQL = (
+    f'INSERT OR REPLACE INTO "{CLUSTERED_TABLE}" ({COLUMNS}) '
+    f'SELECT {COLUMNS} FROM "{TAG_TABLE}" ORDER BY name'
+)
+
+TRIGGER_SQL = [
+    f'CREATE TRIGGER {TRIGGER_PREFIX}insert AFTER INSERT ON "{TAG_TABLE}" BEGIN '
+    f'INSERT OR REPLACE INTO "{CLUSTERED_TABLE}" ({COLUMNS}) '
+    "VALUES (new.name, new.post_count, new.category, new.rank_score); END",
+    f"CREATE TRIGGER {TRIGGER_PREFIX}update AFTER UPDATE OF {COLUMNS} "
+    f'ON "{TAG_TABLE}" BEGIN '
+    f'DELETE FROM "{CLUSTERED_TABLE}" WHERE name = old.name; '
+    f'INSERT OR REPLACE INTO "{CLUSTERED_TABLE}" ({COLUMNS}) '
+    "VALUES (new.name, new.post_count, new.category, new.rank_score); END",
+    f'CREATE TRIGGER {TRIGGER_PREFIX}delete AFTER DELETE ON "{TAG_TABLE}" BEGIN '
+    f'DELETE FROM "{CLUSTERED_TABLE}" WHERE name = old.name; END',
+]
+
+# Sorts after any prefix match: no UTF-8 encoded character is greater
+RANGE_END = "\U0010ffff"
+
+_enabled = None
+_enabled_version = None
+_enabled_lock = threading.Lock()
+
+
+def enable():
+    """Fill the clustered table and keep it in step with Tag from now on"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        _drop_triggers(cursor)
+        cursor.execute(f'DELETE FROM "{CLUSTERED_TABLE}"')
+        cursor.execute(POPULATE_SQL)
+        for sql in TRIGGER_SQL:
+            cursor.execute(sql)
+    bump_data_version()
+
+
+def disable():
+    """Stop maintaining the clustered table and empty it"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        _drop_triggers(cursor)
+        cursor.execute(f'DELETE FROM "{CLUSTERED_TABLE}"')
+    bump_data_version()
+
+
+def _drop_triggers(cursor):
+    for name in trigger_names():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def trigger_names():
+    return [sql.split()[2] for sql in TRIGGER_SQL]
+
+
+def is_enabled():
+    """Whether the clustered layout is on, re-read when the data version changes"""
+    global _enabled, _enabled_version
+    version = data_version()
+    if _enabled is None or version != _enabled_version:
+        with _enabled_lock, connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = %s AND name LIKE %s",
+                [TAG_TABLE, f"{TRIGGER_PREFIX}%"],
+            )
+            _enabled = cursor.fetchone()[0] == len(TRIGGER_SQL)
+            _enabled_version = version
+    return _enabled
+
+
+def search(query, category=None, limit=50, after=None):
+    """
+    Prefix search over the clustered table as (name, post_count, score)
+    rows, highest ranked first (ties by name), after an optional (score,
+    name) cursor. Matches like name__istartswith (ASCII case-insensitive),
+    reading only the contiguous range of names that start with query.
+    """
+    exact, word_boundary = match_bonuses()
+    boundary = query + "_"
+    in_range = "name >= %s AND name < %s"
+    groups = [
+        ("name = %s", [query], exact),
+        (in_range, [boundary, boundary + RANGE_END], word_boundary),
+        (
+            f"{in_range} AND name != %s AND NOT ({in_range})",
+            [query, query + RANGE_END, query, boundary, boundary + RANGE_END],
+            0.0,
+        ),
+    ]
+    with connection.cursor() as cursor:
+        return merge_ranked(
+            (
+                _search_group(cursor, where, params, bonus, category, limit, after)
+                for where, params, bonus in groups
+            ),
+            limit,
+        )
+
+
+def _search_group(cursor, where, params, bonus, category, limit, after):
+    """One part of a search, every row sharing the same match bonus"""
+    sql = (
+        f"SELECT name, post_count, rank_score + %s AS score "
+        f'FROM "{CLUSTERED_TABLE}" WHERE {where}'
+    )
+    params = [bonus, *params]
+    if category is not None:
+        sql += " AND category = %s"
+        params.append(category)
+    if after is not None:
+        sql += " AND (rank_score + %s < %s OR (rank_score + %s = %s AND name > %s))"
+        params.extend([bonus, after[0], bonus, after[0], after[1]])
+    sql += " ORDER BY rank_score DESC, name LIMIT %s"
+    params.append(limit)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
@@ -0,0 +1,203 @@
+import asyncio
+import random
+
+from aiohttp import web
+
+from .search_benchmark import COMMON_TAG_WORDS
+
+KNOWN_WORDS = COMMON_TAG_WORDS
+UNKNOWN_WORDS = ["zxqv", "plorb", "gnarsh", "vlemt", "qwyzz", "brrrt"]
+CATEGORIES = [0, 0, 0, 0, 1, 3, 4, 5]
+
+
+class FakeDanbooruServer:
+    """
+    Local stand-in for the Danbooru tags API.
+
+    Serves deterministic tags for ids 1..max_id (a fraction of ids are left
+    out, like deleted tags), supports numeric and a<id>/b<id> cursor paging
+    in id_asc/id_desc order, answers 410 once there is nothing left, and can
+    add latency and inject 429/5xx responses. The only= parameter limits
+    the fields returned, as on Danbooru. Tag aliases and implications
+    are served the same way, one per relation_every tag ids, as are posts
+    whose tags cluster around a topic tag (for related tag sampling).
+    """
+
+    def __init__(
+        self,
+        max_id=100_000,
+        seed=0,
+        latency=0.0,
+        error_rate=0.0,
+        retry_after=0,
+        gap_rate=0.1,
+        unknown_word_rate=0.1,
+        deprecated_rate=0.02,
+        relation_every=20,
+        posts=2000,
+    ):
+        self.max_id = max_id
+        self.seed = seed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.gap_rate = gap_rate
+        self.unknown_word_rate = unknown_word_rate
+        self.deprecated_rate = deprecated_rate
+        self.relation_every = relation_every
+        self.posts = posts
+        self.error_rng = random.Random(seed)
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.runner = None
+
+    def tag(self, tag_id):
+        """The tag payload for an id, or None when that id does not exist"""
+        if tag_id < 1 or tag_id > self.max_id:
+            return None
+        rng = random.Random(f"{self.seed}:{tag_id}")
+        if rng.random() < self.gap_rate:
+            return None
+
+        words = rng.sample(KNOWN_WORDS, rng.randint(1, 3))
+        if rng.random() < self.unknown_word_rate:
+            words.append(rng.choice(UNKNOWN_WORDS))
+        return {
+            "id": tag_id,
+            "name": f"{'_'.join(words)}_({tag_id})",
+            "post_count": int(rng.paretovariate(1.2)) - 1,
+            "category": rng.choice(CATEGORIES),
+            "created_at": "2024-01-01T00:00:00.000-05:00",
+            "updated_at": "2024-01-01T00:00:00.000-05:00",
+            "is_deprecated": rng.random() < self.deprecated_rate,
+            "words": words,
+        }
+
+    def alias(self, alias_id):
+        """An alias of a tag without its underscores ("long_hair" <- "longhair")"""
+        tag = self.tag(alias_id * self.relation_every)
+        if tag is None or "_" not in tag["name"]:
+            return None
+        return {
+            "id": alias_id,
+            "antecedent_name": tag["name"].replace("_", ""),
+            "consequent_name": tag["name"],
+            "status": "deleted" if alias_id % 10 == 0 else "active",
+        }
+
+    def implication(self, implication_id):
+        """An implication from one tag to the next existing tag id"""
+        tag_id = implication_id * self.relation_every
+        tag = self.tag(tag_id)
+        implied = self.tag(tag_id + 1)
+        if tag is None or implied is None:
+            return None
+        return {
+            "id": implication_id,
+            "antecedent_name": tag["name"],
+            "consequent_name": implied["name"],
+            "status": "active",
+        }
+
+    def post(self, post_id):
+        """A post tagged with a run of neighbouring tag ids plus a few random tags"""
+        if post_id < 1 or post_id > self.posts:
+            return None
+        rng = random.Random(f"{self.seed}:post:{post_id}")
+        topic = rng.randint(1, max(self.max_id // 50, 1)) * 50
+        tag_ids = [topic + offset for offset in range(rng.randint(3, 8))]
+        tag_ids += [rng.randint(1, self.max_id) for _ in range(rng.randint(1, 4))]
+        names = [tag["name"] for tag in map(self.tag, tag_ids) if tag]
+        return {"id": post_id, "tag_string": " ".join(sorted(set(names)))}
+
+    def page(self, page, limit, order="id_asc", item=None, max_id=None):
+        """Items (tags by default) for a numeric page or an a<id>/b<id> cursor"""
+        item = item or self.tag
+        max_id = self.max_id if max_id is None else max_id
+        page = str(page)
+        if page.startswith("a"):
+            ids = range(int(page[1:]) + 1, max_id + 1)
+        elif page.startswith("b"):
+            ids = range(min(int(page[1:]), max_id + 1) - 1, 0, -1)
+        else:
+            ids = range(max_id, 0, -1) if order == "id_desc" else range(1, max_id + 1)
+
+        skip = 0 if page[:1] in ("a", "b") else (int(page) - 1) * limit
+        items = []
+        for item_id in ids:
+            found = item(item_id)
+            if found is None:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            items.append(found)
+            if len(items) >= limit:
+                break
+
+        items.sort(key=lambda found: found["id"], reverse=order == "id_desc")
+        return items
+
+    async def handle_tags(self, request):
+        return await self._handle(request, self.tag)
+
+    async def handle_aliases(self, request):
+        return await self._handle(
+            request, self.alias, self.max_id // self.relation_every
+        )
+
+    async def handle_implications(self, request):
+        return await self._handle(
+            request, self.implication, self.max_id // self.relation_every
+        )
+
+    async def handle_posts(self, request):
+        return await self._handle(request, self.post, self.posts)
+
+    async def _handle(self, request, item, max_id=None):
+        self.requests_served += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.error_rng.random() < self.error_rate:
+            self.errors_injected += 1
+            if self.error_rng.random() < 0.5:
+                return web.Response(
+                    status=429, headers={"Retry-After": str(self.retry_after)}
+                )
+            return web.Response(status=self.error_rng.choice([500, 502, 503]))
+
+        limit = min(int(request.query.get("limit", 20)), 1000)
+        order = request.query.get("search[order]", "id_desc")
+        items = self.page(request.query.get("page", "1"), limit, order, item, max_id)
+        if not items:
+            return web.Response(status=410)
+        if "only" in request.query:
+            fields = request.query["only"].split(",")
+            items = [
+                {field: found[field] for field in fields if field in found}
+                for found in items
+            ]
+        return web.json_response(items)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/tags.json", self.handle_tags)
+        app.router.add_get("/tag_aliases.json", self.handle_aliases)
+        app.router.add_get("/tag_implications.json", self.handle_implications)
+        app.router.add_get("/posts.json", self.handle_posts)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving and return the base URL"""
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
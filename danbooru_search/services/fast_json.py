@@ -0,0 +1,50 @@
+import json
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(data):
+    """Encode data as compact JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data):
+    """Decode JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def search_payload(results, compact=False, next_cursor=None):
+    """
+    Response body for (name, post_count, score) search results: a list of
+    {"tag", "times_used"} objects, or [name, post_count] pairs when compact,
+    and the cursor= value for the next page (None on the last page).
+    """
+    if compact:
+        return {
+            "results": [[name, post_count] for name, post_count, _ in results],
+            "next_cursor": next_cursor,
+        }
+    return {
+        "results": [
+            {"tag": name, "times_used": post_count} for name, post_count, _ in results
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse equivalent that accepts data or already encoded bytes"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        content = data if isinstance(data, bytes) else dumps(data)
+        super().__init__(content=content, **kwargs)
@@ -0,0 +1,107 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import IntegrityCheck, Tag
+from . import metrics
+
+TAG_TABLE = Tag._meta.db_table
+MODES = ("indexes", "quick", "full")
+# Rows of PRAGMA quick_check/integrity_check output to keep
+MAX_ERRORS = 20
+
+
+def tag_index_problems(cursor):
+    """
+    Tag indexes missing from the database. The unique index on name is what
+    guarantees there are no duplicate tags, so no scan for them is needed.
+    """
+    problems = []
+    cursor.execute(f'PRAGMA index_list("{TAG_TABLE}")')
+    indexes = {row[1]: bool(row[2]) for row in cursor.fetchall()}
+
+    unique_name = False
+    for name, unique in indexes.items():
+        cursor.execute(f'PRAGMA index_info("{name}")')
+        if unique and [row[2] for row in cursor.fetchall()] == ["name"]:
+            unique_name = True
+    if not unique_name:
+        problems.append("Unique index on tag name is missing")
+
+    for index in Tag._meta.indexes:
+        if index.name not in indexes:
+            problems.append(f"Tag index {index.name} is missing")
+    return problems
+
+
+def run_check(mode="quick"):
+    """
+    Check the database and record the result as an IntegrityCheck.
+
+    Every mode checks that the tag indexes exist and that the tag count has
+    not fallen below INTEGRITY_MIN_ROW_RATIO of the last passing check's.
+    "quick" adds PRAGMA quick_check (page and record structure, O(N)) and
+    "full" PRAGMA integrity_check (also cross-checks every index entry).
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+    start = time.perf_counter()
+    problems = []
+    with connection.cursor() as cursor:
+        if mode != "indexes":
+            pragma = "integrity_check" if mode == "full" else "quick_check"
+            cursor.execute(f"PRAGMA {pragma}({MAX_ERRORS})")
+            rows = [row[0] for row in cursor.fetchall()]
+            if rows != ["ok"]:
+                problems.extend(rows)
+        problems.extend(tag_index_problems(cursor))
+        cursor.execute(f'SELECT COUNT(*) FROM "{TAG_TABLE}"')
+        tag_count = cursor.fetchone()[0]
+
+    previous = IntegrityCheck.objects.filter(ok=True).order_by("-checked_at").first()
+    if previous and tag_count < previous.tag_count * settings.INTEGRITY_MIN_ROW_RATIO:
+        problems.append(
+            f"Tag count fell from {previous.tag_count:,} to {tag_count:,} since "
+            f"the check at {previous.checked_at:%Y-%m-%d %H:%M}"
+        )
+
+    check = IntegrityCheck.objects.create(
+        mode=mode,
+        ok=not problems,
+        tag_count=tag_count,
+        duration=time.perf_counter() - start,
+        problems=problems,
+    )
+    export_metrics(check)
+    return check
+
+
+def export_metrics(check):
+    metrics.INTEGRITY_OK.set(int(check.ok), mode=check.mode)
+    metrics.INTEGRITY_PROBLEMS.set(len(check.problems), mode=check.mode)
+    metrics.INTEGRITY_CHECK_SECONDS.set(round(check.duration, 4), mode=check.mode)
+    metrics.INTEGRITY_LAST_CHECK.set(int(check.checked_at.timestamp()), mode=check.mode)
+
+
+def refresh_metrics():
+    """Set the integrity gauges from the latest check of each mode, whichever process ran it"""
+    for mode in MODES:
+        check = IntegrityCheck.objects.filter(mode=mode).order_by("-checked_at").first()
+        if check is not None:
+            export_metrics(check)
+
+
+def latest_summary():
+    """The latest check as a dict for the status endpoint, or None"""
+    check = IntegrityCheck.objects.order_by("-checked_at").first()
+    if check is None:
+        return None
+    return {
+        "checked_at": check.checked_at.isoformat(),
+        "mode": check.mode,
+        "ok": check.ok,
+        "tag_count": check.tag_count,
+        "duration_seconds": round(check.duration, 3),
+        "problems": check.problems,
+    }
@@ -0,0 +1,299 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        labels = _format_labels(self.labelnames, key)
+        return [f"{self.name}{labels} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+    )
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def get(self, **labels):
+        """Return (count, sum) of the observations for a label set"""
+        state = self._values.get(self._key(labels))
+        if state is None:
+            return 0, 0.0
+        return sum(state[0]), state[1]
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics registry rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own registry, so a scrape reports the
+    worker that answered it.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=None):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+FUNCTION_SECONDS = REGISTRY.histogram(
+    "danbooru_function_duration_seconds",
+    "Wall time of instrumented hot-path functions",
+    ["function"],
+)
+SEARCH_SECONDS = REGISTRY.histogram(
+    "danbooru_search_duration_seconds",
+    "Tag search latency by search mode and query prefix length",
+    ["mode", "prefix_length"],
+)
+SEARCH_CACHE_REQUESTS = REGISTRY.counter(
+    "danbooru_search_cache_requests_total",
+    "Search result cache lookups by outcome",
+    ["result"],
+)
+SEARCH_COALESCED = REGISTRY.counter(
+    "danbooru_search_coalesced_total",
+    "Searches answered by sharing an identical in-flight query",
+)
+SYNC_PAGES = REGISTRY.counter(
+    "danbooru_sync_pages_total",
+    "Tag pages fetched from the Danbooru API",
+)
+SYNC_TAGS = REGISTRY.counter(
+    "danbooru_sync_tags_total",
+    "Tags seen by the sync pipeline by stage "
+    "(fetched, validated, rejected, written, copied)",
+    ["stage"],
+)
+SYNC_RANGES = REGISTRY.counter(
+    "danbooru_sync_ranges_total",
+    "Tag id blocks checked by full resyncs, by checksum result "
+    "(skipped, revalidated, changed, new, emptied)",
+    ["result"],
+)
+SYNC_RELATIONS = REGISTRY.counter(
+    "danbooru_sync_relations_total",
+    "Tag aliases and implications saved by the sync",
+    ["endpoint"],
+)
+SYNC_API_RETRIES = REGISTRY.counter(
+    "danbooru_sync_api_retries_total",
+    "Danbooru API requests retried after a rate-limit or server error",
+    ["status"],
+)
+RESPONSE_BYTES = REGISTRY.counter(
+    "danbooru_response_bytes_total",
+    "Bytes of compressed responses before (uncompressed) and after (gzip, br) encoding",
+    ["stage"],
+)
+DB_WRITE_SECONDS = REGISTRY.histogram(
+    "danbooru_db_write_duration_seconds",
+    "Latency of bulk tag writes",
+)
+SYNC_QUEUE_DEPTH = REGISTRY.gauge(
+    "danbooru_sync_queue_depth",
+    "Items waiting in a sync pipeline queue",
+    ["queue"],
+)
+
+INTEGRITY_OK = REGISTRY.gauge(
+    "danbooru_integrity_ok",
+    "1 if the latest database integrity check passed, 0 if it found problems",
+    ["mode"],
+)
+INTEGRITY_PROBLEMS = REGISTRY.gauge(
+    "danbooru_integrity_problems",
+    "Problems found by the latest database integrity check",
+    ["mode"],
+)
+INTEGRITY_CHECK_SECONDS = REGISTRY.gauge(
+    "danbooru_integrity_check_duration_seconds",
+    "Duration of the latest database integrity check",
+    ["mode"],
+)
+INTEGRITY_LAST_CHECK = REGISTRY.gauge(
+    "danbooru_integrity_last_check_timestamp_seconds",
+    "Unix time of the latest database integrity check",
+    ["mode"],
+)
+
+
+def prefix_length_label(query):
+    """Bucket a query's length so the label set stays small"""
+    return str(len(query)) if len(query) < 6 else "6+"
+
+
+def timed(histogram=FUNCTION_SECONDS, **labels):
+    """Decorator recording a function's wall time, for sync and async functions"""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, **labels)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,96 @@
+import bisect
+import gzip
+import json
+import os
+import re
+
+from django.conf import settings
+
+re_page_file = re.compile(r"^(\d+)-(\d+)\.json\.gz$")
+
+
+class PageStore:
+    """
+    Compressed copies of the raw tag pages fetched from the API.
+
+    Each page is one gzipped JSON file named after the tag id range it
+    covers, written once to a temporary name and renamed into place, so a
+    crash never leaves a partial page. Replaying the store in id order gives
+    the same input the sync saw, without the network.
+
+    A sync drops the pages it is about to fetch again when it starts
+    (start_run), so each tag id is stored once, as last fetched.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.TAG_PAGE_STORE_DIR
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, first_id, last_id):
+        return self.directory / f"{first_id:010d}-{last_id:010d}.json.gz"
+
+    def append(self, tags):
+        """Store one API page of tags; returns its path"""
+        ids = [tag["id"] for tag in tags]
+        path = self.path_for(min(ids), max(ids))
+        tmp_path = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(json.dumps(tags, separators=(",", ":")).encode())
+        os.replace(tmp_path, path)
+        return path
+
+    def start_run(self, after_id):
+        """
+        Make way for a sync fetching the tags after after_id: pages wholly
+        after it are deleted, and a page straddling it is cut back to the
+        ids up to it. Returns the number of pages removed or cut.
+        """
+        changed = 0
+        for first_id, last_id, path in self._files():
+            if last_id <= after_id:
+                continue
+            if first_id <= after_id:
+                self.append([tag for tag in self.read(path) if tag["id"] <= after_id])
+            path.unlink()
+            changed += 1
+        return changed
+
+    def _files(self):
+        files = []
+        for path in self.directory.iterdir():
+            match = re_page_file.match(path.name)
+            if match:
+                files.append((int(match.group(1)), int(match.group(2)), path))
+        return files
+
+    def ranges(self):
+        """
+        (first_id, last_id, path) of every stored page, in id order. Of pages
+        whose ranges overlap (left by syncs before start_run existed) only
+        the most recently written is kept.
+        """
+        files = sorted(
+            self._files(), key=lambda page: page[2].stat().st_mtime, reverse=True
+        )
+        ranges = []
+        for page in files:
+            i = bisect.bisect(ranges, page)
+            if (i and ranges[i - 1][1] >= page[0]) or (
+                i < len(ranges) and ranges[i][0] <= page[1]
+            ):
+                continue
+            ranges.insert(i, page)
+        return ranges
+
+    @staticmethod
+    def read(path):
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read())
+
+    def __iter__(self):
+        for _, _, path in self.ranges():
+            yield self.read(path)
+
+    def size(self):
+        """Total bytes on disk"""
+        return sum(path.stat().st_size for _, _, path in self.ranges())
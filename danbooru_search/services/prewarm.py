@@ -0,0 +1,79 @@
+import gc
+import time
+
+from django.db import connections
+
+from . import search_index
+from .related_tags import get_related_table
+from .search_cursor import DEFAULT_LIMIT
+
+# Prefixes up to this long are warmed when their slice is memoized
+WARM_PREFIX_LENGTH = 2
+
+
+def hot_prefixes(index, max_length=WARM_PREFIX_LENGTH):
+    """
+    Prefixes of up to max_length characters whose slice is large enough for
+    the index to memoize - the broad queries every worker answers first
+    """
+    prefixes = []
+    for length in range(1, max_length + 1):
+        for prefix in sorted({name[:length] for name in index.names}):
+            lo, hi = index.prefix_range(prefix)
+            if hi - lo >= index.MEMO_THRESHOLD:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def prewarm():
+    """
+    Build the search index (which warms the most frequently logged
+    queries) and related tag table and encode the first page of every hot
+    prefix, so a preforking server does it once in the master and its
+    workers share the result. Returns a summary dict.
+    """
+    start = time.perf_counter()
+    index = search_index.get_index(build=True)
+    prefixes = hot_prefixes(index)
+    for prefix in prefixes:
+        index.search_json(prefix, DEFAULT_LIMIT)
+    related = get_related_table()
+    # Forked children must open their own database connections
+    connections.close_all()
+    return {
+        "tags": len(index),
+        "prefixes": len(prefixes),
+        "queries": index.warmed,
+        "related_tags": len(related),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def freeze():
+    """
+    Move every object allocated so far out of the collector's reach, so
+    collections in forked workers don't write to (and so copy) the pages
+    they share with the master. Returns the number of frozen objects.
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def process_memory(pid="self"):
+    """
+    Rss, Pss, Shared_* and Private_* of a process in bytes, from Linux's
+    /proc/<pid>/smaps_rollup, or None where that is unavailable. Pss splits
+    each shared page between the processes sharing it, so summing it over
+    a master and its workers gives their real combined footprint.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    memory = {}
+    for line in lines[1:]:
+        field, value, *_ = line.split()
+        memory[field.rstrip(":")] = int(value) * 1024
+    return memory
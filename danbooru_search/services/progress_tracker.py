@@ -0,0 +1,184 @@
+import threading
+import time
+
+from django.utils import timezone
+
+
+class SyncProgressTracker:
+    """
+    In-memory progress of the running tag sync.
+
+    Progress is measured over Danbooru tag ids: the sync pages through ids in
+    ascending order with a cursor, so the remaining work is the id range
+    between the cursor and the newest tag id. Throughput is an exponentially
+    weighted moving average so the ETA follows the current rate rather than
+    the average since the start of the run.
+    """
+
+    def __init__(self, alpha=0.2, save_interval=5.0):
+        self.alpha = alpha
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.is_updating = False
+        self.started_at = None
+        self.finished_at = None
+        self.pages = 0
+        self.tags_processed = 0
+        self.tags_saved = 0
+        self.start_tag_id = 0
+        self.last_tag_id = 0
+        self.max_tag_id = 0
+        self.ids_per_second = None
+        self.tags_per_second = None
+        self._last_page_time = None
+        self._last_save_time = None
+
+    def start(self, start_tag_id, max_tag_id):
+        with self._lock:
+            self._reset()
+            self.is_updating = True
+            self.started_at = timezone.now()
+            self.start_tag_id = start_tag_id
+            self.last_tag_id = start_tag_id
+            self.max_tag_id = max(max_tag_id, start_tag_id)
+            self._last_page_time = time.monotonic()
+
+    def _smooth(self, previous, sample):
+        if previous is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * previous
+
+    def record_page(self, last_tag_id, fetched, saved):
+        """Record a finished page whose highest tag id is last_tag_id"""
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._last_page_time if self._last_page_time else 0
+            advanced = max(last_tag_id - self.last_tag_id, 0)
+
+            self.pages += 1
+            self.tags_processed += fetched
+            self.tags_saved += saved
+            self.last_tag_id = max(last_tag_id, self.last_tag_id)
+            # Tags created during the sync can push the newest id past the start value
+            self.max_tag_id = max(self.max_tag_id, self.last_tag_id)
+
+            if elapsed > 0:
+                self.ids_per_second = self._smooth(
+                    self.ids_per_second, advanced / elapsed
+                )
+                self.tags_per_second = self._smooth(
+                    self.tags_per_second, fetched / elapsed
+                )
+            self._last_page_time = now
+
+    def finish(self):
+        with self._lock:
+            self.is_updating = False
+            self.finished_at = timezone.now()
+
+    def should_save(self):
+        """True at most once every save_interval seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._last_save_time is not None
+                and now - self._last_save_time < self.save_interval
+            ):
+                return False
+            self._last_save_time = now
+            return True
+
+    @property
+    def remaining_ids(self):
+        return max(self.max_tag_id - self.last_tag_id, 0)
+
+    @property
+    def progress_percentage(self):
+        """Share of this run's id range (start_tag_id to max_tag_id) synced"""
+        return range_percentage(self.start_tag_id, self.last_tag_id, self.max_tag_id)
+
+    @property
+    def eta_seconds(self):
+        if not self.ids_per_second:
+            return None
+        return self.remaining_ids / self.ids_per_second
+
+    def apply_to_status(self, status):
+        """Copy progress onto an UpdateStatus row and return the changed fields"""
+        with self._lock:
+            status.processed_tags = self.tags_processed
+            status.start_tag_id = self.start_tag_id
+            status.current_page = self.pages
+            status.last_tag_id = self.last_tag_id
+            status.max_tag_id = self.max_tag_id
+            status.ids_per_second = self.ids_per_second or 0
+            status.is_updating = self.is_updating
+        return [
+            "processed_tags",
+            "start_tag_id",
+            "current_page",
+            "last_tag_id",
+            "max_tag_id",
+            "ids_per_second",
+            "is_updating",
+        ]
+
+    def snapshot(self):
+        with self._lock:
+            eta = self.eta_seconds
+            return {
+                "source": "memory",
+                "is_updating": self.is_updating,
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": (
+                    self.finished_at.isoformat() if self.finished_at else None
+                ),
+                "pages": self.pages,
+                "tags_processed": self.tags_processed,
+                "tags_saved": self.tags_saved,
+                "start_tag_id": self.start_tag_id,
+                "last_tag_id": self.last_tag_id,
+                "max_tag_id": self.max_tag_id,
+                "remaining_ids": self.remaining_ids,
+                "progress_percentage": round(self.progress_percentage, 2),
+                "ids_per_second": self.ids_per_second,
+                "tags_per_second": self.tags_per_second,
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+            }
+
+
+def range_percentage(start_tag_id, last_tag_id, max_tag_id):
+    """How far last_tag_id has got from start_tag_id to max_tag_id, in percent"""
+    if max_tag_id <= start_tag_id:
+        return 100.0 if last_tag_id >= max_tag_id > 0 else 0.0
+    return (
+        min(max(last_tag_id - start_tag_id, 0) / (max_tag_id - start_tag_id), 1) * 100
+    )
+
+
+def status_snapshot(status):
+    """Progress of a sync running in another process, read from its UpdateStatus row"""
+    eta = status.estimated_time_remaining
+    return {
+        "source": "database",
+        "is_updating": status.is_updating,
+        "started_at": status.start_time.isoformat() if status.start_time else None,
+        "finished_at": None,
+        "pages": status.current_page,
+        "tags_processed": status.processed_tags,
+        "tags_saved": None,
+        "start_tag_id": status.start_tag_id,
+        "last_tag_id": status.last_tag_id,
+        "max_tag_id": status.max_tag_id,
+        "remaining_ids": max(status.max_tag_id - status.last_tag_id, 0),
+        "progress_percentage": round(status.progress_percentage, 2),
+        "ids_per_second": status.ids_per_second or None,
+        "tags_per_second": None,
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+    }
+
+
+tracker = SyncProgressTracker()
@@ -0,0 +1,183 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.utils import timezone
+
+# Entries held while the log file can't be written; the oldest go first
+BUFFER_CAPACITY = 10_000
+# A partial batch is written once it is this many seconds old
+FLUSH_INTERVAL = 30.0
+
+_write_lock = threading.Lock()
+
+
+class QueryLog:
+    """
+    Sampled log of first-page searches. A sampled search is appended to an
+    in-memory ring buffer, which is written to the append-only log file in
+    batches, so an unsampled search costs one random() call and a sampled
+    one a deque append.
+    """
+
+    def __init__(self, path=None, sample_rate=None, batch_size=None, max_bytes=None):
+        self.path = settings.SEARCH_QUERY_LOG if path is None else path
+        self.sample_rate = (
+            settings.SEARCH_QUERY_LOG_SAMPLE if sample_rate is None else sample_rate
+        )
+        self.batch_size = batch_size or settings.SEARCH_QUERY_LOG_BATCH
+        self.max_bytes = max_bytes or settings.SEARCH_QUERY_LOG_MAX_BYTES
+        self.buffer = deque(maxlen=BUFFER_CAPACITY)
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.dropped = 0
+
+    def record(self, query, found, category=None, exclude=()):
+        """Log a search, one time in 1 / sample_rate"""
+        if not self.path or random.random() >= self.sample_rate:
+            return
+        entry = {
+            "q": query,
+            "found": found,
+            "at": timezone.now().isoformat(timespec="seconds"),
+        }
+        if category is not None:
+            entry["category"] = category
+        if exclude:
+            entry["exclude"] = sorted(exclude)
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(entry)
+            due = (
+                len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered entries to the log; returns how many were written"""
+        with self.lock:
+            entries = list(self.buffer)
+            self.buffer.clear()
+            self.last_flush = time.monotonic()
+        if not entries:
+            return 0
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        try:
+            with _write_lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    os.replace(self.path, rotated_path(self.path))
+        except OSError as e:
+            print(f"Could not write the search query log: {e}")
+            with self.lock:
+                # Retried with the next batch, newest entries kept
+                self.buffer = deque(entries + list(self.buffer), maxlen=BUFFER_CAPACITY)
+            return 0
+        return len(entries)
+
+
+query_log = QueryLog()
+atexit.register(query_log.flush)
+
+
+def rotated_path(path):
+    """Where a full query log is moved to"""
+    return f"{path}.1"
+
+
+def read_entries(path=None):
+    """
+    Entries of a query log and its rotated predecessor, oldest first; none
+    if there is no log yet. Lines that are not a whole entry (a write cut
+    short) are skipped and counted.
+    """
+    path = path or settings.SEARCH_QUERY_LOG
+    if not path:
+        return
+    skipped = 0
+    for log_path in (rotated_path(path), path):
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(entry, dict) or not isinstance(entry.get("q"), str):
+                    skipped += 1
+                    continue
+                yield entry
+    if skipped:
+        print(f"Skipped {skipped:,} malformed lines in the search query log {path}")
+
+
+def summarize(entries, top=20, min_length=1):
+    """
+    Query counts from log entries: the most frequent queries and, for
+    those that found nothing, the shortest failing prefixes (each counting
+    the failed queries that extend it) - the typos and missing tags
+    """
+    queries = Counter()
+    empty = Counter()
+    lengths = Counter()
+    total = 0
+    for entry in entries:
+        total += 1
+        query = entry["q"]
+        lengths[min(len(query), 5)] += 1
+        if len(query) < min_length:
+            continue
+        queries[query] += 1
+        if not entry.get("found"):
+            empty[query] += 1
+
+    stems = Counter()
+    stem = None
+    for query in sorted(empty):
+        if stem is None or not query.startswith(stem):
+            stem = query
+        stems[stem] += empty[query]
+
+    return {
+        "total": total,
+        "distinct": len(queries),
+        "empty": sum(empty.values()),
+        "lengths": dict(sorted(lengths.items())),
+        "top": queries.most_common(top),
+        "empty_stems": stems.most_common(top),
+    }
+
+
+def hot_queries(limit=None, path=None):
+    """
+    The limit most frequently logged unfiltered queries that found tags,
+    most frequent first; none if the log can't be read, as index builds
+    and server startup warm them
+    """
+    limit = settings.SEARCH_PREWARM_QUERIES if limit is None else limit
+    if not limit:
+        return []
+    try:
+        counts = Counter(
+            entry["q"]
+            for entry in read_entries(path)
+            if entry.get("found") and "category" not in entry and "exclude" not in entry
+        )
+    except OSError as e:
+        print(f"Could not read the search query log: {e}")
+        return []
+    return [query for query, _ in counts.most_common(limit)]
@@ -0,0 +1,174 @@
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+
+from ..models import TagRangeChecksum
+from . import metrics
+
+# Column order of the rows returned by RangeChecksums.finish()
+COLUMNS = (
+    "range_start",
+    "checksum",
+    "tag_count",
+    "rules",
+    "first_run_id",
+    "changed_run_id",
+    "checked_run_id",
+)
+
+
+def checksum(tags):
+    """
+    Signed 64-bit checksum of API tag payloads in id order, over everything
+    the sync validates or stores: id, name, post count, category and the
+    deprecation flag
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for tag in sorted(tags, key=lambda tag: tag["id"]):
+        digest.update(
+            f"{tag['id']}\t{tag['name']}\t{tag.get('post_count', 0)}\t"
+            f"{tag.get('category', 0)}\t{int(bool(tag.get('is_deprecated')))}\n".encode()
+        )
+    return int.from_bytes(digest.digest(), "big", signed=True)
+
+
+def rules_fingerprint(common_words, accepted_names=()):
+    """Fingerprint of the word list and accepted names tags are validated against"""
+    digest = hashlib.blake2b(digest_size=8)
+    for word in sorted(common_words):
+        digest.update(word.encode() + b"\n")
+    if accepted_names:
+        digest.update(b"\0")
+        for name in sorted(accepted_names):
+            digest.update(name.encode() + b"\n")
+    return digest.hexdigest()
+
+
+class RangeChecksums:
+    """
+    Splits a full resync's tag pages into blocks of TAG_CHECKSUM_RANGE ids
+    and compares each block's checksum with the one stored by the last
+    resync. A block whose tags and word list are both unchanged needs no
+    revalidation. Pages arrive in id order, so a block is complete once a
+    page reaches past it.
+    """
+
+    def __init__(
+        self,
+        run_id,
+        common_words,
+        size=None,
+        skip_unchanged=True,
+        accepted_names=(),
+    ):
+        self.run_id = run_id
+        self.rules = rules_fingerprint(common_words, accepted_names)
+        self.size = size or settings.TAG_CHECKSUM_RANGE
+        self.skip_unchanged = skip_unchanged
+        self.previous = {}
+        self.pending = {}
+        self.checked = {}
+        self.counts = Counter()
+
+    def load(self):
+        """Read the checksums stored by the last resync"""
+        self.previous = {
+            row.range_start: row
+            for row in TagRangeChecksum.objects.all()
+            if row.range_start % self.size == 0
+        }
+
+    def range_of(self, tag_id):
+        return tag_id // self.size * self.size
+
+    def add(self, tags):
+        """Buffer a page of tags; returns the (range_start, tags) it completed"""
+        for tag in tags:
+            self.pending.setdefault(self.range_of(tag["id"]), []).append(tag)
+        current = self.range_of(max(tag["id"] for tag in tags))
+        done = sorted(start for start in self.pending if start < current)
+        return [(start, self.pending.pop(start)) for start in done]
+
+    def flush(self):
+        """The blocks still buffered, once the last page has been added"""
+        done = sorted(self.pending)
+        return [(start, self.pending.pop(start)) for start in done]
+
+    def check(self, start, tags):
+        """Record a completed block; True if it can skip revalidation"""
+        value = checksum(tags)
+        before = self.previous.get(start)
+        if before is None:
+            result = "new"
+        elif before.checksum != value:
+            result = "changed"
+        elif before.rules != self.rules or not self.skip_unchanged:
+            result = "revalidated"
+        else:
+            result = "skipped"
+        changed = result in ("new", "changed")
+        self.checked[start] = (
+            start,
+            value,
+            len(tags),
+            self.rules,
+            self.run_id if before is None else before.first_run_id,
+            self.run_id if changed else before.changed_run_id,
+            self.run_id,
+        )
+        self._count(result)
+        return result == "skipped"
+
+    def finish(self):
+        """
+        Rows for every block of the completed resync: the blocks seen, plus
+        those that had tags last time and have none now
+        """
+        for start, before in self.previous.items():
+            if start not in self.checked and before.tag_count:
+                self.checked[start] = (
+                    start,
+                    checksum([]),
+                    0,
+                    self.rules,
+                    before.first_run_id,
+                    self.run_id,
+                    self.run_id,
+                )
+                self._count("emptied")
+        return [self.checked[start] for start in sorted(self.checked)]
+
+    def _count(self, result):
+        self.counts[result] += 1
+        metrics.SYNC_RANGES.inc(result=result)
+
+
+def latest_run_id():
+    """The run id of the last resync that stored checksums, or None"""
+    return (
+        TagRangeChecksum.objects.order_by("-checked_run_id")
+        .values_list("checked_run_id", flat=True)
+        .first()
+    )
+
+
+def change_report(run_id=None):
+    """
+    What a resync (the latest by default) found had moved: counts of blocks
+    checked, changed, new and emptied, and the changed blocks themselves
+    as (range_start, tag_count) pairs
+    """
+    run_id = run_id or latest_run_id()
+    checked = TagRangeChecksum.objects.filter(checked_run_id=run_id)
+    changed = checked.filter(changed_run_id=run_id)
+    return {
+        "run_id": run_id,
+        "checked": checked.count(),
+        "changed": changed.exclude(first_run_id=run_id).filter(tag_count__gt=0).count(),
+        "new": changed.filter(first_run_id=run_id).count(),
+        "emptied": changed.filter(tag_count=0).count(),
+        "ranges": list(
+            changed.order_by("range_start").values_list("range_start", "tag_count")
+        ),
+    }
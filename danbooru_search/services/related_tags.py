@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from ..models import RelatedTag
+from .fast_json import dumps
+from .search_index import bump_data_version, data_version
+
+# A tag's co-occurrence counts are pruned when it has more than
+# PRUNE_FACTOR * top_k candidate neighbours
+PRUNE_FACTOR = 16
+
+
+def top_k_related(tag_strings, top_k=20, min_count=2):
+    """
+    Co-occurrence neighbours from a sample of post tag strings.
+
+    Returns {tag: [(related, score), ...]} with at most top_k neighbours per
+    tag, scored by cosine similarity (co-occurrences / sqrt(count_a *
+    count_b)) over the sample. Tags seen in fewer than min_count posts are
+    left out.
+
+    Co-occurrences are counted per tag while the posts stream past, and a
+    tag's counts are pruned (see _prune) whenever it has more than
+    PRUNE_FACTOR * top_k of them, so memory grows with the vocabulary rather
+    than the number of pairs. A pruned neighbour that turns up again starts
+    counting from zero, so counts can only be low.
+    """
+    counts = Counter()
+    for tag_string in tag_strings:
+        counts.update(set(tag_string.split()))
+    vocabulary = sorted(tag for tag, count in counts.items() if count >= min_count)
+    ids = {tag: i for i, tag in enumerate(vocabulary)}
+    weights = [1 / math.sqrt(counts[tag]) for tag in vocabulary]
+
+    capacity = top_k * PRUNE_FACTOR
+    together = [None] * len(vocabulary)
+    for tag_string in tag_strings:
+        post_ids = {ids[tag] for tag in tag_string.split() if tag in ids}
+        for a in post_ids:
+            row = together[a]
+            if row is None:
+                row = together[a] = Counter()
+            # Counts a itself too; skipped below
+            row.update(post_ids)
+            if len(row) > capacity:
+                together[a] = _prune(row, capacity, min_count, weights)
+
+    related = {}
+    for a, row in enumerate(together):
+        if row is None:
+            continue
+        candidates = [
+            (
+                count / math.sqrt(counts[vocabulary[a]] * counts[vocabulary[b]]),
+                vocabulary[b],
+            )
+            for b, count in row.items()
+            if b != a and count >= min_count
+        ]
+        if candidates:
+            related[vocabulary[a]] = [
+                (tag, round(score, 4))
+                for score, tag in heapq.nlargest(top_k, candidates)
+            ]
+    return related
+
+
+def _prune(row, capacity, min_count, weights):
+    """
+    Drop the neighbours seen fewer than min_count times so far; if that
+    leaves more than 3/4 of capacity, keep the capacity / 2 best scoring
+    """
+    row = Counter({b: count for b, count in row.items() if count >= min_count})
+    if len(row) > capacity * 3 // 4:
+        row = Counter(
+            dict(
+                heapq.nlargest(
+                    capacity // 2,
+                    row.items(),
+                    key=lambda item: item[1] * weights[item[0]],
+                )
+            )
+        )
+    return row
+
+
+def save_related(related):
+    """Replace the RelatedTag table with a top_k_related() result"""
+    rows = [
+        RelatedTag(tag_name=tag, related_name=name, score=score)
+        for tag, neighbours in related.items()
+        for name, score in neighbours
+    ]
+    with transaction.atomic():
+        RelatedTag.objects.all().delete()
+        RelatedTag.objects.bulk_create(rows, batch_size=5000)
+    # Only the related tag tables need reloading, not the search indexes
+    bump_data_version(settings.RELATED_TAGS_VERSION_FILE)
+    return len(rows)
+
+
+async def fetch_post_tag_strings(api, sample_posts, page_size=200, page_delay=None):
+    """Tag strings of the newest sample_posts posts"""
+    if page_delay is None:
+        page_delay = settings.TAG_SYNC_PAGE_DELAY
+
+    tag_strings = []
+    page = None
+    while len(tag_strings) < sample_posts:
+        posts = await api.get_posts_page(page, page_size)
+        if not posts:
+            break
+        tag_strings.extend(post["tag_string"] for post in posts)
+        # Cursor to the posts older than this page
+        page = f"b{min(post['id'] for post in posts)}"
+        await asyncio.sleep(page_delay)
+    return tag_strings[:sample_posts]
+
+
+async def sync_related_tags(api, sample_posts=None, top_k=None, page_delay=None):
+    """Sync stage: rebuild the related tags table from a sample of recent posts"""
+    if sample_posts is None:
+        sample_posts = settings.RELATED_TAGS_SAMPLE_POSTS
+    if top_k is None:
+        top_k = settings.RELATED_TAGS_TOP_K
+
+    tag_strings = await fetch_post_tag_strings(api, sample_posts, page_delay=page_delay)
+    print(f"Computing related tags from {len(tag_strings):,} posts...")
+    related = await sync_to_async(top_k_related)(tag_strings, top_k)
+    saved = await sync_to_async(save_related)(related)
+    print(f"Saved {saved:,} related tag pairs for {len(related):,} tags")
+    return saved
+
+
+class RelatedTagTable:
+    """Encoded /api/related responses for every tag, so a lookup is a dict get"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    @classmethod
+    def build(cls):
+        neighbours = defaultdict(list)
+        for tag, related, score in (
+            RelatedTag.objects.order_by("tag_name", "-score")
+            .values_list("tag_name", "related_name", "score")
+            .iterator(chunk_size=10_000)
+        ):
+            neighbours[tag].append({"tag": related, "score": score})
+        return cls(
+            {
+                tag: dumps({"tag": tag, "related": related})
+                for tag, related in neighbours.items()
+            }
+        )
+
+    def __len__(self):
+        return len(self.responses)
+
+    def response(self, tag):
+        """Encoded response body for tag"""
+        body = self.responses.get(tag)
+        if body is None:
+            return dumps({"tag": tag, "related": []})
+        return body
+
+
+_table = None
+_table_version = None
+_rebuilding = False
+_last_version_check = 0.0
+_state_lock = threading.Lock()
+
+
+def related_version():
+    return data_version(settings.RELATED_TAGS_VERSION_FILE)
+
+
+def _rebuild():
+    global _table, _table_version
+    version = related_version()
+    table = RelatedTagTable.build()
+    _table, _table_version = table, version
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    with _state_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def run():
+        global _rebuilding
+        try:
+            _rebuild()
+        finally:
+            _rebuilding = False
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_related_table(build=True):
+    """
+    This process's RelatedTagTable. A missing table is built first with
+    build=True (at startup); otherwise it, like a replacement for a table
+    older than the last related tags rebuild, is built in the background
+    and None or the old table is returned meanwhile.
+    """
+    global _last_version_check
+    if _table is None:
+        if build:
+            _rebuild()
+        else:
+            _rebuild_in_background()
+        return _table
+
+    now = time.monotonic()
+    if now - _last_version_check >= settings.SEARCH_INDEX_CHECK_INTERVAL:
+        _last_version_check = now
+        if related_version() != _table_version:
+            _rebuild_in_background()
+    return _table
+
+
+def related_response(tag):
+    """
+    Encoded /api/related response for tag, from the database until this
+    process's table has been built
+    """
+    table = get_related_table(build=False)
+    if table is not None:
+        return table.response(tag)
+    related = [
+        {"tag": name, "score": score}
+        for name, score in RelatedTag.objects.filter(tag_name=tag)
+        .order_by("-score")
+        .values_list("related_name", "score")
+    ]
+    return dumps({"tag": tag, "related": related})
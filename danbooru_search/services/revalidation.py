@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from .page_store import PageStore
+from .word_checker import check_tag
+
+# Set in each worker process by _init_worker
+_common_words = None
+_accepted_names = frozenset()
+
+
+def _init_worker(common_words, accepted_names=frozenset()):
+    global _common_words, _accepted_names
+    _common_words = common_words
+    _accepted_names = accepted_names
+
+
+def revalidate_page(path):
+    """
+    Run one stored page through the current validation rules. Returns the
+    accepted (name, post_count, category) rows and the rejected (tag_data,
+    reason, details) triples, tag_data trimmed to the fields TagLogger keeps.
+    """
+    accepted = []
+    rejected = []
+    for tag_data in PageStore.read(path):
+        reason, details = check_tag(tag_data, _common_words, _accepted_names)
+        row = (tag_data["name"], tag_data["post_count"], tag_data.get("category", 0))
+        if reason is None:
+            accepted.append(row)
+        else:
+            rejected.append(
+                (dict(zip(("name", "post_count", "category"), row)), reason, details)
+            )
+    return accepted, rejected
+
+
+def revalidate_store(
+    store, common_words, workers=None, chunksize=8, accepted_names=frozenset()
+):
+    """
+    Yield revalidate_page() results for every stored page, in id order,
+    validating pages in parallel across a process pool.
+    """
+    paths = [path for _, _, path in store.ranges()]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(common_words, accepted_names),
+    ) as executor:
+        yield from executor.map(revalidate_page, paths, chunksize=chunksize)
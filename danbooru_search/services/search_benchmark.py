@@ -0,0 +1,356 @@
+import itertools
+import json
+import random
+import resource
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connections, transaction
+from django.test import RequestFactory
+
+from ..models import Tag
+from .tag_ranking import scorer
+
+# Real Danbooru vocabulary so prefixes cluster the way users see them
+COMMON_TAG_WORDS = [
+    "1girl",
+    "solo",
+    "long",
+    "short",
+    "hair",
+    "looking",
+    "at",
+    "viewer",
+    "smile",
+    "open",
+    "mouth",
+    "blue",
+    "eyes",
+    "red",
+    "black",
+    "white",
+    "blonde",
+    "brown",
+    "skirt",
+    "shirt",
+    "dress",
+    "hat",
+    "gloves",
+    "thighhighs",
+    "breasts",
+    "simple",
+    "background",
+    "holding",
+    "sitting",
+    "standing",
+    "closed",
+    "bangs",
+    "twintails",
+    "ponytail",
+    "school",
+    "uniform",
+    "sword",
+    "weapon",
+    "animal",
+    "ears",
+    "tail",
+    "jacket",
+    "flower",
+    "ribbon",
+    "bow",
+    "sky",
+    "cloud",
+    "day",
+    "night",
+    "outdoors",
+    "indoors",
+    "upper",
+    "body",
+    "full",
+    "multiple",
+    "girls",
+    "boys",
+    "male",
+    "focus",
+    "star",
+    "symbol",
+    "heart",
+    "hand",
+    "on",
+    "own",
+    "face",
+    "blush",
+    "sweat",
+]
+
+_CONSONANTS = "bdfghjkmnprstvwyz"
+_VOWELS = "aeiou"
+_QUALIFIERS = ["artist", "cosplay", "meme", "style", "series", "character"]
+
+
+def _vocabulary(size, rng):
+    """Common tag words followed by pronounceable synthetic words"""
+    words = list(COMMON_TAG_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(
+            rng.choice(_CONSONANTS) + rng.choice(_VOWELS)
+            for _ in range(rng.randint(2, 4))
+        )
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def _zipf_cum_weights(count, exponent):
+    return list(
+        itertools.accumulate(1 / (rank**exponent) for rank in range(1, count + 1))
+    )
+
+
+def generate_corpus(size, seed=0, exponent=1.1, max_post_count=5_000_000):
+    """
+    Yield (name, post_count) for size unique synthetic tags.
+
+    Names are 1-4 underscore-joined words drawn from a Zipfian vocabulary,
+    sometimes with a Danbooru-style "(qualifier)" suffix; post counts follow
+    a Zipf distribution over a random tag ranking.
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(max(5_000, int(size**0.5) * 4), rng)
+    word_weights = _zipf_cum_weights(len(vocabulary), 1.0)
+
+    ranks = list(range(1, size + 1))
+    rng.shuffle(ranks)
+
+    seen = set()
+    emitted = 0
+    while emitted < size:
+        words = rng.choices(
+            vocabulary,
+            cum_weights=word_weights,
+            k=rng.choices((1, 2, 3, 4), (2, 5, 3, 1))[0],
+        )
+        name = "_".join(words)
+        if rng.random() < 0.05:
+            name += f"_({rng.choice(_QUALIFIERS)})"
+        if name in seen:
+            continue
+        seen.add(name)
+        post_count = max(int(max_post_count / (ranks[emitted] ** exponent)), 0)
+        emitted += 1
+        yield name, post_count
+
+
+def use_database(path):
+    """Point the default connection at another SQLite file and migrate it"""
+    connection = connections["default"]
+    connection.close()
+    connection.settings_dict["NAME"] = str(path)
+    call_command("migrate", verbosity=0)
+    return connection
+
+
+def use_corpus_database(path, size, seed=0, batch_size=50_000):
+    """
+    Point the default connection at a corpus database file, building it if
+    the file does not exist yet. Returns True when the corpus was generated.
+    """
+    built = not path.exists()
+    connection = use_database(path)
+    if built:
+        table = Tag._meta.db_table
+        score = scorer()
+        rows = (
+            (name, count, score(name, count, 0))
+            for name, count in generate_corpus(size, seed)
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.executemany(
+                    f"INSERT INTO {table} "
+                    "(name, post_count, rank_score, created_at, last_update_page) "
+                    "VALUES (%s, %s, %s, CURRENT_TIMESTAMP, 0)",
+                    batch,
+                )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return built
+
+
+def generate_workload(sessions=500, seed=0, min_typed=1):
+    """
+    Build a keystroke workload: each session picks a tag weighted by
+    popularity and types it one character at a time, stopping after a
+    random number of keystrokes as users do once the tag shows up.
+    """
+    rng = random.Random(seed)
+    tags = list(
+        Tag.objects.order_by("-post_count").values_list("name", "post_count")[:100_000]
+    )
+    if not tags:
+        return []
+
+    weights = [max(count, 1) for _, count in tags]
+    workload = []
+    for name, _ in rng.choices(tags, weights=weights, k=sessions):
+        typed = rng.randint(min(min_typed, len(name)), len(name))
+        workload.extend(name[:length] for length in range(1, typed + 1))
+    return workload
+
+
+def load_workload(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_workload(workload, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(workload, f)
+
+
+def _search_csv_backend():
+    """The /api/search view, including its result cache"""
+    from ..views import search_csv
+
+    factory = RequestFactory()
+
+    def search(query):
+        return search_csv(factory.get("/api/search", {"q": query}))
+
+    return search
+
+
+def _db_backend():
+    """The raw ORM prefix query, bypassing the view and its cache"""
+
+    def search(query):
+        return list(
+            Tag.objects.filter(name__istartswith=query)
+            .order_by("-rank_score")
+            .values_list("name", "post_count", "rank_score")[:50]
+        )
+
+    return search
+
+
+def _tags_backend():
+    """The ranked tag table search search_csv uses when the clustered copy is off"""
+    from ..views import _search_tags
+
+    def search(query):
+        return _search_tags(query, None, 50, None)
+
+    return search
+
+
+def _clustered_backend():
+    """The database search over the clustered (WITHOUT ROWID) tag copy"""
+    from . import clustered_tags
+
+    if not clustered_tags.is_enabled():
+        clustered_tags.enable()
+    return clustered_tags.search
+
+
+def _index_backend():
+    """The in-memory prefix index used by the async search view"""
+    from .search_index import TagIndex
+
+    return TagIndex.build().search
+
+
+# Name -> factory returning search(query); factories may build indexes up front
+BACKENDS = {
+    "search_csv": _search_csv_backend,
+    "db": _db_backend,
+    "tags": _tags_backend,
+    "clustered": _clustered_backend,
+    "index": _index_backend,
+}
+
+
+def storage_sizes():
+    """
+    Bytes on disk for the rowid tag table, its indexes and the clustered tag
+    copy, or None when SQLite was built without the dbstat table
+    """
+    from .clustered_tags import CLUSTERED_TABLE
+
+    table = Tag._meta.db_table
+    with connections["default"].cursor() as cursor:
+        try:
+            cursor.execute(
+                "SELECT m.type, m.name, SUM(s.pgsize) FROM dbstat s "
+                "JOIN sqlite_master m ON m.name = s.name "
+                "WHERE m.tbl_name IN (%s, %s) GROUP BY m.name",
+                [table, CLUSTERED_TABLE],
+            )
+        except DatabaseError:
+            return None
+        rows = cursor.fetchall()
+    return {
+        "tag_table": sum(size for kind, name, size in rows if name == table),
+        "tag_indexes": sum(size for kind, name, size in rows if kind == "index"),
+        "clustered": sum(size for kind, name, size in rows if name == CLUSTERED_TABLE),
+    }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_backend(name, workload, warmup=200):
+    """Replay workload against a backend and return its latency report"""
+    cache.clear()
+
+    tracemalloc.start()
+    setup_start = time.perf_counter()
+    search = BACKENDS[name]()
+    setup_seconds = time.perf_counter() - setup_start
+    _, setup_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for query in workload[:warmup]:
+        search(query)
+    cache.clear()
+
+    latencies = []
+    total_start = time.perf_counter()
+    for query in workload:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    total_seconds = time.perf_counter() - total_start
+
+    latencies.sort()
+    return {
+        "backend": name,
+        "queries": len(latencies),
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0) * 1000,
+        "qps": len(latencies) / total_seconds if total_seconds else 0,
+        "setup_seconds": setup_seconds,
+        "setup_peak_mb": setup_peak / 1024 / 1024,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def parse_size(value):
+    """Parse corpus sizes like 100k, 1M or 5000000"""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    if multiplier > 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
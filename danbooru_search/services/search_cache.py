@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the
+    function and every caller that arrives while it runs waits for and
+    shares its result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return (result, shared), shared being True for coalesced callers"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """Await func() once per key; returns (result, shared)"""
+        future = self._calls.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # This caller was cancelled, not the call it waited for
+                    raise
+            # The leader was cancelled (its client went away): run it again
+            return await self.do(key, func)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a leader-only failure doesn't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            # Cancelled (CancelledError is a BaseException) or interrupted:
+            # release the followers rather than leave them waiting forever
+            if not future.done():
+                future.cancel()
+            del self._calls[key]
+
+
+class NegativePrefixCache:
+    """
+    Remembers queries with no matches for a short time. A prefix search with
+    no matches has none for any longer query either, so a hit on any prefix
+    of the query answers it. Queries in different scopes (any hashable, e.g.
+    the search's filters) never cover each other.
+    """
+
+    def __init__(self, timeout=30, max_entries=10_000):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._expires = {}
+
+    def add(self, query, scope=None):
+        if len(self._expires) >= self.max_entries:
+            self._purge()
+        self._expires[scope, query] = time.monotonic() + self.timeout
+
+    def covers(self, query, scope=None):
+        """True if query or one of its prefixes is known to have no matches"""
+        if not self._expires:
+            return False
+        now = time.monotonic()
+        for length in range(1, len(query) + 1):
+            expires = self._expires.get((scope, query[:length]))
+            if expires is not None and expires > now:
+                return True
+        return False
+
+    def clear(self):
+        self._expires.clear()
+
+    def _purge(self):
+        now = time.monotonic()
+        for query, expires in list(self._expires.items()):
+            if expires <= now:
+                self._expires.pop(query, None)
+        if len(self._expires) >= self.max_entries:
+            self._expires.clear()
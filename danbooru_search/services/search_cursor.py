@@ -0,0 +1,38 @@
+import base64
+import binascii
+
+from .fast_json import dumps, loads
+
+# Largest page a search may ask for with limit=
+MAX_LIMIT = 200
+DEFAULT_LIMIT = 50
+
+
+def encode_cursor(score, name):
+    """Opaque cursor for the results after (score, name)"""
+    return base64.urlsafe_b64encode(dumps([score, name])).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """The (score, name) a cursor points after; raises ValueError if invalid"""
+    try:
+        data = loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("cursor is not valid")
+    if (
+        not isinstance(data, list)
+        or len(data) != 2
+        or not isinstance(data[0], (int, float))
+        or isinstance(data[0], bool)
+        or not isinstance(data[1], str)
+    ):
+        raise ValueError("cursor is not valid")
+    return data[0], data[1]
+
+
+def next_cursor(results, limit):
+    """Cursor for the page after (name, post_count, score) results, or None"""
+    if len(results) < limit:
+        return None
+    name, _, score = results[-1]
+    return encode_cursor(score, name)
@@ -0,0 +1,379 @@
+import bisect
+import heapq
+import itertools
+import os
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import Tag
+from .fast_json import dumps, search_payload
+from .query_log import hot_queries
+from .search_cursor import next_cursor
+from .tag_filters import load_filters, position_bits, unpack
+from .tag_ranking import match_bonuses, merge_ranked
+from .tag_relations import AliasMap
+
+
+class TagIndex:
+    """
+    Read-only in-memory prefix index over tag names.
+
+    Names are kept sorted so a prefix is a contiguous slice found with two
+    binary searches; the top results of a slice are picked by the stored
+    rank score. The exact name and the word boundary names (prefix + "_")
+    are sub-slices of their own, so their match bonuses are applied by
+    ranking each part separately and merging. Broad prefixes (large
+    slices) have their top results memoized, so the one-letter queries the
+    prompt builder sends first stay cheap. A query that is an alias puts
+    its canonical tag first.
+
+    Each tag category also gets its own index over just its tags, so a
+    category-filtered search costs the same as an unfiltered one. Named
+    tag filters (services.tag_filters) are bitsets over positions; the
+    ones a search excludes are merged into a keep mask once per
+    combination and skipped while collecting the top results.
+    """
+
+    # Slices at least this large get their top results memoized
+    MEMO_THRESHOLD = 2000
+
+    def __init__(
+        self,
+        names,
+        post_counts,
+        scores,
+        built_at=None,
+        aliases=None,
+        categories=None,
+        bonuses=None,
+        filters=None,
+    ):
+        self.names = names
+        self.post_counts = post_counts
+        self.scores = scores
+        self.aliases = aliases or AliasMap()
+        # category -> TagIndex over that category's tags
+        self.categories = categories or {}
+        self.built_at = built_at or time.time()
+        self.bonuses = bonuses or match_bonuses()
+        # filter name -> int with bit i set when position i is in the filter
+        self.filters = filters or {}
+        self._keep = {}
+        self._memo = {}
+        self._encoded = {}
+        self.warmed = 0
+
+    @classmethod
+    def build(cls):
+        """Load every tag from the database"""
+        rows = Tag.objects.values_list(
+            "name", "post_count", "category", "rank_score", "id"
+        ).iterator(chunk_size=10_000)
+        return cls.from_rows(rows, AliasMap.build(), filters=load_filters())
+
+    @classmethod
+    def from_rows(cls, rows, aliases=None, bonuses=None, filters=None):
+        """
+        Index (name, post_count, category, score) rows. With filters (as
+        returned by tag_filters.load_filters()) each row also ends with its
+        tag id.
+        """
+        rows = sorted((name.lower(), *rest) for name, *rest in rows)
+        built_at = time.time()
+
+        # Partitions share the name strings with the full index
+        partitions = {}
+        for name, post_count, category, score, *tag_id in rows:
+            names, post_counts, scores, tag_ids = partitions.setdefault(
+                category, ([], array("q"), array("d"), array("q"))
+            )
+            names.append(name)
+            post_counts.append(post_count)
+            scores.append(score)
+            tag_ids.extend(tag_id)
+        categories = {
+            category: cls(
+                names,
+                post_counts,
+                scores,
+                built_at,
+                aliases,
+                bonuses=bonuses,
+                filters=position_bits(filters, tag_ids),
+            )
+            for category, (names, post_counts, scores, tag_ids) in partitions.items()
+        }
+
+        names = [row[0] for row in rows]
+        post_counts = array("q", (row[1] for row in rows))
+        scores = array("d", (row[3] for row in rows))
+        tag_ids = array("q", (row[4] for row in rows)) if filters else None
+        return cls(
+            names,
+            post_counts,
+            scores,
+            built_at,
+            aliases,
+            categories,
+            bonuses,
+            position_bits(filters, tag_ids),
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_range(self, prefix, lo=0, hi=None):
+        lo = bisect.bisect_left(self.names, prefix, lo, hi)
+        hi = bisect.bisect_left(self.names, prefix + "\U0010ffff", lo, hi)
+        return lo, hi
+
+    def keep_mask(self, exclude):
+        """
+        One byte per position, 1 unless the tag is in one of the excluded
+        filters, or None when nothing is excluded. Built once per combination.
+        """
+        if not exclude:
+            return None
+        keep = self._keep.get(exclude)
+        if keep is None:
+            bits = 0
+            for name in exclude:
+                bits |= self.filters.get(name, 0)
+            keep = self._keep[exclude] = unpack(bits, len(self.names), invert=True)
+        return keep
+
+    def result(self, name, keep=None):
+        """(name, post_count, score) of an exact tag name, or None"""
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            if keep is not None and not keep[i]:
+                return None
+            return name, self.post_counts[i], self.scores[i]
+        return None
+
+    def search(self, prefix, limit=50, category=None, after=None, exclude=frozenset()):
+        """
+        Return up to limit (name, post_count, score) rows, highest ranked
+        first (ties by name), leaving out tags in the exclude filters.
+        after=(score, name) returns the page following that tag.
+        """
+        if category is not None:
+            partition = self.categories.get(category)
+            if partition is None:
+                return []
+            return partition.search(prefix, limit, after=after, exclude=exclude)
+
+        prefix = prefix.lower()
+        keep = self.keep_mask(exclude)
+        if after is not None:
+            # Shown first on the first page, so left out of the pages after it
+            canonical = self.aliases.canonical(prefix)
+            results = self._ranked(prefix, limit + 1, after, keep=keep)
+            return [result for result in results if result[0] != canonical][:limit]
+        memo_key = (prefix, limit, exclude)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        lo, hi = self.prefix_range(prefix)
+        results = self._ranked(prefix, limit, lo=lo, hi=hi, keep=keep)
+        results = self.aliases.with_canonical(
+            prefix, results, lambda name: self.result(name, keep), limit
+        )
+
+        if hi - lo >= self.MEMO_THRESHOLD:
+            self._memo[memo_key] = results
+        return results
+
+    def _ranked(self, prefix, limit, after=None, lo=None, hi=None, keep=None):
+        """
+        Top limit rows of the prefix's slice by score plus match bonus,
+        after an optional (score, name) cursor, skipping positions the keep
+        mask clears. The exact name, the word boundary sub-slice and the
+        rest each share one bonus, so each is ranked by its stored scores
+        alone and the three are merged.
+        """
+        if lo is None:
+            lo, hi = self.prefix_range(prefix)
+        names, scores = self.names, self.scores
+        exact_bonus, boundary_bonus = self.bonuses
+        exact = lo < hi and names[lo] == prefix
+        start = lo + 1 if exact else lo
+        boundary_lo, boundary_hi = self.prefix_range(prefix + "_", start, hi)
+        groups = [
+            ([range(lo, start)], exact_bonus),
+            ([range(boundary_lo, boundary_hi)], boundary_bonus),
+            ([range(start, boundary_lo), range(boundary_hi, hi)], 0.0),
+        ]
+        return merge_ranked(
+            (self._top(ranges, bonus, limit, after, keep) for ranges, bonus in groups),
+            limit,
+        )
+
+    def _top(self, ranges, bonus, limit, after, keep=None):
+        """Top limit (name, post_count, score) rows of ranges sharing a bonus"""
+        names, post_counts, scores = self.names, self.post_counts, self.scores
+        if keep is None:
+            positions = itertools.chain.from_iterable(ranges)
+        else:
+            # compress() walks the mask in C, so excluding costs next to nothing
+            mask = memoryview(keep)
+            positions = itertools.chain.from_iterable(
+                itertools.compress(r, mask[r.start : r.stop]) for r in ranges
+            )
+        if after is not None:
+            after_score, after_name = after
+            positions = (
+                i
+                for i in positions
+                if scores[i] + bonus < after_score
+                or (scores[i] + bonus == after_score and names[i] > after_name)
+            )
+        # nlargest is stable, so equal scores stay in name order
+        top = heapq.nlargest(limit, positions, key=scores.__getitem__)
+        return [(names[i], post_counts[i], scores[i] + bonus) for i in top]
+
+    def warm(self, prefixes, limit=50):
+        """
+        Precompute and keep the first page of each prefix, however small its
+        slice, e.g. the queries people type most often. Returns how many.
+        """
+        for prefix in prefixes:
+            prefix = prefix.lower()
+            self._memo[(prefix, limit, frozenset())] = self.search(prefix, limit)
+            self.search_json(prefix, limit)
+        self.warmed += len(prefixes)
+        return len(prefixes)
+
+    def search_json(
+        self,
+        prefix,
+        limit=50,
+        compact=False,
+        category=None,
+        after=None,
+        exclude=frozenset(),
+    ):
+        """Encoded response body for a search; memoized prefixes keep their bytes"""
+        if category is not None:
+            partition = self.categories.get(category)
+            if partition is None:
+                return dumps(search_payload([], compact))
+            return partition.search_json(
+                prefix, limit, compact, after=after, exclude=exclude
+            )
+
+        if after is not None:
+            results = self.search(prefix, limit, after=after, exclude=exclude)
+            return dumps(search_payload(results, compact, next_cursor(results, limit)))
+
+        prefix = prefix.lower()
+        key = (prefix, limit, compact, exclude)
+        body = self._encoded.get(key)
+        if body is not None:
+            return body
+
+        results = self.search(prefix, limit, exclude=exclude)
+        body = dumps(search_payload(results, compact, next_cursor(results, limit)))
+        if (prefix, limit, exclude) in self._memo:
+            self._encoded[key] = body
+        return body
+
+
+_index = None
+_index_version = None
+_build_lock = threading.Lock()
+_state_lock = threading.Lock()
+_rebuilding = False
+_last_version_check = 0.0
+_aliases = None
+_aliases_version = None
+
+
+def data_version(path=None):
+    """mtime of the data version file, touched whenever the tag data changes"""
+    try:
+        return os.stat(path or settings.SEARCH_INDEX_VERSION_FILE).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def bump_data_version(path=None):
+    """Tell every process that its index (or the data behind path) is stale"""
+    path = path or settings.SEARCH_INDEX_VERSION_FILE
+    with open(path, "a"):
+        os.utime(path, None)
+
+
+def _rebuild(only_if_missing=False):
+    global _index, _index_version
+    with _build_lock:
+        if only_if_missing and _index is not None:
+            return
+        version = data_version()
+        index = TagIndex.build()
+        # Warmed before it serves, so a new index starts as warm as the last
+        index.warm(hot_queries())
+        _index, _index_version = index, version
+    print(f"Search index built: {len(index):,} tags, {index.warmed} queries warmed")
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    with _state_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def run():
+        global _rebuilding
+        try:
+            _rebuild()
+        finally:
+            _rebuilding = False
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_index(build=True):
+    """
+    Return this process's index.
+
+    With build=True a missing index is built before returning; with
+    build=False a background build is started and None is returned, so
+    async callers never block on the database. A stale index (the data
+    version file changed) keeps serving while its replacement is built.
+    """
+    global _last_version_check
+    if _index is None:
+        if not build:
+            _rebuild_in_background()
+            return None
+        _rebuild(only_if_missing=True)
+        return _index
+
+    now = time.monotonic()
+    if now - _last_version_check >= settings.SEARCH_INDEX_CHECK_INTERVAL:
+        _last_version_check = now
+        if data_version() != _index_version:
+            _rebuild_in_background()
+    return _index
+
+
+def get_alias_map():
+    """
+    Alias map for synchronous callers: the index's own when this process has
+    built one, otherwise a separate map reloaded when the data version changes.
+    """
+    global _aliases, _aliases_version
+    if _index is not None:
+        return _index.aliases
+    version = data_version()
+    if _aliases is None or version != _aliases_version:
+        _aliases, _aliases_version = AliasMap.build(), version
+    return _aliases
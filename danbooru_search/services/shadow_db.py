@@ -0,0 +1,290 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from ..models import AcceptedTag, RejectedTag, Tag, TagRangeChecksum
+from .backup_service import BackupService, live_database_path, swap_into_place
+from . import tag_ranking
+from .clustered_tags import CLUSTERED_TABLE, POPULATE_SQL
+from .range_checksums import COLUMNS as CHECKSUM_COLUMNS
+
+TAG_TABLE = Tag._meta.db_table
+REJECTED_TABLE = RejectedTag._meta.db_table
+ACCEPTED_TABLE = AcceptedTag._meta.db_table
+CHECKSUM_TABLE = TagRangeChecksum._meta.db_table
+REJECTED_COLUMNS = (
+    "name, reason, details, post_count, category, sync_run_id, rejected_at"
+)
+TAG_COLUMNS = "name, post_count, category, rank_score, created_at, last_update_page"
+# Filled by the load rather than copied from the live database
+REBUILT_TABLES = (TAG_TABLE, REJECTED_TABLE, CLUSTERED_TABLE)
+# Seconds the swap waits for a write on the live database to finish
+LIVE_LOCK_TIMEOUT = 60
+
+
+class ShadowValidationError(Exception):
+    pass
+
+
+class ShadowDatabase:
+    """
+    A copy of the live database that a full resync loads into.
+
+    Every table except those the load fills afresh (tags, rejected tags and
+    the clustered tag copy) is copied from the live database, tags are
+    appended to an unindexed staging table at full speed (no journal, no
+    fsync - a crash just means the shadow file is thrown away) and are
+    moved into the tag table in name order once the load is done, after
+    which the tag indexes and triggers are created. The finished file is validated and
+    renamed over the live database, so readers only ever see the old or
+    the new dataset. The copied tables are copied again just before the
+    rename, with writes to the live database held off, so changes made
+    while the load ran are kept.
+    """
+
+    def __init__(self, live_path=None, backup_service=None):
+        self.live_path = Path(live_path or live_database_path())
+        self.backup_service = backup_service or BackupService()
+        self.path = self.live_path.with_name(self.live_path.name + ".shadow")
+        self.connection = None
+        self.rows_loaded = 0
+        self._index_sql = []
+        self._trigger_sql = []
+        self._copied_tables = []
+
+    def prepare(self):
+        """Create the shadow file with the live schema and non-tag data"""
+        self.discard()
+        # The loading thread may differ from the one that prepares
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-200000")
+        conn.execute("ATTACH DATABASE ? AS live", (str(self.live_path),))
+
+        schema = conn.execute(
+            "SELECT type, name, tbl_name, sql FROM live.sqlite_master "
+            "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' "
+            "ORDER BY type = 'table' DESC, type = 'index' DESC"
+        ).fetchall()
+        for kind, name, table, sql in schema:
+            if kind == "index" and table == TAG_TABLE:
+                # Built after the bulk load
+                self._index_sql.append(sql)
+                continue
+            if kind == "trigger" and table == TAG_TABLE:
+                # The clustered tag triggers; the copy is filled in bulk instead
+                self._trigger_sql.append(sql)
+                continue
+            conn.execute(sql)
+            if kind == "table" and name not in REBUILT_TABLES:
+                self._copied_tables.append(name)
+        self._copy_tables(conn, self._copied_tables)
+        conn.execute(
+            "CREATE TABLE tag_load "
+            "(name TEXT NOT NULL, post_count INTEGER NOT NULL, category INTEGER NOT NULL)"
+        )
+        conn.commit()
+        # Left attached for copy_from_live() until the load is finalized
+        self.connection = conn
+        self.rows_loaded = 0
+
+    @staticmethod
+    def _copy_tables(conn, tables):
+        """Replace these tables' rows with the attached live database's"""
+        for name in tables:
+            conn.execute(f'DELETE FROM main."{name}"')
+            conn.execute(f'INSERT INTO main."{name}" SELECT * FROM live."{name}"')
+
+        # Copying rows already advanced the sequences; keep the live values
+        conn.execute("DELETE FROM main.sqlite_sequence")
+        conn.execute(
+            "INSERT INTO main.sqlite_sequence SELECT * FROM live.sqlite_sequence "
+            f"WHERE name NOT IN ({', '.join('?' * len(REBUILT_TABLES))})",
+            REBUILT_TABLES,
+        )
+
+    def write_tags(self, rows):
+        """Append (name, post_count, category) rows to the staging table"""
+        self.connection.executemany("INSERT INTO tag_load VALUES (?, ?, ?)", rows)
+        self.connection.commit()
+        self.rows_loaded += len(rows)
+
+    def write_rejected(self, rows):
+        """
+        Insert (name, reason, details, post_count, category, sync_run_id,
+        rejected_at) rows into the rejected tag table
+        """
+        self.connection.executemany(
+            f'INSERT OR REPLACE INTO "{REJECTED_TABLE}" ({REJECTED_COLUMNS}) '
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.connection.commit()
+
+    def copy_from_live(self, names):
+        """
+        Stage the live database's tags, and copy its rejected tags, with these
+        names: for blocks of tags that are unchanged since the last resync
+        validated them. Returns the number of tags staged.
+        """
+        names = json.dumps(names)
+        staged = self.connection.execute(
+            "INSERT INTO tag_load SELECT name, post_count, category "
+            f'FROM live."{TAG_TABLE}" WHERE name IN (SELECT value FROM json_each(?))',
+            (names,),
+        ).rowcount
+        self.connection.execute(
+            f'INSERT OR REPLACE INTO main."{REJECTED_TABLE}" ({REJECTED_COLUMNS}) '
+            f'SELECT {REJECTED_COLUMNS} FROM live."{REJECTED_TABLE}" '
+            "WHERE name IN (SELECT value FROM json_each(?))",
+            (names,),
+        )
+        self.connection.commit()
+        self.rows_loaded += staged
+        return staged
+
+    def write_checksums(self, rows):
+        """Replace the stored id block checksums (RangeChecksums.finish() rows)"""
+        self.connection.execute(f'DELETE FROM main."{CHECKSUM_TABLE}"')
+        self.connection.executemany(
+            f'INSERT INTO main."{CHECKSUM_TABLE}" ({", ".join(CHECKSUM_COLUMNS)}) '
+            f"VALUES ({', '.join('?' * len(CHECKSUM_COLUMNS))})",
+            rows,
+        )
+        self.connection.commit()
+
+    def finalize(self):
+        """Move staged rows into the tag table, scored, and build its indexes"""
+        conn = self.connection
+        conn.execute("DETACH DATABASE live")
+        tag_ranking.register(conn)
+        created_at = connections["default"].ops.adapt_datetimefield_value(
+            timezone.now()
+        )
+        # Inserting in name order appends to the unique name index instead of
+        # splitting pages all over it
+        conn.execute(
+            f'INSERT OR IGNORE INTO "{TAG_TABLE}" '
+            "(name, post_count, category, rank_score, created_at, last_update_page) "
+            "SELECT name, post_count, category, "
+            "rank_score(name, post_count, category), ?, 0 FROM tag_load ORDER BY name",
+            (created_at,),
+        )
+        conn.execute("DROP TABLE tag_load")
+        for sql in self._index_sql:
+            conn.execute(sql)
+        if self._trigger_sql:
+            conn.execute(POPULATE_SQL)
+            for sql in self._trigger_sql:
+                conn.execute(sql)
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode=DELETE")
+
+    def validate(self, min_ratio=None):
+        """
+        Check the shadow database before it replaces the live one.
+        Raises ShadowValidationError, returns a summary dict otherwise.
+        """
+        if min_ratio is None:
+            min_ratio = settings.SHADOW_MIN_ROW_RATIO
+        conn = self.connection
+
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise ShadowValidationError(f"quick_check failed: {check}")
+
+        indexes = {
+            row[0]
+            for row in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+                (TAG_TABLE,),
+            )
+        }
+        missing = [sql for sql in self._index_sql if sql not in indexes]
+        if missing:
+            raise ShadowValidationError(f"Missing tag indexes: {missing}")
+
+        tag_count = conn.execute(f'SELECT COUNT(*) FROM "{TAG_TABLE}"').fetchone()[0]
+        live = sqlite3.connect(f"file:{self.live_path}?mode=ro", uri=True)
+        try:
+            live_count = live.execute(f'SELECT COUNT(*) FROM "{TAG_TABLE}"').fetchone()[
+                0
+            ]
+        finally:
+            live.close()
+
+        if tag_count == 0:
+            raise ShadowValidationError("Shadow database has no tags")
+        if tag_count < live_count * min_ratio:
+            raise ShadowValidationError(
+                f"Shadow database has {tag_count:,} tags, live has {live_count:,} "
+                f"(minimum ratio {min_ratio})"
+            )
+        return {"tag_count": tag_count, "live_count": live_count}
+
+    def swap(self, live_count):
+        """
+        Atomically replace the live database with the shadow file, keeping
+        the old one as a backup. The live database's write lock is held from
+        the final copy of its other tables until the file is replaced.
+        """
+        lock = sqlite3.connect(self.live_path, timeout=LIVE_LOCK_TIMEOUT)
+        try:
+            lock.execute("BEGIN IMMEDIATE")
+            self._copy_live_changes()
+            self.connection.close()
+            self.connection = None
+            backup_file = self.backup_service.archive_live_database(live_count)
+            swap_into_place(self.path, self.live_path)
+        finally:
+            # Ends the write transaction on what is now the backup
+            lock.close()
+        return backup_file
+
+    def _copy_live_changes(self):
+        """
+        Copy the live database's other tables again, and keep the tags
+        promoted while the load ran (the load still rejected them)
+        """
+        conn = self.connection
+        conn.execute("ATTACH DATABASE ? AS live", (str(self.live_path),))
+        # Accepted tags are still as copied by prepare()
+        promoted = json.dumps(
+            [
+                name
+                for (name,) in conn.execute(
+                    f'SELECT name FROM live."{ACCEPTED_TABLE}" '
+                    f'EXCEPT SELECT name FROM main."{ACCEPTED_TABLE}"'
+                )
+            ]
+        )
+        # The checksums are the ones this load wrote
+        self._copy_tables(
+            conn, [name for name in self._copied_tables if name != CHECKSUM_TABLE]
+        )
+        conn.execute(
+            f'DELETE FROM main."{REJECTED_TABLE}" '
+            "WHERE name IN (SELECT value FROM json_each(?))",
+            (promoted,),
+        )
+        conn.execute(
+            f'INSERT OR IGNORE INTO main."{TAG_TABLE}" ({TAG_COLUMNS}) '
+            f'SELECT {TAG_COLUMNS} FROM live."{TAG_TABLE}" '
+            "WHERE name IN (SELECT value FROM json_each(?))",
+            (promoted,),
+        )
+        conn.commit()
+        conn.execute("DETACH DATABASE live")
+
+    def discard(self):
+        """Close and delete the shadow file, if any"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.path.unlink(missing_ok=True)
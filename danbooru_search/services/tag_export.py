@@ -0,0 +1,100 @@
+import csv
+import io
+
+from asgiref.sync import sync_to_async
+
+from ..models import Tag
+from .fast_json import dumps
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def iter_tag_rows(min_posts=0, chunk_size=5000):
+    """
+    Yield lists of (id, name, post_count) in id order.
+
+    Each chunk is a separate keyset query (id > last id seen) rather than an
+    OFFSET or one long cursor, so memory stays constant and no read
+    transaction is held open for the length of the export.
+    """
+    last_id = 0
+    while True:
+        rows = _fetch_rows(last_id, min_posts, chunk_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+async def aiter_tag_rows(min_posts=0, chunk_size=5000):
+    """iter_tag_rows() for async callers: each chunk is fetched in a thread"""
+    last_id = 0
+    while True:
+        rows = await sync_to_async(_fetch_rows)(last_id, min_posts, chunk_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _fetch_rows(last_id, min_posts, chunk_size):
+    return list(
+        Tag.objects.filter(id__gt=last_id, post_count__gte=min_posts)
+        .order_by("id")
+        .values_list("id", "name", "post_count")[:chunk_size]
+    )
+
+
+def _csv_chunk(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(["tag", "times_used"])
+    writer.writerows((name, post_count) for _, name, post_count in rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(rows):
+    return b"".join(
+        dumps({"tag": name, "times_used": post_count}) + b"\n"
+        for _, name, post_count in rows
+    )
+
+
+def _encode_chunk(export_format, rows, first):
+    if export_format == "csv":
+        return _csv_chunk(rows, header=first)
+    return _ndjson_chunk(rows)
+
+
+def _check_format(export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+def iter_export(export_format, min_posts=0, chunk_size=5000):
+    """Yield the export as encoded byte chunks, one per keyset page"""
+    _check_format(export_format)
+    first = True
+    for rows in iter_tag_rows(min_posts, chunk_size):
+        yield _encode_chunk(export_format, rows, first)
+        first = False
+    if first and export_format == "csv":
+        yield _csv_chunk([], header=True)
+
+
+async def aiter_export(export_format, min_posts=0, chunk_size=5000):
+    """
+    iter_export() as an async iterator, for ASGI servers: Django collects a
+    sync iterator into a list before sending any of it there
+    """
+    _check_format(export_format)
+    first = True
+    async for rows in aiter_tag_rows(min_posts, chunk_size):
+        yield _encode_chunk(export_format, rows, first)
+        first = False
+    if first and export_format == "csv":
+        yield _csv_chunk([], header=True)
@@ -0,0 +1,150 @@
+import threading
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from ..models import TAG_CATEGORIES, Tag, TagFilter, TagImplication
+
+CATEGORY_IDS = {name: category for category, name in TAG_CATEGORIES}
+SPEC_KINDS = ("categories", "words", "names", "implies")
+
+# Flag bytes (one 0 or 1 per tag) <-> the ASCII digits of a base 2 int
+_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_FROM_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+_FROM_DIGITS_INVERTED = bytes.maketrans(b"01", b"\x01\x00")
+
+_loaded = None
+_loaded_version = None
+_loaded_lock = threading.Lock()
+
+
+def pack(flags):
+    """One 0/1 byte per position -> an int with bit i set where flags[i] is 1"""
+    return int(bytes(flags[::-1]).translate(_TO_DIGITS), 2) if flags else 0
+
+
+def unpack(bits, length, invert=False):
+    """An int bitset -> length 0/1 bytes (1 where the bit is clear if invert)"""
+    if not length:
+        return b""
+    digits = format(bits, f"0{length}b").encode()[::-1]
+    return digits.translate(_FROM_DIGITS_INVERTED if invert else _FROM_DIGITS)
+
+
+def filter_names():
+    return list(settings.TAG_FILTERS)
+
+
+def filter_q(spec):
+    """
+    Q for the tags a TAG_FILTERS entry matches: any of the given categories
+    (by name), whole words of the name, exact names, or tags that imply one
+    of the implies names
+    """
+    unknown = set(spec) - set(SPEC_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown tag filter keys: {', '.join(sorted(unknown))}")
+    q = Q(pk__in=[])
+    if spec.get("categories"):
+        q |= Q(category__in=[CATEGORY_IDS[name] for name in spec["categories"]])
+    for word in spec.get("words", []):
+        q |= (
+            Q(name__iexact=word)
+            | Q(name__istartswith=f"{word}_")
+            | Q(name__iendswith=f"_{word}")
+            | Q(name__icontains=f"_{word}_")
+        )
+    if spec.get("names"):
+        q |= Q(name__in=spec["names"])
+    if spec.get("implies"):
+        q |= Q(name__in=spec["implies"]) | Q(
+            name__in=TagImplication.objects.filter(
+                status="active", consequent_name__in=spec["implies"]
+            ).values("antecedent_name")
+        )
+    return q
+
+
+def build_filters():
+    """
+    Materialize every TAG_FILTERS entry as a bitset over tag ids, for the
+    search index to exclude without evaluating the filter per query
+    (indexes pick them up on the next data version bump). Returns
+    {filter name: tag count}.
+    """
+    max_id = Tag.objects.aggregate(Max("id"))["id__max"] or 0
+    counts = {}
+    for name, spec in settings.TAG_FILTERS.items():
+        flags = bytearray(max_id + 1)
+        ids = Tag.objects.filter(filter_q(spec)).values_list("id", flat=True)
+        for tag_id in ids.iterator(chunk_size=10_000):
+            flags[tag_id] = 1
+        counts[name] = flags.count(1)
+        TagFilter.objects.update_or_create(
+            name=name,
+            defaults={
+                "bits": pack(flags).to_bytes(max_id // 8 + 1, "little"),
+                "max_tag_id": max_id,
+                "tag_count": counts[name],
+                "built_at": timezone.now(),
+            },
+        )
+    TagFilter.objects.exclude(name__in=list(settings.TAG_FILTERS)).delete()
+    return counts
+
+
+def load_filters():
+    """{filter name: 0/1 byte per tag id} as of the last build_filters()"""
+    return {
+        tag_filter.name: unpack(
+            int.from_bytes(tag_filter.bits, "little"), tag_filter.max_tag_id + 1
+        )
+        for tag_filter in TagFilter.objects.filter(name__in=filter_names())
+    }
+
+
+def current_filters():
+    """load_filters(), kept until the data version changes"""
+    global _loaded, _loaded_version
+    from .search_index import data_version
+
+    version = data_version()
+    if _loaded is None or version != _loaded_version:
+        with _loaded_lock:
+            _loaded, _loaded_version = load_filters(), version
+    return _loaded
+
+
+def excluded_names(exclude, names):
+    """
+    The names in any of the exclude filters, checked against their stored
+    bitsets. Like the search index, tags added after the filters were
+    built match none of them.
+    """
+    filters = current_filters()
+    flags = [filters[name] for name in exclude if name in filters]
+    if not flags or not names:
+        return set()
+    ids = Tag.objects.filter(name__in=names).values_list("name", "id")
+    return {
+        name
+        for name, tag_id in ids
+        if any(tag_id < len(tag_flags) and tag_flags[tag_id] for tag_flags in flags)
+    }
+
+
+def position_bits(filters, tag_ids):
+    """
+    load_filters() flags as bitsets over positions in tag_ids, an index's
+    own order. Tags added after the filters were built match none of them.
+    """
+    if not filters or not tag_ids:
+        return {}
+    end = max(tag_ids) + 1
+    bits = {}
+    for name, flags in filters.items():
+        if len(flags) < end:
+            flags += bytes(end - len(flags))
+        bits[name] = pack(bytes(map(flags.__getitem__, tag_ids)))
+    return bits
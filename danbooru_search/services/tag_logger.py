@@ -1,44 +1,124 @@
-import csv
-from pathlib import Path
-from django.conf import settings
-from datetime import datetime
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ..models import AcceptedTag, CommonWord, RejectedTag, Tag
+from .search_index import bump_data_version
+from .tag_ranking import scorer
+
+REJECTED_FIELDS = [
+    "reason",
+    "details",
+    "post_count",
+    "category",
+    "sync_run_id",
+    "rejected_at",
+]
 
 
 class TagLogger:
+    """
+    Records rejected tags in the RejectedTag table. Rejections are buffered
+    and written in one statement per page by flush().
+    """
+
     def __init__(self):
-        self.log_dir = settings.BASE_DIR / "logs"
-        self.log_dir.mkdir(exist_ok=True)
-        self.log_file = None
-        self.writer = None
-
-    def start_new_log(self):
-        """Start a new log file, replacing any existing one"""
-        self.log_file = self.log_dir / "rejected_tags.csv"
-        print(f"\nCreating log file at: {self.log_file}")
-
-        # Open in write mode to clear/create file
-        f = open(self.log_file, "w", newline="", encoding="utf-8")
-        self.writer = csv.writer(f)
-
-        # Write header
-        self.writer.writerow(
-            ["timestamp", "tag_name", "reason", "details", "post_count"]
-        )
-        print("Initialized CSV with headers")
-        return f  # Return file handle to close in context manager
+        self.run_id = None
+        self.pending = {}
+        # ShadowDatabase to write to instead of the live database
+        self.shadow = None
+
+    def start_run(self):
+        """Start a new sync run; returns its id"""
+        self.run_id = timezone.now().strftime("%Y%m%dT%H%M%S")
+        self.pending = {}
+        return self.run_id
 
     def log_rejected_tag(self, tag_data, reason, details=""):
-        """Log a rejected tag with its reason"""
-        if self.writer:
-            print(f"Logging rejected tag: {tag_data['name']} - {reason}")
-            self.writer.writerow(
-                [
-                    datetime.now().isoformat(),
-                    tag_data["name"],
-                    reason,
-                    details,
-                    tag_data.get("post_count", 0),
-                ]
-            )
+        """Buffer a rejected tag with its reason code"""
+        self.pending[tag_data["name"]] = RejectedTag(
+            name=tag_data["name"],
+            reason=reason,
+            details=details or "",
+            post_count=tag_data.get("post_count", 0),
+            category=tag_data.get("category", 0),
+            sync_run_id=self.run_id or "",
+        )
+
+    def flush(self):
+        """Write buffered rejections; returns how many were written"""
+        if not self.pending:
+            return 0
+        rows = list(self.pending.values())
+        self.pending = {}
+        if self.shadow is not None:
+            self.shadow.write_rejected(rejected_rows(rows))
         else:
-            print("Warning: Attempted to log tag but writer is not initialized")
+            RejectedTag.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["name"],
+                update_fields=REJECTED_FIELDS,
+            )
+        return len(rows)
+
+
+def rejected_rows(rejections):
+    """RejectedTag objects as rows for ShadowDatabase.write_rejected()"""
+    ops = connections["default"].ops
+    return [
+        (
+            tag.name,
+            tag.reason,
+            tag.details,
+            tag.post_count,
+            tag.category,
+            tag.sync_run_id,
+            ops.adapt_datetimefield_value(tag.rejected_at),
+        )
+        for tag in rejections
+    ]
+
+
+def promote_rejected_tag(name):
+    """
+    Accept a rejected tag: add it to the tag table, drop the rejection and
+    add its name to the accepted tags, which later syncs and revalidations
+    accept whatever the other rules say. Words that got it rejected as a
+    typo or as unknown are also added to the custom word list, for other
+    tags using them. Returns (tag, added words), or None if the tag was not
+    rejected.
+    """
+    rejection = RejectedTag.objects.filter(name=name).first()
+    if rejection is None:
+        return None
+
+    words = []
+    if rejection.reason in ("typo", "unknown_words") and ": " in rejection.details:
+        words = [
+            word.strip().lower()
+            for word in rejection.details.split(": ", 1)[1].split(",")
+            if word.strip()
+        ]
+
+    with transaction.atomic():
+        tag, _ = Tag.objects.update_or_create(
+            name=rejection.name,
+            defaults={
+                "post_count": rejection.post_count,
+                "category": rejection.category,
+                "rank_score": scorer()(
+                    rejection.name, rejection.post_count, rejection.category
+                ),
+            },
+        )
+        AcceptedTag.objects.get_or_create(name=rejection.name)
+        added = [
+            word
+            for word in words
+            if CommonWord.objects.get_or_create(
+                word=word, defaults={"category": "custom"}
+            )[1]
+        ]
+        rejection.delete()
+    bump_data_version()
+    return tag, added
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import TAG_CATEGORIES, Tag
+from .query_log import rotated_path
+
+TAG_TABLE = Tag._meta.db_table
+
+# Weights that reproduce the plain most-used-first order
+POST_COUNT_WEIGHTS = {
+    "post_count": 1.0,
+    "length": 0.0,
+    "exact": 0.0,
+    "word_boundary": 0.0,
+    "category": {},
+}
+
+_selection_lock = threading.Lock()
+
+
+def scorer(weights=None):
+    """
+    score(name, post_count, category) for the stored part of a tag's rank:
+    weighted log(1 + post_count), minus a per-character length penalty,
+    plus the category's weight. It does not depend on the query, so it is
+    computed once per tag during the sync.
+    """
+    weights = weights or settings.TAG_RANK_WEIGHTS
+    per_post = weights.get("post_count", 0.0)
+    per_char = weights.get("length", 0.0)
+    by_name = weights.get("category", {})
+    by_category = {id: by_name.get(name, 0.0) for id, name in TAG_CATEGORIES}
+
+    def score(name, post_count, category):
+        return (
+            per_post * math.log1p(max(post_count, 0))
+            - per_char * len(name)
+            + by_category.get(category, 0.0)
+        )
+
+    return score
+
+
+def match_bonuses(weights=None):
+    """
+    (exact, word_boundary) bonuses added at query time: to the tag whose
+    name is the query, and to tags where the query ends a word (query + "_").
+    Each is a contiguous part of the prefix's name range, so applying them
+    costs a lookup, not a rescore.
+    """
+    weights = weights or settings.TAG_RANK_WEIGHTS
+    return weights.get("exact", 0.0), weights.get("word_boundary", 0.0)
+
+
+def merge_ranked(groups, limit):
+    """
+    Merge per-group (name, post_count, score) results into the top limit,
+    highest score first, ties by name
+    """
+    results = [result for group in groups for result in group]
+    results.sort(key=lambda result: (-result[2], result[0]))
+    return results[:limit]
+
+
+def register(sqlite_connection, weights=None):
+    """Make rank_score(name, post_count, category) callable from SQL"""
+    sqlite_connection.create_function(
+        "rank_score", 3, scorer(weights), deterministic=True
+    )
+
+
+def rank_all_tags(weights=None):
+    """Recompute every stored score, e.g. after the weights changed"""
+    connection.ensure_connection()
+    register(connection.connection, weights)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{TAG_TABLE}" SET rank_score = '
+            "rank_score(name, post_count, category)"
+        )
+        return cursor.rowcount
+
+
+def record_selection(query, tag):
+    """
+    Append a search and the result picked from it to the selection log,
+    moving a full log aside to rotated_path()
+    """
+    path = settings.SEARCH_SELECTION_LOG
+    if not path:
+        return
+    line = json.dumps(
+        {"q": query, "tag": tag, "at": timezone.now().isoformat(timespec="seconds")}
+    )
+    with _selection_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            size = f.tell()
+        if size >= settings.SEARCH_SELECTION_LOG_MAX_BYTES:
+            os.replace(path, rotated_path(path))
+
+
+def read_selections(path):
+    """
+    (query, tag) pairs from a selection log and its rotated predecessor,
+    oldest first. Lines that are not a whole entry are skipped and counted.
+    """
+    # Opening path itself raises FileNotFoundError when there is no log at all
+    paths = [p for p in (rotated_path(path), path) if os.path.exists(p)] or [path]
+    selections = []
+    skipped = 0
+    for log_path in paths:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(entry, dict) or not all(
+                    isinstance(entry.get(key), str) for key in ("q", "tag")
+                ):
+                    skipped += 1
+                    continue
+                selections.append((entry["q"], entry["tag"]))
+    if skipped:
+        print(f"Skipped {skipped:,} malformed lines in the selection log {path}")
+    return selections
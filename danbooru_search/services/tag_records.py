@@ -0,0 +1,34 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Tag
+from .tag_ranking import scorer
+
+# The only tag fields the sync reads; the API is asked for just these
+TAG_FIELDS = ("id", "name", "post_count", "category", "words", "is_deprecated")
+
+TAG_TABLE = Tag._meta.db_table
+
+
+def tag_row(tag_data):
+    """The (name, post_count, category) row the sync stores for a tag payload"""
+    return (tag_data["name"], tag_data["post_count"], tag_data.get("category", 0))
+
+
+def insert_tags(rows):
+    """
+    Insert (name, post_count, category) rows with their rank scores,
+    skipping names that already exist - the same as
+    Tag.objects.bulk_create(ignore_conflicts=True), but with one
+    parameterized statement and no model instances.
+    """
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    score = scorer()
+    # One transaction: in autocommit mode each row would commit on its own
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR IGNORE INTO "{TAG_TABLE}" '
+            "(name, post_count, category, rank_score, created_at, last_update_page) "
+            "VALUES (%s, %s, %s, %s, %s, 0)",
+            ((*row, score(*row), created_at) for row in rows),
+        )
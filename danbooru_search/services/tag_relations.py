@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..models import TagAlias, TagImplication
+from . import metrics
+
+# (API endpoint, model, UpdateStatus cursor field)
+RELATIONS = [
+    ("tag_aliases", TagAlias, "last_alias_id"),
+    ("tag_implications", TagImplication, "last_implication_id"),
+]
+
+
+async def sync_relations(api, status, page_size=1000, page_delay=None):
+    """
+    Fetch tag aliases and implications added since the last sync, resuming
+    from each one's cursor on the status row. Returns rows saved per endpoint.
+    """
+    if page_delay is None:
+        page_delay = settings.TAG_SYNC_PAGE_DELAY
+
+    saved = {}
+    for endpoint, model, cursor_field in RELATIONS:
+        saved[endpoint] = 0
+        last_id = getattr(status, cursor_field)
+        while True:
+            rows = await api.get_relations_page(endpoint, f"a{last_id}", page_size)
+            if not rows:
+                break
+
+            await sync_to_async(model.objects.bulk_create)(
+                [
+                    model(
+                        danbooru_id=row["id"],
+                        antecedent_name=row["antecedent_name"],
+                        consequent_name=row["consequent_name"],
+                        status=row["status"],
+                    )
+                    for row in rows
+                ],
+                update_conflicts=True,
+                unique_fields=["danbooru_id"],
+                update_fields=["antecedent_name", "consequent_name", "status"],
+            )
+            last_id = max(row["id"] for row in rows)
+            setattr(status, cursor_field, last_id)
+            await sync_to_async(status.save)(update_fields=[cursor_field])
+
+            metrics.SYNC_RELATIONS.inc(len(rows), endpoint=endpoint)
+            saved[endpoint] += len(rows)
+            await asyncio.sleep(page_delay)
+
+        print(f"Synced {saved[endpoint]:,} {endpoint.replace('_', ' ')}")
+    return saved
+
+
+class AliasMap:
+    """
+    Active aliases as an antecedent -> consequent dict, and implications as
+    antecedent -> consequents, so resolving a name is a single lookup.
+    """
+
+    def __init__(self, aliases=None, implications=None):
+        self.aliases = aliases or {}
+        self.implications = implications or {}
+
+    @classmethod
+    def build(cls):
+        aliases = dict(
+            TagAlias.objects.filter(status="active")
+            .values_list("antecedent_name", "consequent_name")
+            .iterator(chunk_size=10_000)
+        )
+        implications = {}
+        for antecedent, consequent in (
+            TagImplication.objects.filter(status="active")
+            .values_list("antecedent_name", "consequent_name")
+            .iterator(chunk_size=10_000)
+        ):
+            implications.setdefault(antecedent, []).append(consequent)
+        return cls(aliases, implications)
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def canonical(self, name):
+        """The tag an alias resolves to, or None if name is not an alias"""
+        return self.aliases.get(name)
+
+    def resolve(self, name):
+        return self.aliases.get(name, name)
+
+    def implied(self, name):
+        """Every tag implied by name, following implication chains"""
+        implied = []
+        pending = list(self.implications.get(self.resolve(name), ()))
+        while pending:
+            tag = pending.pop()
+            if tag in implied:
+                continue
+            implied.append(tag)
+            pending.extend(self.implications.get(tag, ()))
+        return implied
+
+    def with_canonical(self, query, results, lookup, limit=50):
+        """
+        Put the canonical tag first in (name, post_count, score) results when
+        the query is an alias. lookup(name) returns a tag's result row, or
+        None for tags not in the database.
+        """
+        canonical = self.aliases.get(query)
+        if canonical is None:
+            return results
+        row = lookup(canonical)
+        if row is None:
+            return results
+        rest = [result for result in results if result[0] != canonical]
+        return [row] + rest[: limit - 1]
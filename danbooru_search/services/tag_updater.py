@@ -1,34 +1,72 @@
 import asyncio
 from asgiref.sync import sync_to_async
 from django.core.management import call_command
-from django.db.models import Count
 from django.utils import timezone
 from django.core.cache import cache
+from django.conf import settings
 
-from ..models import Tag, UpdateStatus, CommonWord
-from .word_checker import is_likely_typo, get_common_words
+from ..models import UpdateStatus, CommonWord
+from .word_checker import accepted_names, check_tag, get_common_words
 from .backup_service import BackupService
 from .api_service import DanbooruAPI
 from .tag_logger import TagLogger
+from . import metrics
+from .progress_tracker import tracker
+from .search_index import bump_data_version
+from .shadow_db import ShadowDatabase
+from .range_checksums import RangeChecksums
+from .tag_relations import sync_relations
+from .related_tags import sync_related_tags
+from .page_store import PageStore
+from .tag_records import insert_tags, tag_row
+from .integrity import run_check
+from .tag_filters import build_filters
+from .autocomplete_bundle import refresh_bundle
+
+# check_tag() reason codes -> reasons returned by TagUpdater.is_valid_tag
+REJECTION_REASONS = {
+    "deprecated": "deprecated",
+    "typo": "typo",
+    "unknown_words": "no known words",
+}
 
 
 class TagUpdater:
-    def __init__(self):
+    def __init__(
+        self,
+        base_url=None,
+        page_delay=None,
+        run_analysis=True,
+        full_rebuild=False,
+        skip_unchanged=True,
+    ):
         self.status = None
         self.common_words = None
-        self.api = DanbooruAPI()
+        self.accepted_names = frozenset()
+        self.api = DanbooruAPI(base_url)
         self.backup_service = BackupService()
         self.tag_logger = TagLogger()
         self.tags_per_page = 1000
         self.total_tags_processed = 0
-        self.log_file = None
+        # Seconds to wait between pages (API rate limiting)
+        self.page_delay = (
+            settings.TAG_SYNC_PAGE_DELAY if page_delay is None else page_delay
+        )
+        self.run_analysis = run_analysis
+        # Full rebuilds resync from the first tag id into a shadow database
+        # that replaces the live one only once it is complete and valid
+        self.full_rebuild = full_rebuild
+        self.shadow = None
+        # Full rebuilds copy blocks of tag ids whose checksum is unchanged
+        # since the last one from the live database instead of revalidating
+        self.skip_unchanged = skip_unchanged
+        self.ranges = None
+        self.page_store = PageStore() if settings.TAG_PAGE_STORE else None
 
     async def initialize(self):
         """Initialize required data and services"""
-        print("\nInitializing tag logger...")
-        # Start new log file
-        self.log_file = self.tag_logger.start_new_log()
-        print("Tag logger initialized")
+        # Rejected tags are recorded against this run's id
+        print(f"\nStarting sync run {self.tag_logger.start_run()}")
 
         # Check and initialize word database if empty
         if await sync_to_async(CommonWord.objects.count)() == 0:
@@ -37,6 +75,7 @@ class TagUpdater:
 
         # Get common words
         self.common_words = await get_common_words()
+        self.accepted_names = await sync_to_async(accepted_names)()
 
         # Initialize or get update status
         self.status = await sync_to_async(lambda: UpdateStatus.objects.first())()
@@ -44,64 +83,23 @@ class TagUpdater:
             self.status = await sync_to_async(UpdateStatus.objects.create)()
 
         # Set initial status values
-        self.status.total_tags = 200000  # Approximate
         self.status.start_time = timezone.now()
         self.status.is_updating = True
         await sync_to_async(lambda: self.status.save())()
 
-    async def check_duplicates(self):
-        """Check for duplicate tags in database"""
-        duplicates = await sync_to_async(
-            lambda: list(
-                Tag.objects.values("name")
-                .annotate(count=Count("id"))
-                .filter(count__gt=1)
-            )
-        )()
-        return duplicates
-
     def is_valid_tag(self, tag_data):
         """
         Check if a tag is valid and should be included.
         Returns (is_valid, reason) tuple.
         """
-        # Skip deprecated tags
-        if tag_data.get("is_deprecated", False):
-            self.tag_logger.log_rejected_tag(tag_data, "deprecated")
-            return False, "deprecated"
-
-        # Check for typos and known words
-        has_known_word = False
-        has_typo = False
-        typo_words = []
-
-        if "words" in tag_data:
-            for word in tag_data["words"]:
-                word = word.lower()
-                is_typo, _ = is_likely_typo(word, self.common_words)
-                if is_typo:
-                    has_typo = True
-                    typo_words.append(word)
-                    break
-                elif word in self.common_words:
-                    has_known_word = True
-
-        # Skip if there's a typo
-        if has_typo:
-            self.tag_logger.log_rejected_tag(
-                tag_data, "typo", f"Possible typos: {', '.join(typo_words)}"
-            )
-            return False, "typo"
+        reason, details = check_tag(tag_data, self.common_words, self.accepted_names)
+        if reason is None:
+            return True, None
 
-        # Skip if no words are known
-        if tag_data["words"] and not has_known_word:
-            self.tag_logger.log_rejected_tag(
-                tag_data, "unknown_words", f"Words: {', '.join(tag_data['words'])}"
-            )
-            return False, "no known words"
-
-        return True, None
+        self.tag_logger.log_rejected_tag(tag_data, reason, details)
+        return False, REJECTION_REASONS[reason]
 
+    @metrics.timed(function="process_tag_batch")
     async def process_tag_batch(self, tags):
         """Process a batch of tags from the API"""
         new_tags = []
@@ -121,25 +119,112 @@ class TagUpdater:
                     invalid_tags.append(tag_data["name"])
                 continue
 
-            new_tags.append(
-                Tag(
-                    name=tag_data["name"],
-                    post_count=tag_data["post_count"],
-                )
-            )
+            new_tags.append(tag_row(tag_data))
+
+        await sync_to_async(self.tag_logger.flush)()
+        metrics.SYNC_TAGS.inc(len(new_tags), stage="validated")
+        metrics.SYNC_TAGS.inc(len(tags) - len(new_tags), stage="rejected")
 
         return new_tags, invalid_tags, deprecated_count, typo_count
 
+    @metrics.timed(metrics.DB_WRITE_SECONDS)
+    @metrics.timed(function="_bulk_update_tags")
     async def _bulk_update_tags(self, tags):
-        """Bulk update tags in database"""
-        await sync_to_async(Tag.objects.bulk_create)(tags, ignore_conflicts=True)
+        """Write (name, post_count, category) rows for new tags"""
+        metrics.SYNC_QUEUE_DEPTH.set(len(tags), queue="write")
+        if self.shadow is not None:
+            await sync_to_async(self.shadow.write_tags)(tags)
+        else:
+            await sync_to_async(insert_tags)(tags)
+        metrics.SYNC_QUEUE_DEPTH.set(0, queue="write")
+        metrics.SYNC_TAGS.inc(len(tags), stage="written")
+
+    async def _load_tags(self, tags):
+        """Validate and write a batch of tags; returns (written, invalid names)"""
+        new_tags, invalid_tags, _, _ = await self.process_tag_batch(tags)
+        if new_tags and not invalid_tags:
+            await self._bulk_update_tags(new_tags)
+        return len(new_tags), invalid_tags
+
+    async def _load_ranges(self, ranges):
+        """
+        Load a full rebuild's completed (range_start, tags) id blocks: those
+        unchanged since the last rebuild are copied from the live database,
+        the rest validated and written. Returns (loaded, invalid names).
+        """
+        loaded = 0
+        for start, tags in ranges:
+            if self.ranges.check(start, tags):
+                copied = await sync_to_async(self.shadow.copy_from_live)(
+                    [tag_data["name"] for tag_data in tags]
+                )
+                metrics.SYNC_TAGS.inc(copied, stage="copied")
+                loaded += copied
+                continue
+            written, invalid_tags = await self._load_tags(tags)
+            if invalid_tags:
+                return loaded, invalid_tags
+            loaded += written
+        return loaded, []
+
+    async def _save_progress(self, force=False):
+        """Persist tracker progress to the status row, throttled unless forced"""
+        if force or tracker.should_save():
+            fields = tracker.apply_to_status(self.status)
+            await sync_to_async(lambda: self.status.save(update_fields=fields))()
+
+    async def build_filters(self):
+        """Rebuild the tag filter bitsets searches can exclude"""
+        counts = await sync_to_async(build_filters)()
+        if counts:
+            print(
+                "Built tag filters: "
+                + ", ".join(
+                    f"{name} ({count:,} tags)" for name, count in counts.items()
+                )
+            )
 
-    async def _update_last_page(self, page):
-        """Update the last successful page number"""
-        if await sync_to_async(Tag.objects.exists)():
-            first_tag = await sync_to_async(lambda: Tag.objects.first())()
-            first_tag.last_update_page = page
-            await sync_to_async(lambda: first_tag.save())()
+    async def refresh_bundle(self):
+        """Rebuild the autocomplete bundle for the tag data just synced"""
+        try:
+            manifest = await sync_to_async(refresh_bundle)()
+        except Exception as e:  # Pages search on the server until it is rebuilt
+            print(f"Could not rebuild the autocomplete bundle: {e}")
+            return
+        if manifest:
+            print(f"Rebuilt autocomplete bundle {manifest['file']}")
+
+    async def check_integrity(self):
+        """Record a cheap integrity check (tag indexes and row count)"""
+        check = await sync_to_async(run_check)("indexes")
+        if check.ok:
+            print(f"Integrity check passed ({check.tag_count:,} tags)")
+        else:
+            print("\n!!! INTEGRITY CHECK FOUND PROBLEMS !!!")
+            for problem in check.problems:
+                print(f"- {problem}")
+
+    @metrics.timed(function="_swap_shadow")
+    async def _swap_shadow(self):
+        """Index, validate and swap in the finished shadow database"""
+        await sync_to_async(self.shadow.write_checksums)(self.ranges.finish())
+        counts = self.ranges.counts
+        print(
+            f"\nChecked {sum(counts.values()):,} blocks of "
+            f"{self.ranges.size:,} tag ids: {counts['skipped']:,} unchanged and "
+            f"copied, {counts['revalidated']:,} unchanged but revalidated, "
+            f"{counts['changed']:,} changed, {counts['new']:,} new, "
+            f"{counts['emptied']:,} emptied"
+        )
+        print(f"\nBuilding indexes for {self.shadow.rows_loaded:,} loaded tags...")
+        await sync_to_async(self.shadow.finalize)()
+        summary = await sync_to_async(self.shadow.validate)()
+        backup_file = await sync_to_async(self.shadow.swap)(summary["live_count"])
+        self.shadow = self.tag_logger.shadow = None
+        print(
+            f"Swapped in rebuilt database with {summary['tag_count']:,} tags "
+            f"(previously {summary['live_count']:,}, kept as {backup_file.name})"
+        )
 
     async def perform_update(self):
         """Main update process"""
@@ -147,16 +232,8 @@ class TagUpdater:
             # Initialize
             await self.initialize()
 
-            # Check for duplicates
-            duplicates = await self.check_duplicates()
-            if duplicates:
-                print("\n!!! EXISTING DUPLICATES FOUND !!!")
-                for dup in duplicates:
-                    print(f"Tag: {dup['name']}, Count: {dup['count']}")
-                return
-
-            # Create backup if needed
-            if (
+            # Create backup if needed (a full rebuild keeps the replaced file)
+            if not self.full_rebuild and (
                 not self.status.last_backup
                 or (timezone.now() - self.status.last_backup).days >= 1
             ):
@@ -164,60 +241,110 @@ class TagUpdater:
                 self.status.last_backup = timezone.now()
                 await sync_to_async(lambda: self.status.save())()
 
-            # Get starting page
-            last_page = await sync_to_async(
-                lambda: (
-                    Tag.objects.first().last_update_page if Tag.objects.exists() else 0
+            # Resume after the highest tag id synced so far (cursor paging)
+            last_tag_id = self.status.last_tag_id
+            live_tag_id = last_tag_id
+            if self.full_rebuild:
+                self.shadow = ShadowDatabase(backup_service=self.backup_service)
+                await sync_to_async(self.shadow.prepare)()
+                self.tag_logger.shadow = self.shadow
+                self.ranges = RangeChecksums(
+                    self.tag_logger.run_id,
+                    self.common_words,
+                    accepted_names=self.accepted_names,
+                    skip_unchanged=self.skip_unchanged,
                 )
-            )()
-            page = last_page + 1
+                await sync_to_async(self.ranges.load)()
+                last_tag_id = 0
+            if self.page_store is not None:
+                # Pages this run fetches again replace their stored copies
+                await sync_to_async(self.page_store.start_run)(last_tag_id)
+            tracker.start(last_tag_id, await self.api.get_max_tag_id())
+            await self._save_progress(force=True)
 
             # Main update loop
             while True:
                 try:
                     # Get tags from API
-                    tags = await self.api.get_tags_page(page, self.tags_per_page)
+                    tags = await self.api.get_tags_page(
+                        f"a{last_tag_id}", self.tags_per_page
+                    )
                     if not tags:
                         break
-
-                    # Process batch
-                    new_tags, invalid_tags, deprecated_count, typo_count = (
-                        await self.process_tag_batch(tags)
-                    )
+                    metrics.SYNC_PAGES.inc()
+                    metrics.SYNC_TAGS.inc(len(tags), stage="fetched")
+                    if self.page_store is not None:
+                        await sync_to_async(self.page_store.append)(tags)
+
+                    # Validate and save valid tags (a full rebuild does so
+                    # a block of ids at a time, once a page has completed it)
+                    if self.ranges is not None:
+                        written, invalid_tags = await self._load_ranges(
+                            self.ranges.add(tags)
+                        )
+                    else:
+                        written, invalid_tags = await self._load_tags(tags)
 
                     # Handle invalid tags
                     if invalid_tags:
                         print(f"\n!!! Found {len(invalid_tags)} invalid tags !!!")
                         return
 
-                    # Save valid tags
-                    if new_tags:
-                        await self._bulk_update_tags(new_tags)
-                        await self._update_last_page(page)
-
                     # Update status
+                    last_tag_id = max(tag_data["id"] for tag_data in tags)
                     self.total_tags_processed += len(tags)
-                    self.status.processed_tags += len(tags)
-                    self.status.current_page = page
-                    await sync_to_async(lambda: self.status.save())()
+                    tracker.record_page(last_tag_id, len(tags), written)
+                    await self._save_progress()
 
                     # Rate limiting
-                    await asyncio.sleep(1)
-                    page += 1
+                    await asyncio.sleep(self.page_delay)
 
                 except Exception as e:
-                    print(f"Error processing page {page}: {str(e)}")
+                    print(f"Error processing page after tag id {last_tag_id}: {str(e)}")
                     raise
 
+            if self.shadow is not None:
+                _, invalid_tags = await self._load_ranges(self.ranges.flush())
+                if invalid_tags:
+                    print(f"\n!!! Found {len(invalid_tags)} invalid tags !!!")
+                    return
+                await self._swap_shadow()
+
+            # Aliases and implications resume from their own cursors
+            await sync_relations(
+                self.api, self.status, self.tags_per_page, self.page_delay
+            )
+            if settings.RELATED_TAGS_SAMPLE_POSTS:
+                await sync_related_tags(self.api, page_delay=self.page_delay)
+            await self.build_filters()
+
+            await self.check_integrity()
+
         finally:
-            self.status.is_updating = False
-            await sync_to_async(lambda: self.status.save())()
-            if self.log_file:
-                self.log_file.close()
+            if self.status and tracker.is_updating:
+                tracker.finish()
+                await self._save_progress(force=True)
+                bump_data_version()
+                await self.refresh_bundle()
+            if self.shadow is not None:
+                # Not swapped in: the live database and its cursor are unchanged
+                print("Full rebuild did not complete; discarding shadow database")
+                await sync_to_async(self.shadow.discard)()
+                self.shadow = self.tag_logger.shadow = None
+                self.status.last_tag_id = live_tag_id
+                await sync_to_async(
+                    lambda: self.status.save(update_fields=["last_tag_id"])
+                )()
+            elif self.status:
+                self.status.is_updating = False
+                await sync_to_async(
+                    lambda: self.status.save(update_fields=["is_updating"])
+                )()
 
             # Generate analysis after update completes or fails
-            print("\nGenerating rejection analysis...")
-            try:
-                await sync_to_async(lambda: call_command("analyze_rejected"))()
-            except Exception as e:
-                print(f"Note: Could not generate analysis: {str(e)}")
+            if self.run_analysis:
+                print("\nGenerating rejection analysis...")
+                try:
+                    await sync_to_async(lambda: call_command("analyze_rejected"))()
+                except Exception as e:
+                    print(f"Note: Could not generate analysis: {str(e)}")
@@ -1,4 +1,4 @@
-from ..models import CommonWord
+from ..models import AcceptedTag, CommonWord
 from asgiref.sync import sync_to_async
 
 
@@ -7,15 +7,46 @@ def is_likely_typo(word, common_words, max_distance=1):
     if len(word) <= 2:
         return False, None
 
-    if any(c * 3 in word for c in "abcdefghijklmnopqrstuvwxyz"):
-        return True, None
-
+    # Listed words (custom additions included) are never typos
     if word in common_words:
         return False, None
 
+    # Unlisted words, tripled letters ("loooong") included
     return True, None
 
 
+def check_tag(tag_data, common_words, accepted_names=frozenset()):
+    """
+    Apply the tag validation rules to a Danbooru tag payload.
+    Returns (reason, details): reason is None for a valid tag, otherwise
+    "deprecated", "typo" or "unknown_words". Names in accepted_names (see
+    AcceptedTag) are valid whatever the other rules say.
+    """
+    if tag_data["name"] in accepted_names:
+        return None, None
+
+    # Skip deprecated tags
+    if tag_data.get("is_deprecated", False):
+        return "deprecated", ""
+
+    # Check for typos and known words
+    has_known_word = False
+    words = tag_data.get("words") or []
+    for word in words:
+        word = word.lower()
+        is_typo, _ = is_likely_typo(word, common_words)
+        if is_typo:
+            return "typo", f"Possible typos: {word}"
+        elif word in common_words:
+            has_known_word = True
+
+    # Skip if no words are known
+    if words and not has_known_word:
+        return "unknown_words", f"Words: {', '.join(words)}"
+
+    return None, None
+
+
 async def get_common_words():
     """Get set of common words from database"""
     return set(
@@ -23,3 +54,8 @@ async def get_common_words():
             lambda: list(CommonWord.objects.values_list("word", flat=True))
         )()
     )
+
+
+def accepted_names():
+    """Set of the tag names accepted by hand"""
+    return set(AcceptedTag.objects.values_list("name", flat=True))
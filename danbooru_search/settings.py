@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "danbooru_search.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -123,6 +125,12 @@ STATICFILES_DIRS = [
     BASE_DIR / "danbooru_search" / "static",
 ]
 
+# Offline autocomplete bundle, rebuilt by the sync (or build_autocomplete_bundle)
+# whenever the tag data changes and served by the autocomplete_bundle view.
+# Its file names carry a content hash, so browsers can cache them forever
+AUTOCOMPLETE_BUNDLE_DIR = BASE_DIR / "autocomplete_bundle"
+AUTOCOMPLETE_BUNDLE_SIZE = int(os.environ.get("AUTOCOMPLETE_BUNDLE_SIZE", "20000"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -134,3 +142,118 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Add to your settings.py
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
+
+# Tag sync output: 0 = start/end summaries only, 1 = one progress line per page
+# from in-memory counters, 2 = full per-page diagnostics (runs COUNT(*) every page)
+TAG_SYNC_VERBOSITY = int(os.environ.get("TAG_SYNC_VERBOSITY", "1"))
+
+# Seconds a search result stays in the per-process result cache
+SEARCH_CACHE_TIMEOUT = int(os.environ.get("SEARCH_CACHE_TIMEOUT", "60"))
+
+# Longest a single /api/update-status/stream connection is held open (seconds)
+UPDATE_STATUS_STREAM_SECONDS = int(
+    os.environ.get("UPDATE_STATUS_STREAM_SECONDS", "600")
+)
+
+# Danbooru API root; point at a local stand-in for offline runs and benchmarks
+DANBOORU_BASE_URL = os.environ.get(
+    "DANBOORU_BASE_URL", "https://danbooru.donmai.us"
+).rstrip("/")
+
+# Seconds TagUpdater waits between pages (API rate limiting)
+TAG_SYNC_PAGE_DELAY = float(os.environ.get("TAG_SYNC_PAGE_DELAY", "1"))
+
+# Related tags: posts sampled by the sync's related tags stage (0 skips the
+# stage) and neighbours kept per tag
+RELATED_TAGS_SAMPLE_POSTS = int(os.environ.get("RELATED_TAGS_SAMPLE_POSTS", "0"))
+RELATED_TAGS_TOP_K = int(os.environ.get("RELATED_TAGS_TOP_K", "20"))
+# Touched when the related tags table is rebuilt, so processes reload their
+# copy without rebuilding their search index
+RELATED_TAGS_VERSION_FILE = BASE_DIR / "related_tags.version"
+
+# Raw API tag pages kept (compressed) by the sync so manage.py revalidate can
+# re-apply changed validation rules without refetching
+TAG_PAGE_STORE = os.environ.get("TAG_PAGE_STORE", "True") == "True"
+TAG_PAGE_STORE_DIR = BASE_DIR / "page_store"
+
+# In-memory search index: file touched after every sync so each process
+# rebuilds its index, and how often (seconds) processes check it
+SEARCH_INDEX_VERSION_FILE = BASE_DIR / "tag_data.version"
+SEARCH_INDEX_CHECK_INTERVAL = float(os.environ.get("SEARCH_INDEX_CHECK_INTERVAL", "5"))
+
+# A full resync's shadow database must have at least this fraction of the
+# live database's tags before it is swapped in
+SHADOW_MIN_ROW_RATIO = float(os.environ.get("SHADOW_MIN_ROW_RATIO", "0.9"))
+
+# A full resync checksums the tags of each block of this many ids and skips
+# revalidating blocks that are unchanged since the last one
+TAG_CHECKSUM_RANGE = int(os.environ.get("TAG_CHECKSUM_RANGE", "1000"))
+
+# An integrity check flags the tag table when its row count falls below
+# this fraction of the count at the last passing check
+INTEGRITY_MIN_ROW_RATIO = float(os.environ.get("INTEGRITY_MIN_ROW_RATIO", "0.9"))
+
+# Serve /api/search from the async, index-backed view (run under an ASGI server)
+ASYNC_SEARCH = os.environ.get("ASYNC_SEARCH", "False") == "True"
+
+# Seconds a prefix with no matching tags is answered without a query
+SEARCH_NEGATIVE_CACHE_TIMEOUT = int(
+    os.environ.get("SEARCH_NEGATIVE_CACHE_TIMEOUT", "30")
+)
+
+# Search ranking weights (services.tag_ranking). post_count, length and
+# category make up the score stored per tag (run manage.py rank_tags after
+# changing them); exact and word_boundary are added at query time. Override
+# any of them with a JSON object in TAG_RANK_WEIGHTS; compare candidates with
+# manage.py evaluate_ranking.
+TAG_RANK_WEIGHTS = {
+    "post_count": 1.0,  # per unit of log(1 + post count)
+    "length": 0.05,  # subtracted per character of the name
+    "exact": 4.0,  # the query is the whole name
+    "word_boundary": 1.0,  # the query ends a word of the name ("long" -> "long_hair")
+    "category": {"copyright": 0.5, "character": 0.5, "meta": -1.0},
+}
+TAG_RANK_WEIGHTS.update(json.loads(os.environ.get("TAG_RANK_WEIGHTS", "{}")))
+
+# Named tag classes searches can leave out with exclude=<name>, materialized
+# as bitsets over tag ids by every sync (services.tag_filters). An entry
+# matches tags in any of its "categories", containing any of its "words" as
+# a whole word, with one of its "names", or implying one of its "implies"
+# tags. Override or add entries with a JSON object in TAG_FILTERS.
+TAG_FILTERS = {
+    "meta": {"categories": ["meta"]},
+    "nsfw": {
+        "words": ["nsfw", "nude", "nudity", "sex", "explicit", "hentai", "topless"]
+    },
+}
+TAG_FILTERS.update(json.loads(os.environ.get("TAG_FILTERS", "{}")))
+
+# Searches and the result picked from each, for evaluate_ranking ("" disables)
+SEARCH_SELECTION_LOG = os.environ.get(
+    "SEARCH_SELECTION_LOG", str(LOGS_DIR / "search_selections.jsonl")
+)
+# Moved to <log>.1 (replacing the previous one) once it reaches this many bytes
+SEARCH_SELECTION_LOG_MAX_BYTES = int(
+    os.environ.get("SEARCH_SELECTION_LOG_MAX_BYTES", str(16 * 2**20))
+)
+
+# Sampled log of the searches people type ("" disables): the fraction of
+# searches logged, how many are buffered before being appended to the file,
+# and how many of the most frequent logged queries each process's search
+# index precomputes when it is built (manage.py search_queries reports on it)
+SEARCH_QUERY_LOG = os.environ.get(
+    "SEARCH_QUERY_LOG", str(LOGS_DIR / "search_queries.jsonl")
+)
+SEARCH_QUERY_LOG_SAMPLE = float(os.environ.get("SEARCH_QUERY_LOG_SAMPLE", "0.1"))
+SEARCH_QUERY_LOG_BATCH = int(os.environ.get("SEARCH_QUERY_LOG_BATCH", "200"))
+SEARCH_PREWARM_QUERIES = int(os.environ.get("SEARCH_PREWARM_QUERIES", "500"))
+# The query log is moved to <log>.1 (replacing the previous one) once it
+# reaches this many bytes, so index builds read at most twice that
+SEARCH_QUERY_LOG_MAX_BYTES = int(
+    os.environ.get("SEARCH_QUERY_LOG_MAX_BYTES", str(16 * 2**20))
+)
+
+# Response compression: responses smaller than this many bytes are sent as-is
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
@@ -6,39 +6,200 @@ const copyButton = document.getElementById("copyButton");
 const clearButton = document.getElementById("clearButton");
 const updateTagsButton = document.getElementById("updateTagsButton");
 
+// Offline autocomplete: the most used tags are searched in the browser and
+// only queries the bundle can't fully answer go to /api/search
+const RESULT_LIMIT = 50;
+const bundle = {
+  names: [],
+  counts: [],
+  scores: [],
+  aliases: new Set(),
+  memo: new Map(),
+  loaded: false,
+};
+
+// Infinite scroll: the query on screen and the cursor for its next page
+// (null when there are no more; undefined when the page came from the bundle)
+const page = { query: null, cursor: null, loading: false };
+
+function loadBundle() {
+  const url = searchInput.dataset.bundleUrl;
+  if (!url) return;
+  fetch(url)
+    .then((response) => (response.ok ? response.text() : Promise.reject()))
+    .then((text) => {
+      // Header: format, tag count, lowest rank score, rank weights
+      const lines = text.split("\n");
+      const header = lines[0].split("\t");
+      if (header[0] !== "#3") return;
+      const weights = JSON.parse(header[3]);
+      bundle.minScore = Number(header[2]);
+      bundle.exact = weights.exact;
+      bundle.wordBoundary = weights.word_boundary;
+      // Front-coded lines: chars shared with the previous name, rest, count,
+      // category; scores as the server stores them (services/tag_ranking.py).
+      // "@" lines are aliases, whose canonical tag the server puts first
+      let name = "";
+      for (let i = 1; i < lines.length; i++) {
+        if (!lines[i]) continue;
+        if (lines[i][0] === "@") {
+          bundle.aliases.add(lines[i].slice(1));
+          continue;
+        }
+        const [shared, rest, count, category] = lines[i].split("\t");
+        name = name.slice(0, Number(shared)) + rest;
+        bundle.names.push(name);
+        bundle.counts.push(Number(count));
+        bundle.scores.push(
+          weights.post_count * Math.log1p(Number(count)) -
+            weights.length * name.length +
+            (weights.category[category] || 0)
+        );
+      }
+      bundle.loaded = true;
+    })
+    .catch(() => {}); // Every query goes to the server instead
+}
+
+function lowerBound(target) {
+  let lo = 0;
+  let hi = bundle.names.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (bundle.names[mid] < target) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Top results for a prefix from the bundle, ranked like the server does, or
+// null when a tag left out of the bundle could still make the page: fewer
+// matches than a full page, or a last score within a match bonus of the
+// lowest bundled score. Aliases are left to the server too.
+function searchBundle(query) {
+  if (!bundle.loaded || bundle.aliases.has(query)) return null;
+  if (bundle.memo.has(query)) return bundle.memo.get(query);
+
+  const lo = lowerBound(query);
+  const hi = lowerBound(query + "\uffff");
+  let results = null;
+  if (hi - lo >= RESULT_LIMIT) {
+    const boundary = query + "_";
+    const ranked = [];
+    for (let i = lo; i < hi; i++) {
+      const name = bundle.names[i];
+      let score = bundle.scores[i];
+      if (name === query) score += bundle.exact;
+      else if (name.startsWith(boundary)) score += bundle.wordBoundary;
+      ranked.push({ i, score });
+    }
+    // Positions are in name order, so a stable sort breaks ties by name
+    ranked.sort((a, b) => b.score - a.score);
+    const top = ranked.slice(0, RESULT_LIMIT);
+    const maxBonus = Math.max(bundle.exact, bundle.wordBoundary, 0);
+    if (top[top.length - 1].score > bundle.minScore + maxBonus) {
+      results = top.map(({ i }) => ({
+        tag: bundle.names[i],
+        times_used: bundle.counts[i],
+      }));
+    }
+  }
+  bundle.memo.set(query, results);
+  return results;
+}
+
 let timeoutId;
 searchInput.addEventListener("input", function () {
   clearTimeout(timeoutId);
+  const prefix = this.value.trim().toLowerCase();
+  const local = prefix ? searchBundle(prefix) : null;
+  if (local) {
+    page.query = prefix;
+    page.cursor = local.length === RESULT_LIMIT ? undefined : null;
+    updateResults({ results: local });
+    bindResultClicks();
+    return;
+  }
   timeoutId = setTimeout(() => {
     const query = this.value.trim();
+    page.query = query || null;
+    page.cursor = null;
     if (query) {
-      fetch(`/api/search?q=${encodeURIComponent(query)}`)
-        .then((response) => response.json())
-        .then((data) => {
-          updateResults(data);
-
-          // Add click handlers to new tag results
-          document.querySelectorAll(".tag-result").forEach((tag) => {
-            tag.addEventListener("click", function () {
-              addTagToPrompt(this.dataset.tag);
-            });
-          });
-        });
+      searchPage(query).then((data) => {
+        if (page.query !== query) return;
+        page.cursor = data.next_cursor;
+        updateResults(data);
+        bindResultClicks();
+      });
     } else {
       resultsDiv.innerHTML = "";
     }
   }, 300);
 });
 
+function searchPage(query, cursor) {
+  let url = `/api/search?q=${encodeURIComponent(query)}`;
+  if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+  return fetch(url).then((response) => response.json());
+}
+
+// Append the next page once the results are scrolled near their end
+resultsDiv.addEventListener("scroll", function () {
+  if (page.loading || page.cursor === null || !page.query) return;
+  if (this.scrollTop + this.clientHeight < this.scrollHeight - 200) return;
+
+  const query = page.query;
+  page.loading = true;
+  // Bundle results carry no cursor: take it from the server's first page
+  const cursor =
+    page.cursor === undefined
+      ? searchPage(query).then((data) => data.next_cursor)
+      : Promise.resolve(page.cursor);
+  cursor
+    .then((next) => (next ? searchPage(query, next) : { results: [] }))
+    .then((data) => {
+      if (page.query !== query) return;
+      page.cursor = data.next_cursor || null;
+      updateResults(data, true);
+      bindResultClicks();
+    })
+    .finally(() => {
+      page.loading = false;
+    });
+});
+
 // Load saved prompt from localStorage on page load
 document.addEventListener("DOMContentLoaded", () => {
+  loadBundle();
   const savedPrompt = localStorage.getItem("savedPrompt");
   if (savedPrompt) {
     const tags = JSON.parse(savedPrompt);
     tags.forEach((tag) => addTagToPrompt(tag));
+    canonicalizePrompt(tags);
   }
 });
 
+// Replace aliased tags in a saved prompt with their canonical tag
+function canonicalizePrompt(tags) {
+  if (tags.length === 0) return;
+  fetch(`/api/validate-prompt?tags=${encodeURIComponent(tags.join(","))}`)
+    .then((response) => response.json())
+    .then((data) => {
+      data.tags.forEach((item, i) => {
+        if (!item.is_alias) return;
+        const elements = Array.from(promptArea.children);
+        const aliased = elements.find((el) => el.textContent === tags[i]);
+        if (!aliased) return;
+        if (elements.some((el) => el.textContent === item.canonical)) {
+          aliased.remove();
+        } else {
+          aliased.textContent = item.canonical;
+        }
+      });
+      updateHiddenPromptArea();
+    });
+}
+
 function addTagToPrompt(tag) {
   // Check if tag already exists
   const existingTags = Array.from(promptArea.children).map(
@@ -106,19 +267,62 @@ function saveToLocalStorage() {
   localStorage.setItem("savedPrompt", JSON.stringify(tags));
 }
 
-function updateResults(data) {
-  resultsDiv.innerHTML =
-    data.results.length > 0
-      ? data.results
-          .map(
-            (item) =>
-              `<div class="tag-result" data-tag="${item.tag}">
-                <span class="tag-name">${item.tag}</span>
-                <span class="usage-count">${item.times_used} uses</span>
-               </div>`
-          )
-          .join("")
-      : "<div class='no-results'>No results found</div>";
+// Add click handlers to new tag results
+function bindResultClicks() {
+  document.querySelectorAll(".tag-result:not([data-bound])").forEach((tag) => {
+    tag.dataset.bound = "";
+    tag.addEventListener("click", function () {
+      if (page.query) recordSelection(page.query, this.dataset.tag);
+      addTagToPrompt(this.dataset.tag);
+      showRelated(this.dataset.tag);
+    });
+  });
+}
+
+// Log which result a search led to, for evaluating ranking weights offline
+function recordSelection(query, tag) {
+  navigator.sendBeacon(
+    "/api/search/selected",
+    new URLSearchParams({ q: query, tag: tag })
+  );
+}
+
+// Suggest tags that often appear together with the one just added
+function showRelated(tag) {
+  fetch(`/api/related?tag=${encodeURIComponent(tag)}`)
+    .then((response) => response.json())
+    .then((data) => {
+      if (!data.related || data.related.length === 0) return;
+      page.query = null;
+      resultsDiv.innerHTML = data.related
+        .map(
+          (item) =>
+            `<div class="tag-result" data-tag="${item.tag}">
+              <span class="tag-name">${item.tag}</span>
+              <span class="usage-count">related</span>
+             </div>`
+        )
+        .join("");
+      bindResultClicks();
+    });
+}
+
+function updateResults(data, append = false) {
+  const html = data.results
+    .map(
+      (item) =>
+        `<div class="tag-result" data-tag="${item.tag}">
+          <span class="tag-name">${item.tag}</span>
+          <span class="usage-count">${item.times_used} uses</span>
+         </div>`
+    )
+    .join("");
+  if (append) {
+    resultsDiv.insertAdjacentHTML("beforeend", html);
+  } else {
+    resultsDiv.innerHTML =
+      html || "<div class='no-results'>No results found</div>";
+  }
 }
 
 copyButton.addEventListener("click", function () {
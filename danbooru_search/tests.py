@@ -0,0 +1,115 @@
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import views
+from .models import AcceptedTag, CommonWord, Tag
+from .services import metrics
+from .services.page_store import PageStore
+from .services.tag_ranking import read_selections
+
+
+class RevalidateCommandTests(TestCase):
+    def setUp(self):
+        self.store_dir = Path(tempfile.mkdtemp())
+        store = PageStore(self.store_dir)
+        store.append(
+            [
+                {
+                    "id": 1,
+                    "name": "long_hair",
+                    "post_count": 10,
+                    "words": ["long", "hair"],
+                },
+                {"id": 2, "name": "hairr", "post_count": 5, "words": ["hairr"]},
+                {"id": 3, "name": "zzzap", "post_count": 3, "words": ["zzzap"]},
+            ]
+        )
+        CommonWord.objects.bulk_create(
+            CommonWord(word=word, category="english") for word in ("long", "hair")
+        )
+        Tag.objects.create(name="long_hair", post_count=10, last_update_page=0)
+
+    def revalidate(self):
+        out = io.StringIO()
+        call_command(
+            "revalidate",
+            dry_run=True,
+            workers=1,
+            store_dir=str(self.store_dir),
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_dry_run_reports_changes(self):
+        out = self.revalidate()
+        self.assertIn("Validated 3 tags", out)
+        self.assertIn("1 accepted", out)
+        self.assertIn("Would add 0 tags and remove 0", out)
+
+    def test_dry_run_keeps_accepted_names(self):
+        AcceptedTag.objects.create(name="zzzap")
+        out = self.revalidate()
+        self.assertIn("2 accepted", out)
+        self.assertIn("Would add 1 tags and remove 0", out)
+
+
+class SelectionLogTests(TestCase):
+    def setUp(self):
+        self.log = Path(tempfile.mkdtemp()) / "selections.jsonl"
+        Tag.objects.create(name="long_hair", post_count=10)
+
+    def select(self, tag):
+        with override_settings(SEARCH_SELECTION_LOG=str(self.log)):
+            return self.client.post("/api/search/selected", {"q": "lo", "tag": tag})
+
+    def test_unknown_tags_are_rejected(self):
+        self.assertEqual(self.select("no_such_tag").status_code, 400)
+        self.assertFalse(self.log.exists())
+        self.assertEqual(self.select("long_hair").status_code, 204)
+        self.assertEqual(read_selections(str(self.log)), [("lo", "long_hair")])
+
+    def test_full_log_is_rotated(self):
+        # Each entry is about 60 bytes: the second one fills the log
+        with override_settings(SEARCH_SELECTION_LOG_MAX_BYTES=100):
+            for _ in range(3):
+                self.select("long_hair")
+        self.assertTrue(Path(f"{self.log}.1").exists())
+        self.assertEqual(len(read_selections(str(self.log))), 3)
+
+    def test_malformed_lines_are_skipped(self):
+        self.log.write_text(
+            '{"q": "lo", "tag": "long_hair"}\n{"q": "lo", "ta\n[1]\n{"q": 1}\n'
+        )
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            selections = read_selections(str(self.log))
+        self.assertEqual(selections, [("lo", "long_hair")])
+        self.assertIn("Skipped 3 malformed lines", out.getvalue())
+
+
+class SearchMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name="long_hair", post_count=10)
+
+    def test_cache_hits_are_labelled_cache(self):
+        labels = {"prefix_length": metrics.prefix_length_label("long")}
+        before = {
+            mode: metrics.SEARCH_SECONDS.get(mode=mode, **labels)[0]
+            for mode in ("cache", "db")
+        }
+        # search_csv itself: /api/search may be the async view
+        request = RequestFactory().get("/api/search", {"q": "long"})
+        for _ in range(2):
+            self.assertEqual(views.search_csv(request).status_code, 200)
+        self.assertEqual(
+            metrics.SEARCH_SECONDS.get(mode="db", **labels)[0], before["db"] + 1
+        )
+        self.assertEqual(
+            metrics.SEARCH_SECONDS.get(mode="cache", **labels)[0], before["cache"] + 1
+        )
@@ -16,12 +16,35 @@ Including another URLconf
 """
 
 from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", views.search_page, name="search_page"),
-    path("api/search", views.search_csv, name="search_csv"),
+    path(
+        "api/search",
+        views.search_async if settings.ASYNC_SEARCH else views.search_csv,
+        name="search_csv",
+    ),
+    path("api/search/selected", views.search_selected, name="search_selected"),
+    path("api/related", views.related_tags, name="related_tags"),
+    path(
+        "api/autocomplete/<str:filename>",
+        views.autocomplete_bundle,
+        name="autocomplete_bundle",
+    ),
+    path("api/validate-prompt", views.validate_prompt, name="validate_prompt"),
+    path("api/rejected", views.rejected_tags, name="rejected_tags"),
+    path("api/rejected/promote", views.promote_rejected, name="promote_rejected"),
     path("api/update-tags", views.update_tags, name="update_tags"),
+    path("api/export", views.export_tags, name="export_tags"),
+    path("api/metrics", views.metrics_view, name="metrics"),
+    path("api/update-status", views.update_status, name="update_status"),
+    path(
+        "api/update-status/stream",
+        views.update_status_stream,
+        name="update_status_stream",
+    ),
 ]
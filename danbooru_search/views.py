@@ -1,6 +1,6 @@
 import csv
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 import os
 from django.conf import settings
 import requests
@@ -11,39 +11,516 @@ from concurrent.futures import ThreadPoolExecutor
 import threading
 import asyncio
 import aiohttp
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from .models import Tag, UpdateStatus, CommonWord
+from django.db.models import F, Q, Value
+from .models import (
+    Tag,
+    UpdateStatus,
+    CommonWord,
+    RejectedTag,
+    REJECTION_CODES,
+    TAG_CATEGORIES,
+)
 from django.views.decorators.csrf import csrf_exempt  # Temporary for testing
 from django.views.decorators.http import require_http_methods
 import ssl
 from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Count
 from Levenshtein import distance  # You'll need to pip install python-Levenshtein
 from django.core.management import call_command
+from .services import clustered_tags, integrity, metrics, search_index
+from .services.search_cache import AsyncSingleFlight, NegativePrefixCache, SingleFlight
+from .middleware import brotli, re_accepts_br, re_accepts_gzip
+from .services.fast_json import FastJsonResponse, dumps, loads, search_payload
+from .services.search_cursor import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    decode_cursor,
+    next_cursor,
+)
+from .services.tag_export import EXPORT_FORMATS, aiter_export, iter_export
+from .services.progress_tracker import tracker, status_snapshot
+from .services.query_log import query_log
+from .services.tag_updater import TagUpdater
+from .services.api_service import DanbooruAPI
+from .services.tag_relations import sync_relations
+from .services.related_tags import related_response, sync_related_tags
+from .services.autocomplete_bundle import bundle_path, current_bundle, refresh_bundle
+from .services.page_store import PageStore
+from .services.tag_logger import TagLogger, promote_rejected_tag
+from .services.tag_ranking import match_bonuses, merge_ranked, record_selection
+from .services.tag_records import TAG_FIELDS, insert_tags, tag_row
+from .services.tag_filters import build_filters, excluded_names
+from .services.word_checker import accepted_names, check_tag
+import json
+import hashlib
 
 # Global task state
 update_task = None
 update_thread = None
 
+# Concurrent identical searches share one query; empty prefixes are remembered
+search_flight = SingleFlight()
+async_search_flight = AsyncSingleFlight()
+negative_cache = NegativePrefixCache(timeout=settings.SEARCH_NEGATIVE_CACHE_TIMEOUT)
+
+CATEGORY_IDS = {name: category for category, name in TAG_CATEGORIES}
+# Body of a search that found nothing (the same compact or not)
+EMPTY_SEARCH_BODY = dumps(search_payload([]))
+
 
 def search_page(request):
     """Renders the search page"""
-    return render(request, "search.html")
+    return render(request, "search.html", {"autocomplete_bundle": current_bundle()})
+
+
+@require_http_methods(["GET"])
+def autocomplete_bundle(request, filename):
+    """
+    An autocomplete bundle file, pre-compressed where the browser accepts
+    it. Its name carries a content hash, so browsers may keep it for good.
+    """
+    accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    encoding = None
+    if brotli is not None and re_accepts_br.search(accept):
+        encoding = "br"
+    elif re_accepts_gzip.search(accept):
+        encoding = "gzip"
+    path = bundle_path(filename, encoding) or bundle_path(filename)
+    if path is None:
+        return JsonResponse({"error": "No such bundle"}, status=404)
+
+    response = HttpResponse(path.read_bytes(), content_type="text/plain; charset=utf-8")
+    if path.name != filename:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def _wants_compact(request):
+    """format=compact returns [tag, times_used] pairs instead of objects"""
+    return request.GET.get("format") == "compact"
+
+
+def _search_category(request):
+    """category= as a Danbooru category id (given by name or id), or None"""
+    value = request.GET.get("category", "").strip().lower()
+    if not value:
+        return None
+    if value in CATEGORY_IDS:
+        return CATEGORY_IDS[value]
+    if value.isdigit() and int(value) in CATEGORY_IDS.values():
+        return int(value)
+    raise ValueError(f"category must be one of: {', '.join(CATEGORY_IDS)}")
+
+
+def _search_exclude(request):
+    """
+    Tag filters to leave out, from exclude= (repeated or comma-separated),
+    as a frozenset
+    """
+    names = {
+        name.strip()
+        for value in request.GET.getlist("exclude")
+        for name in value.split(",")
+        if name.strip()
+    }
+    unknown = names - set(settings.TAG_FILTERS)
+    if unknown:
+        raise ValueError(f"exclude must be among: {', '.join(settings.TAG_FILTERS)}")
+    return frozenset(names)
+
+
+def _search_scope(category, exclude=frozenset()):
+    """The filters of a search, kept apart from the query in its keys"""
+    return category, tuple(sorted(exclude))
+
 
+def _search_key(query, category, exclude=frozenset()):
+    """Key for caching and coalescing a search"""
+    return _search_scope(category, exclude), query
 
+
+def _search_page(request):
+    """(limit, after) from limit= and cursor=; raises ValueError if invalid"""
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError(f"limit must be an integer from 1 to {MAX_LIMIT}")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be an integer from 1 to {MAX_LIMIT}")
+    cursor = request.GET.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+@metrics.timed(function="search_csv")
 def search_csv(request):
     """API endpoint to search tags"""
     query = request.GET.get("q", "").lower()
+    try:
+        category = _search_category(request)
+        exclude = _search_exclude(request)
+        limit, after = _search_page(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
     results = []
 
     if query:
-        # More efficient database search
-        tags = Tag.objects.filter(name__istartswith=query).order_by("-post_count")[:50]
+        start = time.perf_counter()
+        if after is not None or limit != DEFAULT_LIMIT:
+            # Later pages and other page sizes are not cached
+            results = _search_db(query, category, limit, after, exclude)
+            mode = "db"
+        else:
+            results, mode = _cached_search(query, category, exclude)
+
+        metrics.SEARCH_SECONDS.observe(
+            time.perf_counter() - start,
+            mode=mode,
+            prefix_length=metrics.prefix_length_label(query),
+        )
+        if after is None:
+            query_log.record(query, bool(results), category, exclude)
+
+    return FastJsonResponse(
+        search_payload(results, _wants_compact(request), next_cursor(results, limit))
+    )
+
+
+def _cached_search(query, category, exclude=frozenset()):
+    """
+    First page of a database search through the result and negative caches,
+    and "cache" or "db" for where it was answered from
+    """
+    key = _search_key(query, category, exclude)
+    cache_key = "search:" + hashlib.md5(repr(key).encode()).hexdigest()
+    results = cache.get(cache_key)
+
+    mode = "cache"
+    if results is not None:
+        metrics.SEARCH_CACHE_REQUESTS.inc(result="hit")
+    elif negative_cache.covers(query, _search_scope(category, exclude)) and not (
+        search_index.get_alias_map().canonical(query)
+    ):
+        metrics.SEARCH_CACHE_REQUESTS.inc(result="negative_hit")
+        results = []
+    else:
+        metrics.SEARCH_CACHE_REQUESTS.inc(result="miss")
+        mode = "db"
+        results, shared = search_flight.do(
+            key, lambda: _search_db_and_cache(query, category, cache_key, exclude)
+        )
+        if shared:
+            metrics.SEARCH_COALESCED.inc()
+    return results, mode
+
+
+def warm_search_cache(queries):
+    """Put the first page of each query in the result cache search_csv reads"""
+    for query in queries:
+        _cached_search(query.lower(), None)
+    return len(queries)
+
+
+def _search_db(
+    query, category=None, limit=DEFAULT_LIMIT, after=None, exclude=frozenset()
+):
+    """
+    Prefix search straight from the database, as (name, post_count, score)
+    rows, highest ranked first (ties by name), after an optional (score,
+    name) cursor, leaving out tags in the exclude filters
+    """
+    aliases = search_index.get_alias_map()
+    canonical = aliases.canonical(query)
+    # One spare row: a later page drops the canonical tag the first showed
+    fetch = limit + 1 if after is not None and canonical else limit
+    search = clustered_tags.search if clustered_tags.is_enabled() else _search_tags
+    if exclude:
+        results = _search_excluding(search, query, category, fetch, after, exclude)
+    else:
+        results = search(query, category, fetch, after)
+
+    if after is not None:
+        return [result for result in results if result[0] != canonical][:limit]
+    return aliases.with_canonical(
+        query, results, lambda name: _tag_result(name, category, exclude), limit
+    )
+
+
+def _search_excluding(search, query, category, limit, after, exclude):
+    """
+    search() results minus the tags in the exclude filters, checked against
+    their stored bitsets; reads on in growing batches until limit are kept
+    """
+    kept = []
+    batch_size = limit
+    while True:
+        batch = search(query, category, batch_size, after)
+        excluded = excluded_names(exclude, [name for name, *_ in batch])
+        kept.extend(row for row in batch if row[0] not in excluded)
+        if len(kept) >= limit or len(batch) < batch_size:
+            return kept[:limit]
+        name, _, score = batch[-1]
+        after = (score, name)
+        batch_size = min(batch_size * 2, MAX_LIMIT * 8)
+
+
+def _search_tags(query, category, limit, after):
+    """
+    Ranked prefix search over the tag table: the exact name, the word
+    boundary names and the rest each share a match bonus, so each is read
+    in stored score order and the three are merged. The exact name is a
+    unique lookup, and the other two read only their range of the name
+    index before sorting it by score.
+    """
+    exact, word_boundary = match_bonuses()
+    tags = Tag.objects.all()
+    if category is not None:
+        tags = tags.filter(category=category)
+    boundary = query + "_"
+    in_boundary = Q(name__gte=boundary, name__lt=boundary + clustered_tags.RANGE_END)
+    groups = [
+        (tags.filter(name=query), exact),
+        (tags.filter(in_boundary), word_boundary),
+        (
+            tags.filter(
+                name__gt=query, name__lt=query + clustered_tags.RANGE_END
+            ).exclude(in_boundary),
+            0.0,
+        ),
+    ]
+
+    ranked = []
+    for group, bonus in groups:
+        group = group.alias(score=F("rank_score") + Value(bonus))
+        if after is not None:
+            group = group.filter(
+                Q(score__lt=after[0]) | Q(score=after[0], name__gt=after[1])
+            )
+        group = group.order_by("-rank_score", "name")
+        ranked.append(
+            [
+                (name, post_count, score + bonus)
+                for name, post_count, score in group.values_list(
+                    "name", "post_count", "rank_score"
+                )[:limit]
+            ]
+        )
+    return merge_ranked(ranked, limit)
+
+
+def _tag_result(name, category=None, exclude=frozenset()):
+    tags = Tag.objects.filter(name=name)
+    if category is not None:
+        tags = tags.filter(category=category)
+    if exclude and excluded_names(exclude, [name]):
+        return None
+    return tags.values_list("name", "post_count", "rank_score").first()
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def search_selected(request):
+    """Record the result picked for a search, for evaluate_ranking"""
+    query = request.POST.get("q", "").strip().lower()
+    tag = request.POST.get("tag", "").strip()
+    if not query or not tag:
+        return JsonResponse({"error": "q and tag are required"}, status=400)
+    if not Tag.objects.filter(name=tag).exists():
+        return JsonResponse({"error": "tag is not a known tag"}, status=400)
+    record_selection(query, tag)
+    return HttpResponse(status=204)
+
+
+@require_http_methods(["GET"])
+def related_tags(request):
+    """Precomputed co-occurring tags for a tag (aliases resolve first)"""
+    tag = request.GET.get("tag", "").strip().lower().replace(" ", "_")
+    if not tag:
+        return JsonResponse({"error": "tag is required"}, status=400)
+    tag = search_index.get_alias_map().resolve(tag)
+    return FastJsonResponse(related_response(tag))
+
+
+@require_http_methods(["GET"])
+def validate_prompt(request):
+    """
+    Check comma-separated prompt tags: aliases are resolved to their
+    canonical tag, and each tag reports whether it exists and what it implies
+    """
+    names = [
+        name.strip().lower().replace(" ", "_")
+        for name in request.GET.get("tags", "").split(",")
+        if name.strip()
+    ]
+    aliases = search_index.get_alias_map()
+    canonical = [aliases.resolve(name) for name in names]
+    existing = set(
+        Tag.objects.filter(name__in=canonical).values_list("name", flat=True)
+    )
+
+    return FastJsonResponse(
+        {
+            "tags": [
+                {
+                    "tag": name,
+                    "canonical": resolved,
+                    "is_alias": resolved != name,
+                    "exists": resolved in existing,
+                    "implies": aliases.implied(resolved),
+                }
+                for name, resolved in zip(names, canonical)
+            ]
+        }
+    )
+
+
+@require_http_methods(["GET"])
+def rejected_tags(request):
+    """
+    Rejected tags, highest post count first, optionally filtered by reason
+    code, minimum post count and sync run
+    """
+    rejected = RejectedTag.objects.order_by("-post_count")
+    reason = request.GET.get("reason")
+    if reason:
+        codes = dict(REJECTION_CODES)
+        if reason not in codes:
+            return JsonResponse(
+                {"error": f"reason must be one of: {', '.join(codes)}"}, status=400
+            )
+        rejected = rejected.filter(reason=reason)
+    try:
+        min_posts = int(request.GET.get("min_posts", 0))
+        limit = max(0, min(int(request.GET.get("limit", 100)), 1000))
+    except ValueError:
+        return JsonResponse(
+            {"error": "min_posts and limit must be integers"}, status=400
+        )
+    if min_posts:
+        rejected = rejected.filter(post_count__gte=min_posts)
+    if request.GET.get("run"):
+        rejected = rejected.filter(sync_run_id=request.GET["run"])
+
+    rows = rejected.values(
+        "name", "reason", "details", "post_count", "category", "sync_run_id"
+    )[:limit]
+    return FastJsonResponse({"rejected": list(rows)})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def promote_rejected(request):
+    """Accept a rejected tag (?name=) into the tag database"""
+    name = request.POST.get("name") or request.GET.get("name", "")
+    promoted = promote_rejected_tag(name.strip())
+    if promoted is None:
+        return JsonResponse(
+            {"success": False, "message": f"{name!r} is not a rejected tag"},
+            status=404,
+        )
+    tag, added_words = promoted
+    return JsonResponse(
+        {
+            "success": True,
+            "tag": {"name": tag.name, "post_count": tag.post_count},
+            "added_words": added_words,
+        }
+    )
+
+
+def _search_db_and_cache(query, category, cache_key, exclude=frozenset()):
+    """Run a database search and remember its result"""
+    results = _search_db(query, category, exclude=exclude)
+    if results:
+        cache.set(cache_key, results, timeout=settings.SEARCH_CACHE_TIMEOUT)
+    else:
+        negative_cache.add(query, _search_scope(category, exclude))
+    return results
+
+
+@metrics.timed(function="search_async")
+async def search_async(request):
+    """Async API endpoint to search tags from the in-process index"""
+    query = request.GET.get("q", "").lower()
+    compact = _wants_compact(request)
+    try:
+        category = _search_category(request)
+        exclude = _search_exclude(request)
+        limit, after = _search_page(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    body = search_payload([], compact)
+
+    if query:
+        start = time.perf_counter()
+        index = search_index.get_index(build=False)
+
+        if index is None:
+            # Index still building in this process - answer from the database
+            mode = "db"
+            results, shared = await async_search_flight.do(
+                (_search_key(query, category, exclude), limit, after),
+                lambda: sync_to_async(_search_db)(
+                    query, category, limit, after, exclude
+                ),
+            )
+            if shared:
+                metrics.SEARCH_COALESCED.inc()
+            body = search_payload(results, compact, next_cursor(results, limit))
+            found = bool(results)
+        else:
+            mode = "index"
+            # Pre-encoded bytes for broad prefixes, encoded on demand otherwise
+            body = index.search_json(query, limit, compact, category, after, exclude)
+            found = body != EMPTY_SEARCH_BODY
+
+        metrics.SEARCH_SECONDS.observe(
+            time.perf_counter() - start,
+            mode=mode,
+            prefix_length=metrics.prefix_length_label(query),
+        )
+        if after is None:
+            query_log.record(query, found, category, exclude)
 
-        results = [{"tag": tag.name, "times_used": tag.post_count} for tag in tags]
+    return FastJsonResponse(body)
 
-    return JsonResponse({"results": results})
+
+@require_http_methods(["GET"])
+def export_tags(request):
+    """Stream the whole tag database as CSV or NDJSON"""
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=400,
+        )
+    try:
+        min_posts = int(request.GET.get("min_posts", 0))
+    except ValueError:
+        return JsonResponse({"error": "min_posts must be an integer"}, status=400)
+
+    # Under ASGI a sync iterator would be read to the end before sending
+    export = aiter_export if isinstance(request, ASGIRequest) else iter_export
+    response = StreamingHttpResponse(
+        export(export_format, min_posts),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="danbooru_tags.{export_format}"'
+    )
+    return response
+
+
+def metrics_view(request):
+    """Prometheus text-format metrics for this worker"""
+    integrity.refresh_metrics()
+    return HttpResponse(
+        metrics.REGISTRY.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 async def start_background_task():
@@ -67,12 +544,16 @@ async def start_background_task():
         print(f"Background task error: {str(e)}")
 
 
-def run_async_update():
+def run_async_update(full_rebuild=False):
     """Run the async update in a separate thread"""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(perform_update())
+        if full_rebuild:
+            # Resync everything into a shadow database and swap it in
+            loop.run_until_complete(TagUpdater(full_rebuild=True).perform_update())
+        else:
+            loop.run_until_complete(perform_update())
     finally:
         loop.close()
 
@@ -90,8 +571,11 @@ def update_tags(request):
                 {"success": False, "message": "Update already in progress"}
             )
 
-        # Start new update thread
-        update_thread = threading.Thread(target=run_async_update)
+        # Start new update thread; ?full=1 rebuilds the whole database
+        full_rebuild = request.GET.get("full") == "1"
+        update_thread = threading.Thread(
+            target=run_async_update, kwargs={"full_rebuild": full_rebuild}
+        )
         update_thread.daemon = True
         update_thread.start()
 
@@ -107,6 +591,45 @@ def update_tags(request):
         return JsonResponse({"success": False, "message": str(e)}, status=500)
 
 
+def _update_progress():
+    """Progress from this process's tracker, or the UpdateStatus row otherwise"""
+    if tracker.started_at is not None:
+        return tracker.snapshot()
+    status = UpdateStatus.objects.first()
+    if status is None:
+        return {"source": "database", "is_updating": False}
+    return status_snapshot(status)
+
+
+@require_http_methods(["GET"])
+def update_status(request):
+    """Current tag sync progress and ETA, and the latest integrity check"""
+    progress = _update_progress()
+    progress["integrity"] = integrity.latest_summary()
+    return JsonResponse(progress)
+
+
+@require_http_methods(["GET"])
+def update_status_stream(request):
+    """Server-sent events stream of tag sync progress, one event per second"""
+
+    # Async, so under ASGI each event is sent as it is produced and waiting
+    # between events holds no worker thread
+    async def events():
+        deadline = time.monotonic() + settings.UPDATE_STATUS_STREAM_SECONDS
+        while True:
+            progress = await sync_to_async(_update_progress)()
+            yield f"data: {json.dumps(progress)}\n\n"
+            if not progress.get("is_updating") or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(1)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 async def get_letter_distribution(tag_count=None):
     """Get tag distribution by first letter"""
     letter_stats = await sync_to_async(
@@ -188,35 +711,24 @@ def is_likely_typo(word, common_words, max_distance=1):
     return True, None
 
 
-async def perform_update():
-    """Background task to update tags"""
+async def perform_update(verbosity=None):
+    """
+    Background task to update tags.
+
+    verbosity controls per-page output (defaults to settings.TAG_SYNC_VERBOSITY):
+    0 prints start/end summaries only, 1 adds a one-line progress report per
+    page built from in-memory counters, and 2 restores the detailed per-page
+    output including the full-table count and recent-tag sample.
+    """
+    if verbosity is None:
+        verbosity = settings.TAG_SYNC_VERBOSITY
+
     try:
         # Check if word database is empty
         if await sync_to_async(CommonWord.objects.count)() == 0:
             print("Initializing word database...")
             await sync_to_async(lambda: call_command("init_wordlist"))()
 
-        # First, check for duplicates before we start
-        print("\n=== Checking for Existing Duplicates ===")
-        duplicates = await sync_to_async(
-            lambda: list(
-                Tag.objects.values("name")
-                .annotate(count=Count("id"))
-                .filter(count__gt=1)
-            )
-        )()
-
-        if duplicates:
-            print("\n!!! EXISTING DUPLICATES FOUND !!!")
-            print("=" * 40)
-            for dup in duplicates:
-                print(f"Tag: {dup['name']}, Count: {dup['count']}")
-            print("=" * 40)
-            print("You should clean up duplicates before continuing.")
-            return  # Stop the update if duplicates exist
-        else:
-            print("No duplicates found - safe to proceed with update.")
-
         # Show initial database statistics
         print("\n=== Current Database Statistics ===")
         initial_tag_count = await sync_to_async(Tag.objects.count)()
@@ -238,82 +750,74 @@ async def perform_update():
             status.last_backup = timezone.now()
             await sync_to_async(lambda: status.save())()
 
-        # Initialize with a reasonable estimate of total tags
-        status.total_tags = 200000  # Approximate number of tags
-        status.start_time = timezone.now()
-        status.is_updating = True
-        await sync_to_async(lambda: status.save())()
-
         tags_per_page = 1000
+        page_store = PageStore() if settings.TAG_PAGE_STORE else None
+        tag_logger = TagLogger()
+        tag_logger.start_run()
         total_tags_processed = 0
+        total_tags_saved = 0
+        total_deprecated = 0
+        total_typos = 0
 
-        # Get the last successful page
-        last_page = await sync_to_async(
-            lambda: Tag.objects.first().last_update_page if Tag.objects.exists() else 0
-        )()
-        page = last_page + 1
-
-        print("\n=== Starting Tag Database Update ===")
-        print(
-            f"Resuming from page {page}" if last_page > 0 else "Starting fresh update"
-        )
-        print(f"Fetching tags in batches of {tags_per_page}")
+        # Resume after the highest tag id synced so far (cursor paging)
+        last_tag_id = status.last_tag_id
+        page = 1
+        if page_store is not None:
+            # Pages this run fetches again replace their stored copies
+            await sync_to_async(page_store.start_run)(last_tag_id)
 
         # Create SSL context for HTTPS requests
         ssl_context = ssl.create_default_context()
 
         timeout = aiohttp.ClientTimeout(total=60)  # 60 second timeout
 
-        async def check_duplicates():
-            """Check and report any duplicate tags"""
-            print("\n=== Checking for Duplicates ===")
-            duplicates = await sync_to_async(
-                lambda: list(
-                    Tag.objects.values("name")
-                    .annotate(count=Count("id"))
-                    .filter(count__gt=1)
-                )
-            )()
-
-            if duplicates:
-                print("\n!!! DUPLICATE TAGS FOUND !!!")
-                print("=" * 40)
-                for dup in duplicates:
-                    print(f"Tag: {dup['name']}, Count: {dup['count']}")
-                print("=" * 40)
-                print("Consider cleaning up these duplicates.")
-            else:
-                print("No duplicates found.")
-            return bool(duplicates)
-
         async with aiohttp.ClientSession(
             connector=aiohttp.TCPConnector(ssl=ssl_context), timeout=timeout
         ) as session:
             retry_count = 0
             max_retries = 5
+            url = f"{settings.DANBOORU_BASE_URL}/tags.json"
+
+            # The newest tag id bounds the remaining work for progress and ETA
+            max_tag_id = await _fetch_max_tag_id(session, url)
+            tracker.start(last_tag_id, max_tag_id)
+
+            status.start_time = timezone.now()
+            status.is_updating = True
+            tracker.apply_to_status(status)
+            await sync_to_async(lambda: status.save())()
+
+            print("\n=== Starting Tag Database Update ===")
+            print(
+                f"Resuming after tag id {last_tag_id:,}"
+                if last_tag_id > 0
+                else "Starting fresh update"
+            )
+            print(f"Newest tag id: {max_tag_id:,}")
+            print(f"Fetching tags in batches of {tags_per_page}")
 
             while True:
                 try:
-                    url = "https://danbooru.donmai.us/tags.json"
                     params = {
-                        "page": page,  # Keep using numeric pages
+                        "page": f"a{last_tag_id}",  # Tags with id > last_tag_id
                         "limit": tags_per_page,
                         "search[order]": "id_asc",  # Use explicit ascending ID order
+                        "only": ",".join(TAG_FIELDS),
                     }
 
                     # Build and log the full URL with parameters
                     param_string = "&".join(f"{k}={v}" for k, v in params.items())
                     full_url = f"{url}?{param_string}"
-                    print(f"\nRequesting: {full_url}")
-
-                    print(f"Fetching page {page}...")
+                    if verbosity >= 2:
+                        print(f"\nRequesting: {full_url}")
+                        print(f"Fetching page {page}...")
                     async with session.get(url, params=params, timeout=30) as response:
                         if response.status == 410:
                             print("\nReached end of tags")
                             break
                         elif response.status != 200:
                             raise Exception(f"API returned status {response.status}")
-                        tags = await response.json()
+                        tags = loads(await response.read())
 
                     if not tags:
                         print("\nNo more tags to fetch")
@@ -321,6 +825,10 @@ async def perform_update():
 
                     batch_size = len(tags)
                     total_tags_processed += batch_size
+                    metrics.SYNC_PAGES.inc()
+                    metrics.SYNC_TAGS.inc(batch_size, stage="fetched")
+                    if page_store is not None:
+                        await sync_to_async(page_store.append)(tags)
 
                     # Collect tags for bulk update
                     new_tags = []
@@ -337,44 +845,38 @@ async def perform_update():
                         )()
                     )
 
+                    accepted = await sync_to_async(accepted_names)()
+
                     for tag_data in tags:
-                        if tag_data.get("is_deprecated", False):
-                            deprecated_count += 1
+                        reason, details = check_tag(tag_data, common_words, accepted)
+                        if reason is None and not is_valid_tag(tag_data["name"]):
+                            reason, details = "invalid", ""
+                        if reason is not None:
+                            tag_logger.log_rejected_tag(tag_data, reason, details)
+                            if reason == "deprecated":
+                                deprecated_count += 1
+                            elif reason == "invalid":
+                                invalid_tags.append(tag_data["name"])
+                            else:
+                                typo_count += 1
                             continue
 
-                        # Check for typos and known words
-                        has_known_word = False
-                        has_typo = False
-
-                        if "words" in tag_data:
-                            for word in tag_data["words"]:
-                                word = word.lower()
-                                is_typo, _ = is_likely_typo(word, common_words)
-                                if is_typo:
-                                    has_typo = True
-                                    break
-                                elif word in common_words:
-                                    has_known_word = True
-
-                        # Skip if there's a typo or if no words are known
-                        if has_typo or (tag_data["words"] and not has_known_word):
-                            typo_count += 1
-                            continue
+                        new_tags.append(tag_row(tag_data))
+                    await sync_to_async(tag_logger.flush)()
 
-                        if is_valid_tag(tag_data["name"]):
-                            new_tags.append(
-                                Tag(
-                                    name=tag_data["name"],
-                                    post_count=tag_data["post_count"],
-                                )
-                            )
-                        else:
-                            invalid_tags.append(tag_data["name"])
+                    total_deprecated += deprecated_count
+                    total_typos += typo_count
+                    metrics.SYNC_TAGS.inc(len(new_tags), stage="validated")
+                    metrics.SYNC_TAGS.inc(
+                        deprecated_count + typo_count + len(invalid_tags),
+                        stage="rejected",
+                    )
 
-                    if deprecated_count:
-                        print(f"Skipped {deprecated_count} deprecated tags")
-                    if typo_count:
-                        print(f"Skipped {typo_count} tags with possible typos")
+                    if verbosity >= 2:
+                        if deprecated_count:
+                            print(f"Skipped {deprecated_count} deprecated tags")
+                        if typo_count:
+                            print(f"Skipped {typo_count} tags with possible typos")
 
                     if invalid_tags:
                         print(f"\n!!! Found {len(invalid_tags)} invalid tags !!!")
@@ -387,36 +889,60 @@ async def perform_update():
 
                     # Save this page's tags
                     if new_tags:
-                        print(f"\nSaving {len(new_tags)} valid tags to database...")
+                        if verbosity >= 2:
+                            print(f"\nSaving {len(new_tags)} valid tags to database...")
+                        metrics.SYNC_QUEUE_DEPTH.set(len(new_tags), queue="write")
                         await sync_to_async(_bulk_update_tags)(new_tags)
-                        print("Batch saved successfully")
+                        metrics.SYNC_QUEUE_DEPTH.set(0, queue="write")
+                        metrics.SYNC_TAGS.inc(len(new_tags), stage="written")
+                        total_tags_saved += len(new_tags)
+                        if verbosity >= 2:
+                            print("Batch saved successfully")
+
+                    last_tag_id = max(tag_data["id"] for tag_data in tags)
+                    tracker.record_page(last_tag_id, batch_size, len(new_tags))
+
+                    # Full-table diagnostics are only run on every page when asked for
+                    if verbosity >= 2:
+                        await get_actual_count()
+                        print(f"Total tags processed so far: {total_tags_processed}")
+                        print(
+                            "Waiting 1 second before next request (API rate limiting)"
+                        )
 
-                    # Update last successful page
-                    await sync_to_async(_update_last_page)(page)
+                    # Calculate and log progress
+                    percentage = tracker.progress_percentage
+                    remaining = tracker.eta_seconds
+
+                    if verbosity >= 2:
+                        print(f"\nProgress: {percentage:.1f}%")
+                        if remaining:
+                            hours = int(remaining // 3600)
+                            minutes = int((remaining % 3600) // 60)
+                            print(f"Estimated time remaining: {hours}h {minutes}m")
+                    elif verbosity == 1:
+                        print(
+                            _format_page_progress(
+                                page,
+                                batch_size,
+                                len(new_tags),
+                                total_tags_processed,
+                                total_tags_saved,
+                                total_deprecated + total_typos,
+                                initial_tag_count,
+                                percentage,
+                                remaining,
+                            )
+                        )
 
-                    # Check actual database count after each page
-                    await get_actual_count()
+                    # Persist progress (and the resume cursor) every few seconds
+                    if tracker.should_save():
+                        fields = tracker.apply_to_status(status)
+                        await sync_to_async(lambda: status.save(update_fields=fields))()
 
-                    print(f"Total tags processed so far: {total_tags_processed}")
-                    print("Waiting 1 second before next request (API rate limiting)")
                     await asyncio.sleep(1)
                     page += 1
 
-                    status.processed_tags += batch_size
-                    status.current_page = page
-
-                    # Calculate and log progress
-                    percentage = status.progress_percentage
-                    remaining = status.estimated_time_remaining
-
-                    print(f"\nProgress: {percentage:.1f}%")
-                    if remaining:
-                        hours = int(remaining // 3600)
-                        minutes = int((remaining % 3600) // 60)
-                        print(f"Estimated time remaining: {hours}h {minutes}m")
-
-                    await sync_to_async(lambda: status.save())()
-
                 except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                     retry_count += 1
                     if retry_count > max_retries:
@@ -439,11 +965,24 @@ async def perform_update():
                 await sync_to_async(_bulk_update_tags)(new_tags)
                 print("Final batch saved successfully")
 
-            # Final duplicate check
-            print("\nPerforming final duplicate check...")
-            has_duplicates = await check_duplicates()
-            if not has_duplicates:
-                print("No duplicates found - database is clean!")
+            # The unique name index rules out duplicates; check it is there
+            print("\nPerforming integrity check...")
+            check = await sync_to_async(integrity.run_check)("indexes")
+            if check.ok:
+                print("Tag indexes and row count look right - database is clean!")
+            else:
+                print("\n!!! INTEGRITY CHECK FOUND PROBLEMS !!!")
+                for problem in check.problems:
+                    print(f"- {problem}")
+
+            # Aliases and implications resume from their own cursors
+            print("\n=== Syncing Tag Aliases and Implications ===")
+            await sync_relations(DanbooruAPI(), status, tags_per_page)
+            if settings.RELATED_TAGS_SAMPLE_POSTS:
+                print("\n=== Rebuilding Related Tags ===")
+                await sync_related_tags(DanbooruAPI())
+            print("\n=== Rebuilding Tag Filters ===")
+            await sync_to_async(build_filters)()
 
             print("\n=== Tag Database Update Complete ===")
             print(f"Total tags processed: {total_tags_processed}")
@@ -455,6 +994,8 @@ async def perform_update():
             print(f"Initial tag count: {initial_tag_count}")
             print(f"Final tag count: {final_tag_count}")
             print(f"Tags added/updated: {total_tags_processed}")
+            print(f"Tags submitted for saving: {total_tags_saved}")
+            print(f"Tags skipped: {total_deprecated} deprecated, {total_typos} typos")
             print(f"Net change in database: {final_tag_count - initial_tag_count}")
 
             if final_tag_count < initial_tag_count:
@@ -488,52 +1029,60 @@ async def perform_update():
         # Don't restore backup automatically
         return
 
-
-@transaction.atomic
-def _bulk_update_tags(tags_to_update):
-    """Bulk create new tags only"""
-    Tag.objects.bulk_create(
-        tags_to_update,
-        ignore_conflicts=True,  # Skip any existing tags without updating them
+    finally:
+        if tracker.is_updating:
+            tracker.finish()
+            fields = tracker.apply_to_status(status)
+            await sync_to_async(lambda: status.save(update_fields=fields))()
+            search_index.bump_data_version()
+            try:
+                await sync_to_async(refresh_bundle)()
+            except Exception as e:  # Pages search on the server until it is rebuilt
+                print(f"Could not rebuild the autocomplete bundle: {e}")
+
+
+async def _fetch_max_tag_id(session, url):
+    """Return the id of the newest tag on Danbooru"""
+    params = {"limit": 1, "search[order]": "id_desc"}
+    async with session.get(url, params=params, timeout=30) as response:
+        if response.status != 200:
+            raise Exception(f"API returned status {response.status}")
+        tags = await response.json()
+    return tags[0]["id"] if tags else 0
+
+
+def _format_page_progress(
+    page,
+    fetched,
+    saved,
+    total_processed,
+    total_saved,
+    total_skipped,
+    initial_tag_count,
+    percentage,
+    remaining,
+):
+    """Build a one-line progress report from the sync loop's own counters"""
+    line = (
+        f"Page {page}: {fetched} fetched, {saved} saved | "
+        f"total {total_processed:,} processed, {total_saved:,} saved, "
+        f"{total_skipped:,} skipped, <= {initial_tag_count + total_saved:,} in DB | "
+        f"{percentage:.1f}%"
     )
+    if remaining:
+        hours = int(remaining // 3600)
+        minutes = int((remaining % 3600) // 60)
+        line += f", ~{hours}h {minutes}m left"
+    return line
 
 
+@metrics.timed(metrics.DB_WRITE_SECONDS)
+@metrics.timed(function="_bulk_update_tags")
 @transaction.atomic
-def _update_last_page(page_number):
-    """Update the last successful page number"""
-    if Tag.objects.exists():
-        Tag.objects.all().update(last_update_page=page_number)
-
-
-def benchmark_search(request):
-    """Compare CSV vs DB search performance"""
-    query = "girl"  # Example search term
-    results = []
-
-    # CSV Search
-    csv_start = time.time()
-    with open("danbooru_tags.csv", "r") as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            if query in row["tag"].lower():
-                results.append(row)
-                if len(results) >= 50:
-                    break
-    csv_time = time.time() - csv_start
-
-    # DB Search
-    db_start = time.time()
-    tags = Tag.objects.filter(name__istartswith=query).order_by("-post_count")[:50]
-    db_results = [{"tag": tag.name, "times_used": tag.post_count} for tag in tags]
-    db_time = time.time() - db_start
-
-    return JsonResponse(
-        {
-            "csv_time": csv_time,
-            "db_time": db_time,
-            "speedup": f"{csv_time/db_time:.1f}x faster",
-        }
-    )
+def _bulk_update_tags(tags_to_update):
+    """Bulk create new tags only"""
+    # Skip any existing tags without updating them
+    insert_tags(tags_to_update)
 
 
 def _create_backup():
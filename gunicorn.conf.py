@@ -0,0 +1,55 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+The app is loaded once in the master (preload_app), which builds the search
+index and related tag table and warms the hot prefixes and the most
+frequently logged queries before forking, so workers start warm and share
+those pages copy-on-write instead of each building its own.
+GUNICORN_PRELOAD=False restores per-worker loading.
+"""
+
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from django.conf import settings
+    from django.db import connections
+
+    from danbooru_search.services.prewarm import freeze, prewarm
+    from danbooru_search.services.query_log import hot_queries
+
+    summary = prewarm()
+    if not settings.ASYNC_SEARCH:
+        # search_csv answers from the database through the result cache
+        from danbooru_search.views import warm_search_cache
+
+        summary["queries"] = warm_search_cache(hot_queries())
+        connections.close_all()
+    frozen = freeze()
+    server.log.info(
+        "Prewarmed %s tags, %s prefixes, %s logged queries and %s related tags "
+        "in %.1fs; froze %s objects before forking",
+        f"{summary['tags']:,}",
+        summary["prefixes"],
+        summary["queries"],
+        f"{summary['related_tags']:,}",
+        summary["seconds"],
+        f"{frozen:,}",
+    )
+
+
+def post_worker_init(worker):
+    from danbooru_search.services.prewarm import process_memory
+
+    memory = process_memory()
+    if memory:
+        worker.log.info(
+            "Worker %s ready: RSS %.0f MB, of which %.0f MB shared",
+            worker.pid,
+            memory["Rss"] / 2**20,
+            (memory["Shared_Clean"] + memory["Shared_Dirty"]) / 2**20,
+        )